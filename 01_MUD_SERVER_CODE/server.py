@@ -7,6 +7,8 @@ import json
 import os
 import sqlite3
 import subprocess
+import re
+from collections import OrderedDict
 
 # === Avendar Class Lore Database ===
 with open("avendar_wiki_lore.json", "r") as lore_file:
@@ -58,6 +60,56 @@ class AIController:
         except Exception as e:
             return f"[AI Error]: {e}"
 
+# --- Dialogue Cache (LRU + TTL, shared by every NPC) ---
+class DialogueCache:
+    def __init__(self, max_entries=512, ttl=600, variants=1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = max(1, variants)  # replies collected per question, then picked at random
+        self.entries = OrderedDict()  # (npc, mood, question) -> [created, replies, seconds per reply]
+        self.lock = threading.Lock()  # every connection has its own thread
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def normalize(message):
+        return " ".join(re.findall(r"[a-z0-9']+", message.lower()))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if not entry or len(entry[1]) < self.variants:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return random.choice(entry[1])
+
+    def put(self, key, reply, seconds):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or time.time() - entry[0] > self.ttl:
+                entry = self.entries[key] = [time.time(), [], 0.0]
+            if len(entry[1]) < self.variants:
+                entry[1].append(reply)
+                entry[2] += (seconds - entry[2]) / len(entry[1])
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def summary(self):
+        asked = self.hits + self.misses
+        rate = self.hits / asked * 100 if asked else 0.0
+        return (f"Dialogue cache: {rate:.1f}% hits over {asked} asks, "
+                f"{self.saved_seconds:.1f}s of AI time saved, {len(self.entries)} replies held")
+
+DIALOGUE_CACHE = DialogueCache()
+
 # --- AI NPC (Vendor for Economy) ---
 class AINPC:
     def __init__(self, name, personality, hp=100, attacks=None, inventory=None, is_vendor=False):
@@ -72,10 +124,19 @@ class AINPC:
         self.actions = {'talk': "Generated response incoming..."}
         self.attacks = attacks or {"punch": (5, 10)}
         self.is_vendor = is_vendor
+        self.mood = "neutral"
 
     def respond(self, message):
+        key = (self.name, self.mood, DialogueCache.normalize(message))
+        cached = DIALOGUE_CACHE.get(key)
+        if cached is not None:
+            return cached
         prompt = f"{self.personality}\nPlayer: {message}\n{self.name}:"
-        return self.ai.query_ai(prompt)
+        start = time.time()
+        reply = self.ai.query_ai(prompt)
+        if reply and not reply.startswith("[AI Error]"):
+            DIALOGUE_CACHE.put(key, reply, time.time() - start)
+        return reply
 
     def attack(self):
         attack_type = random.choice(list(self.attacks.keys()))
@@ -750,7 +811,10 @@ if __name__ == "__main__":
                         if not data:
                             break
                         cmd = data.decode().strip()
-                        output = process_command(player, bruce, cmd, world_rooms, questmaster)
+                        if cmd == "status":
+                            output = DIALOGUE_CACHE.summary()
+                        else:
+                            output = process_command(player, bruce, cmd, world_rooms, questmaster)
                         conn.sendall((output + "\n").encode())
                     player.save()
                     conn.close()
@@ -767,5 +831,8 @@ if __name__ == "__main__":
             if command == "quit":
                 print("Thanks for playing!")
                 break
+            if command == "status":
+                print(DIALOGUE_CACHE.summary())
+                continue
             response = process_command(player, bruce, command, world_rooms, questmaster)
             print(response)
\ No newline at end of file
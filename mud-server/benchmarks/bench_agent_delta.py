@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+What an agent watching a busy room receives per world tick, and what it
+costs the agent to keep an up-to-date model of the room: a prose client
+has to re-read `look` every tick and parse the text (takes and drops are
+never announced), a "delta" client applies room_state and delta frames.
+Both watch the same seeded simulation (players walking, taking and
+dropping, NPCs wandering, ambiance), and both models are checked against
+the world.
+
+    python benchmarks/bench_agent_delta.py --players 30 --ticks 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import MUDWorld, Player  # noqa: E402
+
+LOOK = re.compile(r"\n\[(?P<name>[^\]]*)\]\n(?P<description>.*)\n\n"
+                  r"(?:You see: (?P<objects>.*)\n)?(?:NPCs: (?P<npcs>.*)\n)?(?:Players here: (?P<players>.*)\n)?"
+                  r"(?:\nExits: (?P<exits>.*)\n)?")
+EXIT = re.compile(r"(\w+) \(([^)]*)\)")
+
+
+class Recorder:
+    """A connection that keeps the encoded frames it is sent"""
+    def __init__(self):
+        self.closed = False
+        self.batching = False
+        self.frames = []
+
+    def send(self, frame) -> bool:
+        self.frames.append(frame.data)
+        return True
+
+
+def parse_look(text: str) -> dict:
+    match = LOOK.match(text[text.index("\n["):])
+    split = lambda field: match.group(field).split(", ") if match.group(field) else []  # noqa: E731
+    return {"name": match.group("name"), "objects": split("objects"), "npcs": split("npcs"),
+            "players": split("players"), "exits": dict(EXIT.findall(match.group("exits") or ""))}
+
+
+class ProseAgent:
+    """Keeps its room model by re-reading look every tick"""
+    def __init__(self):
+        self.model = None
+        self.bytes = 0
+        self.frames = 0
+        self.parse_time = 0.0
+
+    async def catch_up(self, world: MUDWorld, player: Player, connection: Recorder):
+        pending, connection.frames = connection.frames, []
+        self.frames += len(pending)
+        self.bytes += sum(map(len, pending))
+        data = json.dumps({"type": "response", "text": await world.handle_command(player, "look")})
+        self.frames += 1
+        self.bytes += len(data)
+        start = time.perf_counter()
+        for message in pending:
+            json.loads(message)
+        self.model = parse_look(json.loads(data)["text"])
+        self.parse_time += time.perf_counter() - start
+
+
+class DeltaAgent:
+    """Keeps its room model from room_state and delta frames"""
+    def __init__(self):
+        self.model = None
+        self.bytes = 0
+        self.frames = 0
+        self.parse_time = 0.0
+
+    async def catch_up(self, world: MUDWorld, player: Player, connection: Recorder):
+        pending, connection.frames = connection.frames, []
+        self.frames += len(pending)
+        self.bytes += sum(map(len, pending))
+        start = time.perf_counter()
+        for data in pending:
+            frame = json.loads(data)
+            kind = frame["type"]
+            if kind == "room_state":
+                self.model = frame
+            elif kind == "delta":
+                self.apply(frame)
+        self.parse_time += time.perf_counter() - start
+
+    def apply(self, delta: dict):
+        model, op = self.model, delta["op"]
+        if op == "player_joined":
+            model["players"].append(delta["name"])
+        elif op == "player_left":
+            model["players"].remove(delta["name"])
+        elif op == "object_added":
+            model["objects"].append(delta["item"])
+        elif op == "object_removed":
+            model["objects"].remove(delta["item"])
+        elif op == "npc_joined":
+            model["npcs"].append(delta["npc"])
+        elif op == "npc_left":
+            model["npcs"] = [npc for npc in model["npcs"] if npc["id"] != delta["id"]]
+        elif op == "exit_added":
+            model["exits"][delta["direction"]] = delta["exit"]
+
+
+async def simulate(agent, capabilities, players: int, ticks: int, seed: int = 7):
+    random.seed(seed)
+    world = MUDWorld()
+    for i in range(6):
+        world.rooms["spawn"].add_object(f"acorn {i}")
+    walkers = []
+    for i in range(players):
+        walker = Player(f"walker{i}")
+        walker.connection = Recorder()
+        walker.room_id = random.choice(list(world.rooms))
+        world.add_player(walker)
+        walkers.append(walker)
+    watcher = Player("agent", is_agent=True)
+    watcher.capabilities = set(capabilities)
+    watcher.connection = connection = Recorder()
+    world.add_player(watcher)
+    await world.arrival_text(watcher)
+    await agent.catch_up(world, watcher, connection)
+
+    for tick in range(ticks):
+        for walker in walkers:
+            roll = random.random()
+            if roll < 0.15:
+                await world.handle_command(walker, random.choice(["north", "south", "east", "west"]))
+            elif roll < 0.2:
+                await world.handle_command(walker, "take acorn")
+            elif roll < 0.25:
+                await world.handle_command(walker, "drop acorn")
+        await world.tick_npc_wander(tick)
+        await world.tick_ambiance(tick)
+        await agent.catch_up(world, watcher, connection)
+
+    room = world.rooms["spawn"]
+    assert sorted(agent.model["objects"]) == sorted(room.objects)
+    seen = room.players if "delta" in capabilities else room.players - {"agent"}  # look leaves out the viewer
+    assert sorted(agent.model["players"]) == sorted(seen)
+    assert len(agent.model["npcs"]) == len(room.npcs)
+    return agent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=30)
+    parser.add_argument("--ticks", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = []
+    for label, agent, capabilities in (("prose + look", ProseAgent(), []), ("delta", DeltaAgent(), ["delta"])):
+        asyncio.run(simulate(agent, capabilities, args.players, args.ticks))
+        rows.append([label, f"{agent.frames / args.ticks:.2f}", f"{agent.bytes / args.ticks:.0f}",
+                     f"{agent.parse_time / args.ticks * 1e6:.1f}"])
+    print_table(["client", "frames/tick", "bytes/tick", "agent us/tick"], rows)
+
+
+if __name__ == "__main__":
+    main()
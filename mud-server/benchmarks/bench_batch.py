@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+An agent running multi-step plans as one {"commands": [...]} batch frame
+against sending the same commands one at a time and waiting for each reply,
+over a link with a simulated round trip. Both go through MUDServer's
+scheduler and run_command; the rate limit is lifted so only round trips and
+server work count (batches pay the same per-command tokens).
+
+    python benchmarks/bench_batch.py --plan 8 --rtt 0 1 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import CommandSession, MUDServer, MUDWorld, Player, TokenBucket, batch_request  # noqa: E402
+
+PLAN = ["look", "north", "look", "take acorn", "south", "drop acorn", "inventory", "who"]
+
+
+class Link:
+    """A connection whose frames reach the agent half a round trip after they are sent"""
+    def __init__(self, rtt: float):
+        self.closed = False
+        self.batching = False
+        self.commands = 0
+        self.rtt = rtt
+        self.frames = 0
+        self.bytes = 0
+        self.replies = asyncio.Queue()
+
+    def send(self, frame) -> bool:
+        self.frames += 1
+        self.bytes += len(frame.data)
+        asyncio.get_running_loop().call_later(self.rtt / 2, self.replies.put_nowait, frame.data)
+        return True
+
+
+async def run_plans(batched: bool, plan, plans: int, rtt: float):
+    world = MUDWorld()
+    world.rooms["forest_north"].add_object("acorn")
+    server = MUDServer(world, agent_rate=1e9, agent_burst=1e9, max_batch=len(plan))
+    server.scheduler.start()
+    player = Player("agent", is_agent=True)
+    world.add_player(player)
+    link = Link(rtt)
+    player.connection = link
+    session = CommandSession(player, link, TokenBucket(1e9, 1e9))
+
+    async def request(kind, payload):
+        await asyncio.sleep(rtt / 2)
+        server.scheduler.submit(session, (kind, payload))
+        return json.loads(await link.replies.get())
+
+    start = time.perf_counter()
+    for _ in range(plans):
+        if batched:
+            result = await request("batch", batch_request({"commands": plan}, len(plan)))
+            assert result["completed"] == len(plan)
+        else:
+            for line in plan:
+                await request("command", line)
+    elapsed = time.perf_counter() - start
+    await server.scheduler.stop()
+    return elapsed, link
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plan", type=int, default=len(PLAN), help="commands per plan")
+    parser.add_argument("--plans", type=int, default=200)
+    parser.add_argument("--rtt", type=float, nargs="+", default=[0, 1, 20], help="round trip in milliseconds")
+    args = parser.parse_args()
+
+    plan = (PLAN * (args.plan // len(PLAN) + 1))[:args.plan]
+    rows = []
+    for rtt in args.rtt:
+        plans = args.plans if rtt < 10 else max(1, args.plans // 10)
+        single, single_link = asyncio.run(run_plans(False, plan, plans, rtt / 1000))
+        batch, batch_link = asyncio.run(run_plans(True, plan, plans, rtt / 1000))
+        commands = plans * len(plan)
+        rows.append([rtt, f"{commands / single:,.0f}", f"{commands / batch:,.0f}", f"{single / batch:.1f}x",
+                     f"{single_link.frames / plans:.1f}", f"{batch_link.frames / plans:.1f}",
+                     f"{single_link.bytes / plans:.0f}", f"{batch_link.bytes / plans:.0f}"])
+    print(f"{len(plan)} commands per plan")
+    print_table(["rtt ms", "single cmd/s", "batch cmd/s", "speedup", "single frames", "batch frames",
+                 "single bytes", "batch bytes"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Connection churn against MUDServer: rounds of clients that log in and leave
+cleanly, reconnect under the same name without closing the old socket (the
+half-open case), connect and never send a name, or log in and go silent.
+After each round the reaper sweeps. With login and idle timeouts on,
+connections, players, room occupants and memory stay flat; with them off,
+silent sockets pile up round after round.
+
+    python benchmarks/bench_churn.py --rounds 5 --clients 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import tracemalloc
+
+import websockets
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import MUDServer, MUDWorld  # noqa: E402
+
+
+class ScriptedSocket:
+    """A websocket that replays a client's messages and then hangs open until closed"""
+    def __init__(self, messages):
+        self.inbox = asyncio.Queue()
+        for message in messages:
+            self.inbox.put_nowait(message)
+        self.closed = False
+        self.sent = 0
+
+    async def send(self, data):
+        self.sent += 1
+
+    async def recv(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except websockets.exceptions.ConnectionClosed:
+            raise StopAsyncIteration
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if not self.closed:
+            self.closed = True
+            self.inbox.put_nowait(None)
+
+
+def login(name: str, *commands) -> list:
+    return [json.dumps({"command": name})] + [json.dumps({"command": command}) for command in commands]
+
+
+async def churn(rounds: int, clients: int, timeouts: bool):
+    world = MUDWorld()
+    server = MUDServer(world, max_connections=0, login_timeout=30 if timeouts else 0,
+                       idle_timeout=900 if timeouts else 0)
+    server.scheduler.start()
+    tasks = set()
+
+    def connect(messages):
+        socket = ScriptedSocket(messages)
+        task = asyncio.create_task(server.handle_client(socket, "/"))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return socket
+
+    rows = []
+    tracemalloc.start()
+    for round_number in range(1, rounds + 1):
+        for i in range(clients):
+            kind = i % 4
+            if kind == 0:
+                connect(login(f"visitor{i}", "look", "north") + [None])
+            elif kind == 1:
+                connect(login(f"wanderer{i}", "look"))  # never closes: the login below takes it over
+            elif kind == 2:
+                connect([])  # never sends a name
+            else:
+                connect(login(f"sleeper{i}", "look"))  # goes quiet
+        await asyncio.sleep(0.2)
+        for i in range(1, clients, 4):
+            connect(login(f"wanderer{i}", "inventory") + [None])
+        await asyncio.sleep(0.2)
+        server.reaper.sweep(time.monotonic() + 1000)
+        await asyncio.sleep(0.2)
+        occupants = sum(len(room.players) for room in world.rooms.values())
+        memory, _ = tracemalloc.get_traced_memory()
+        rows.append(["on" if timeouts else "off", round_number, len(server.live_connections), len(world.players), len(world.connections), occupants, f"{memory / 1024:.0f}"])
+    tracemalloc.stop()
+    for socket_task in list(tasks):
+        socket_task.cancel()
+    await server.scheduler.stop()
+    reaped = {labels[0]: int(count) for labels, count in server.reaper.reaped.values.items()}
+    return rows, reaped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = []
+    for timeouts in (False, True):
+        result, reaped = asyncio.run(churn(args.rounds, args.clients, timeouts))
+        rows.extend(result)
+    print_table(["timeouts", "round", "connections", "players", "world sockets", "room occupants", "traced KB"], rows)
+    print("reaped: " + ", ".join(f"{reason} {count}" for reason, count in sorted(reaped.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+What NPC dialogue does to everyone else: while players keep talking to an
+NPC whose model takes --latency seconds to answer, another player looks
+around every 10 ms. With the reply fetched inline (a blocking HTTP call in
+the command, as a synchronous client would make it) every look waits
+behind it; through the dialogue pool looks stay fast and only the talkers
+wait, at most --workers replies at a time. With the reply cache on, the
+handful of questions players keep asking are answered without the model.
+
+    python benchmarks/bench_dialogue.py --latency 0.5 --talkers 8
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from dialogue import DialogueCache, DialoguePool  # noqa: E402
+from server import MUDWorld, Player  # noqa: E402
+
+QUESTIONS = ["hello", "Hello!", "who are you?", "any quests?", "what is this place", "the old days",
+             "where is the stream", "Who are you"]
+
+
+class Sink:
+    """A connection that counts the NPC replies meant for its player"""
+    def __init__(self, name: str):
+        self.closed = False
+        self.batching = False
+        self.reply = f" says to {name}:"
+        self.replies = 0
+
+    def send(self, frame) -> bool:
+        if frame.text and self.reply in frame.text:
+            self.replies += 1
+        return True
+
+
+class SlowModel:
+    """Answers after a fixed delay, the way a local model on a busy GPU does"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def chat(self, messages) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return "The pines remember everything."
+
+
+class InlineDialogue:
+    """Stands in for DialoguePool: the command itself waits for the reply, as with a synchronous HTTP client"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.cache = None
+        self.calls = 0
+
+    def submit(self, messages, deliver, key=None) -> bool:
+        self.calls += 1
+        time.sleep(self.latency)
+        asyncio.get_running_loop().create_task(deliver("The pines remember everything."))
+        return True
+
+
+async def run(mode: str, latency: float, talkers: int, workers: int, seconds: float) -> list:
+    world = MUDWorld()
+    rng = random.Random(1)
+    if mode == "inline":
+        world.dialogue = model = InlineDialogue(latency)
+    else:
+        model = SlowModel(latency)
+        cache = DialogueCache(1024, ttl=600) if mode == "pool + cache" else None
+        world.dialogue = DialoguePool(model, workers=workers, max_queue=talkers, cache=cache)
+        world.dialogue.start()
+
+    players = []
+    for i in range(talkers + 1):
+        player = Player(f"player{i}")
+        player.connection = Sink(player.name)
+        world.add_player(player)
+        players.append(player)
+    deadline = time.perf_counter() + seconds
+
+    async def talk(player):
+        while time.perf_counter() < deadline:
+            if player.name not in world.talking:
+                await world.handle_command(player, f"talk willow about {rng.choice(QUESTIONS)}")
+            await asyncio.sleep(0.01)
+
+    looks = []
+
+    async def look(player):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            await world.handle_command(player, "look")
+            looks.append(time.perf_counter() - start - 0.01)
+
+    await asyncio.gather(look(players[0]), *(talk(player) for player in players[1:]))
+    if mode != "inline":
+        await world.dialogue.stop()
+    looks.sort()
+    replies = sum(player.connection.replies for player in players)
+    return [mode, f"{len(looks):,}", f"{looks[len(looks) // 2] * 1000:.1f}",
+            f"{looks[int(len(looks) * 0.99)] * 1000:.1f}", f"{replies:,}", f"{model.calls:,}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the model takes per reply")
+    parser.add_argument("--talkers", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rows = [asyncio.run(run(mode, args.latency, args.talkers, args.workers, args.seconds))
+            for mode in ("inline", "pool", "pool + cache")]
+    print_table(["dialogue", "looks", "look p50 ms", "look p99 ms", "NPC replies", "model calls"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Encode cost per broadcast: one json.dumps per recipient vs one shared Frame.
+
+    python benchmarks/bench_frame_encode.py
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime
+
+from common import print_table, timed
+
+logging.disable(logging.INFO)
+
+from server import Frame  # noqa: E402
+
+MESSAGE = 'Jack the Wanderer says: "Have you seen the mist rolling in from the ravine?"'
+
+
+def per_recipient(room_size: int):
+    for _ in range(room_size):
+        json.dumps({
+            "type": "broadcast",
+            "text": MESSAGE,
+            "timestamp": datetime.now().isoformat()
+        })
+
+
+def encode_once(room_size: int):
+    frame = Frame("broadcast", MESSAGE)
+    for _ in range(room_size):
+        frame.data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=200_000,
+                        help="Approximate recipients encoded per measurement")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        repeat = max(10, args.budget // size)
+        legacy = timed(lambda: per_recipient(size), repeat)
+        shared = timed(lambda: encode_once(size), repeat)
+        rows.append((size, f"{legacy * 1e6:.1f}", f"{shared * 1e6:.1f}", f"{legacy / shared:.1f}x"))
+    print_table(("room size", "per-recipient us", "encode-once us", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
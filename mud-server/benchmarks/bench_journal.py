@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Event journal cost and recovery: a player walks, takes and drops things
+with no journal and under each fsync policy, measuring what a command
+costs on the event loop, how long the writer needs to get every event to
+disk and how many fsyncs that took. Then recovery: replaying the whole
+journal, and replaying only what came after a compactor checkpoint.
+Last, a check that restarting with both --db and --journal-dir, twice,
+brings back exactly the world that was left (exits non-zero if not).
+
+    python benchmarks/bench_journal.py --commands 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from journal import FSYNC_POLICIES, Journal  # noqa: E402
+from server import MUDWorld, Player, build_parser, build_world  # noqa: E402
+
+ROUND = ["take mushrooms", "north", "drop mushrooms", "take mushrooms", "south", "drop mushrooms"]
+
+
+class Sink:
+    """A connection that drops every frame"""
+    def __init__(self):
+        self.closed = False
+        self.batching = False
+
+    def send(self, frame) -> bool:
+        return True
+
+
+async def walk(world: MUDWorld, commands: int):
+    walker = Player("walker")
+    walker.connection = Sink()
+    world.add_player(walker)
+    for i in range(commands):
+        await world.handle_command(walker, ROUND[i % len(ROUND)])
+    world.remove_player(walker)
+
+
+async def run(fsync: str, directory: str, commands: int) -> list:
+    world = MUDWorld()
+    journal = None
+    if fsync != "off":
+        journal = Journal(directory, fsync)
+        world.attach_journal(journal)
+        journal.start(world.snapshot_rows)
+    start = time.perf_counter()
+    await walk(world, commands)
+    loop_time = time.perf_counter() - start
+    if journal:
+        events = journal.seq
+        journal.close()
+        durable = time.perf_counter() - start
+        return [fsync, f"{loop_time / commands * 1e6:.1f}", f"{events:,}", f"{durable:.2f}",
+                f"{journal.fsyncs:,}"]
+    return [fsync, f"{loop_time / commands * 1e6:.1f}", "-", "-", "-"]
+
+
+async def checkpoint_then_walk(directory: str, commands: int) -> dict:
+    world = MUDWorld()
+    journal = Journal(directory, "never")
+    world.attach_journal(journal)
+    journal.start(world.snapshot_rows)
+    result = await journal.checkpoint(world.snapshot_rows)
+    await walk(world, commands // 10)
+    journal.close()
+    return result
+
+
+def recover(directory: str) -> tuple:
+    start = time.perf_counter()
+    world = MUDWorld()
+    world.attach_journal(Journal(directory))
+    return time.perf_counter() - start, world.journal.seq
+
+
+async def session(args, commands: list) -> MUDWorld:
+    """Start the server's world from args, run commands as the keeper, then shut down as the server does"""
+    world = build_world(args)
+    if world.store:
+        world.store.start(world.collect_rows)
+    if world.journal:
+        world.journal.start(world.snapshot_rows)
+    keeper = Player("keeper")
+    keeper.connection = Sink()
+    world.restore_player(keeper)
+    world.add_player(keeper)
+    for command in commands:
+        await world.handle_command(keeper, command)
+    while world.journal and not world.journal.checkpoint_segment:  # the checkpoint a new journal starts with
+        await asyncio.sleep(0.01)
+    world.remove_player(keeper)
+    if world.store:
+        world.store.close(world.collect_rows)
+    if world.journal:
+        world.journal.close()
+    return world
+
+
+def restarts(directory: str) -> bool:
+    """A world saved in SQLite, then run and restarted twice with the journal on too"""
+    args = build_parser().parse_args(["--db", str(Path(directory) / "world.db"), "--llm-url", "",
+                                      "--snapshot-file", ""])
+    asyncio.run(session(args, ["spawn Guard"]))
+    args.journal_dir = str(Path(directory) / "journal")
+    sessions = [["take mushrooms", "create up Tower", "up", "drop mushrooms", "spawn Owl"], [], []]
+    rows = []
+    ok = True
+    for number, commands in enumerate(sessions, 1):
+        world = asyncio.run(session(args, commands))
+        names = sorted(npc.name for npc in world.npcs.values() if npc.name in ("Guard", "Owl"))
+        tower = [room for room in world.rooms.values() if room.name == "Tower"]
+        keeper = world.saved_players.get("keeper")
+        good = (names == ["Guard", "Owl"] and len(tower) == 1 and list(tower[0].objects) == ["glowing mushrooms"]
+                and keeper is not None and keeper[1] == tower[0].id)
+        ok = ok and good
+        rows.append([f"{'run' if commands else 'restart'} {number}", ", ".join(names), len(tower),
+                     ", ".join(tower[0].objects) if tower else "-", "ok" if good else "WRONG"])
+    print_table(["store + journal", "NPCs", "Towers", "Tower holds", "world"], rows)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [asyncio.run(run(fsync, str(Path(tmp) / fsync), args.commands))
+                for fsync in ("off",) + FSYNC_POLICIES]
+        print_table(["fsync", "us/command", "events", "durable after s", "fsyncs"], rows)
+
+        directory = str(Path(tmp) / "never")
+        full, events = recover(directory)
+        asyncio.run(checkpoint_then_walk(directory, args.commands))
+        compacted, last = recover(directory)
+        print_table(["recovery", "events replayed", "seconds"],
+                    [["whole journal", f"{events:,}", f"{full:.3f}"],
+                     ["checkpoint + tail", f"{last - events:,}", f"{compacted:.3f}"]])
+
+        if not restarts(str(Path(tmp) / "restarts")):
+            raise SystemExit("Restarting with both --db and --journal-dir did not bring back the same world")
+
+
+if __name__ == "__main__":
+    main()
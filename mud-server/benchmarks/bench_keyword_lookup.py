@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+examine/take/drop lookups in crowded rooms: the keyword index against the
+plain substring scan, checking both pick the same item for every query.
+
+    python benchmarks/bench_keyword_lookup.py --items 100 1000 10000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from keywords import ItemList, scan  # noqa: E402
+from server import NPC, MUDWorld, Player, npc_name  # noqa: E402
+
+ADJECTIVES = ["rusty", "glowing", "broken", "ancient", "muddy", "carved", "silver", "tiny", "heavy", "faded"]
+NOUNS = ["stone", "lantern", "feather", "coin", "acorn", "bottle", "ring", "map", "bone", "shell", "key", "pinecone"]
+
+
+def item_names(count: int, rng: random.Random):
+    return [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{i}" for i in range(count)]
+
+
+def queries(names, count: int, rng: random.Random):
+    """Substrings of real names (short and long) plus some misses"""
+    result = []
+    for _ in range(count):
+        name = rng.choice(names).lower()
+        roll = rng.random()
+        if roll < 0.1:
+            result.append("unicorn horn")
+        elif roll < 0.3:
+            start = rng.randrange(len(name) - 2)
+            result.append(name[start:start + rng.randint(1, 3)])
+        else:
+            start = rng.randrange(len(name) // 2)
+            result.append(name[start:])
+    return result
+
+
+def bench_lookup(count: int, rng: random.Random):
+    names = item_names(count, rng)
+    npcs = [NPC(f"npc_{i}", name.title(), "A bench NPC") for i, name in enumerate(item_names(count // 4 or 1, rng))]
+    objects = ItemList(names)
+    crowd = ItemList(npcs, key=npc_name)
+    targets = queries(names, 2000, rng)
+
+    start = time.perf_counter()
+    expected = [scan(names, t) or scan(npcs, t, npc_name) for t in targets]
+    scanned = (time.perf_counter() - start) / len(targets)
+
+    objects.find("x"), crowd.find("x")  # build the indexes outside the timing
+    start = time.perf_counter()
+    found = [objects.find(t) or crowd.find(t) for t in targets]
+    indexed = (time.perf_counter() - start) / len(targets)
+
+    assert found == expected, "index and scan disagree"
+    return scanned, indexed
+
+
+async def bench_take_drop(count: int, rng: random.Random) -> float:
+    world = MUDWorld()
+    player = Player("bench")
+    world.add_player(player)
+    room = world.rooms["spawn"]
+    names = item_names(count, rng)
+    for name in names:
+        room.add_object(name)
+    targets = [name.split("#")[1] for name in rng.sample(names, min(200, count))]
+    room.objects.find("x")
+    start = time.perf_counter()
+    for target in targets:
+        await world.handle_command(player, f"take #{target}")
+        await world.handle_command(player, f"drop #{target}")
+    return (time.perf_counter() - start) / (2 * len(targets))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    rows = []
+    for count in args.items:
+        scanned, indexed = bench_lookup(count, rng)
+        take_drop = asyncio.run(bench_take_drop(count, rng))
+        rows.append([count, f"{scanned * 1e6:.1f}", f"{indexed * 1e6:.1f}", f"{scanned / indexed:.1f}x",
+                     f"{take_drop * 1e6:.1f}"])
+    print_table(["items", "scan us", "index us", "speedup", "take/drop us"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+look and go with the versioned room render cache against rebuilding the room
+text every time, in rooms with a few or many objects, NPCs and players. Every
+cached render is checked against a fresh one while NPCs wander, items move
+and players come and go.
+
+    python benchmarks/bench_look.py --contents 3 30 300
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import NPC, MUDWorld, Player  # noqa: E402
+
+
+def render_uncached(world: MUDWorld, room, viewer: str) -> str:
+    """cmd_look's text as it was built before the cache"""
+    result = f"\n[{room.name}]\n{room.description}\n\n"
+    if room.objects:
+        result += f"You see: {', '.join(room.objects)}\n"
+    if room.npcs:
+        result += f"NPCs: {', '.join(npc.name for npc in room.npcs)}\n"
+    other_players = [p.name for p in world.players_in_room(room.id, exclude=viewer)]
+    if other_players:
+        result += f"Players here: {', '.join(other_players)}\n"
+    if room.exits:
+        exits = [f"{dir} ({world.rooms[rid].name if rid in world.rooms else 'Unknown'})"
+                 for dir, rid in room.exits.items()]
+        result += f"\nExits: {', '.join(exits)}\n"
+    return result
+
+
+def build_world(contents: int):
+    world = MUDWorld()
+    spawn = world.rooms["spawn"]
+    for i in range(contents):
+        spawn.add_object(f"pebble #{i}")
+        npc = NPC(f"bench_npc_{i}", f"Sprite {i}", "A bench NPC")
+        npc.room_id = "spawn"
+        world.npcs[npc.id] = npc
+        spawn.add_npc(npc)
+    players = [Player(f"walker{i}") for i in range(contents)]
+    for player in players:
+        world.add_player(player)
+    return world, players
+
+
+async def check(world: MUDWorld, players, rng: random.Random, steps: int = 2000):
+    """Random looks, moves and item/NPC churn; every look must match an uncached render"""
+    npcs = list(world.npcs.values())
+    for _ in range(steps):
+        player = rng.choice(players)
+        roll = rng.random()
+        if roll < 0.3:
+            await world.handle_command(player, rng.choice(["north", "south", "east", "west"]))
+        elif roll < 0.4:
+            await world.handle_command(player, "take pebble")
+        elif roll < 0.5:
+            await world.handle_command(player, "drop pebble")
+        elif roll < 0.6:
+            npc = rng.choice(npcs)
+            world.move_npc(npc, rng.choice(list(world.rooms[npc.room_id].exits.values())))
+        room = world.rooms[player.room_id]
+        assert world.render_room(room, player.name) == render_uncached(world, room, player.name)
+
+
+async def bench(contents: int, rng: random.Random):
+    world, players = build_world(contents)
+    await check(world, players, rng)
+    world, players = build_world(contents)
+    viewer = players[0]
+    room = world.rooms["spawn"]
+    repeat = 2000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render_uncached(world, room, viewer.name)
+    uncached = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await world.cmd_look(viewer, [])
+    cached = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat // 2):
+        await world.handle_command(viewer, "north")
+        await world.handle_command(viewer, "south")
+    go = (time.perf_counter() - start) / repeat
+    return uncached, cached, go, world.format_render_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contents", type=int, nargs="+", default=[3, 30, 300],
+                        help="objects, NPCs and players in the room")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    rows = []
+    for contents in args.contents:
+        uncached, cached, go, status = asyncio.run(bench(contents, rng))
+        rows.append([contents, f"{uncached * 1e6:.1f}", f"{cached * 1e6:.1f}", f"{uncached / cached:.1f}x",
+                     f"{go * 1e6:.1f}"])
+        print(status)
+    print_table(["contents", "rebuild us", "cached us", "speedup", "go us"], rows)
+
+
+if __name__ == "__main__":
+    main()
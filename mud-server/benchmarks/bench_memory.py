@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Bytes per room and per NPC for a large builder-grown world, loaded the way
+attach_store loads it (rows from SQLite), compared with the old dict-backed
+entities (own containers per room, datetime stamps, a fresh string for
+every id and description read back).
+
+    python benchmarks/bench_memory.py --rooms 100000 1000000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import random
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import NO_ITEMS, NPC, Room  # noqa: E402
+
+DESCRIPTION = "A newly formed space in the wilderness. It smells of possibility."
+DIRECTIONS = [("north", "south"), ("east", "west"), ("up", "down")]
+
+
+class LegacyRoom:
+    """Room as it was before slots and shared empty containers"""
+    def __init__(self, id, name, description):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.exits = {}
+        self.objects = []
+        self.npcs = []
+        self.players = set()
+        self.created_at = datetime.now()
+        self.created_by = "system"
+
+
+class LegacyNPC:
+    """NPC as it was before slots"""
+    def __init__(self, id, name, description, npc_type="wanderer"):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.type = npc_type
+        self.room_id = None
+        self.dialogue = []
+        self.inventory = []
+        self.ai_mood = random.choice(["friendly", "neutral", "mysterious", "helpful"])
+
+
+def fresh(text: str) -> str:
+    """A new string object with the same contents, like every value sqlite returns"""
+    return (text + " ")[:-1]
+
+
+def room_rows(count: int, seed: int = 1):
+    """Rows shaped like the rooms table: a builder chain with side branches"""
+    rng = random.Random(seed)
+    ids = [f"room_{1700000000 + i // 5}_{rng.randint(1000, 9999)}" for i in range(count)]
+    exits = [{} for _ in range(count)]
+    for i in range(1, count):
+        j = i - 1 if rng.random() < 0.7 else rng.randrange(i)
+        forward, back = rng.choice(DIRECTIONS)
+        exits[j][forward] = ids[i]
+        exits[i][back] = ids[j]
+    for i in range(count):
+        objects = ["pile of stones"] if rng.random() < 0.2 else []
+        yield (fresh(ids[i]), f"Builder Room {i}", fresh(DESCRIPTION), json.dumps(exits[i]),
+               json.dumps(objects), "builder", 1700000000.0 + i)
+
+
+def load_rooms(rows, compact: bool) -> dict:
+    rooms = {}
+    texts = {}
+    for room_id, name, desc, exits, objects, created_by, created_at in rows:
+        if compact:
+            room = Room(room_id, name, texts.setdefault(desc, desc))
+            room.set_exits(json.loads(exits))
+            room.objects = json.loads(objects) or NO_ITEMS
+            room.created_by = sys.intern(created_by)
+            room.created_at = created_at
+        else:
+            room = LegacyRoom(room_id, name, desc)
+            room.exits = json.loads(exits)
+            room.objects = json.loads(objects)
+            room.created_by = created_by
+            room.created_at = datetime.fromtimestamp(created_at)
+        rooms[room.id] = room
+    return rooms
+
+
+def load_npcs(rooms: dict, count: int, compact: bool) -> list:
+    room_ids = list(rooms)
+    npcs = []
+    for i in range(count):
+        room = rooms[room_ids[(i * 7919) % len(room_ids)]]
+        npc_type = fresh("wanderer")
+        if compact:
+            npc = NPC(fresh(f"npc_{1700000000 + i}_{1000 + i % 9000}"), f"Wanderer {i}",
+                      fresh("A mysterious figure"), npc_type)
+            npc.room_id = room.id
+            room.add_npc(npc)
+        else:
+            npc = LegacyNPC(fresh(f"npc_{1700000000 + i}_{1000 + i % 9000}"), f"Wanderer {i}",
+                            fresh("A mysterious figure"), npc_type)
+            npc.room_id = fresh(room.id)
+            room.npcs.append(npc)
+        npcs.append(npc)
+    return npcs
+
+
+def measure(count: int, compact: bool) -> dict:
+    """Run in a child process so every measurement starts from a clean heap"""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    rooms = load_rooms(room_rows(count), compact)
+    gc.collect()
+    room_bytes = tracemalloc.get_traced_memory()[0] - base
+    base = tracemalloc.get_traced_memory()[0]
+    npcs = load_npcs(rooms, count // 10, compact)
+    gc.collect()
+    npc_bytes = tracemalloc.get_traced_memory()[0] - base
+    return {"room": room_bytes / count, "npc": npc_bytes / len(npcs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(int(args.child[0]), args.child[1] == "compact")))
+        return
+
+    rows = []
+    for count in args.rooms:
+        result = {}
+        for variant in ("legacy", "compact"):
+            out = subprocess.run([sys.executable, __file__, "--child", str(count), variant],
+                                 check=True, capture_output=True, text=True).stdout
+            result[variant] = json.loads(out)
+        rows.append([f"{count:,}",
+                     f"{result['legacy']['room']:.0f}", f"{result['compact']['room']:.0f}",
+                     f"{result['legacy']['npc']:.0f}", f"{result['compact']['npc']:.0f}",
+                     f"{(result['legacy']['room'] - result['compact']['room']) * count / 2**20:,.0f} MB"])
+    print_table(["rooms", "B/room before", "B/room now", "B/npc before", "B/npc now", "saved (rooms)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Write-behind flush and startup load time for large builder-made worlds.
+
+    python benchmarks/bench_persistence.py --rooms 100000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from persistence import WorldStore  # noqa: E402
+from server import MUDWorld, Room  # noqa: E402
+
+
+def build(world: MUDWorld, rooms: int):
+    previous = world.rooms["spawn"]
+    for i in range(rooms):
+        room_id = f"room_{i}"
+        room = Room(room_id, f"Builder Room {i}", "A newly formed space in the wilderness. It smells of possibility.")
+        room.created_by = "builder"
+        room.objects = ["pile of stones"] if i % 3 == 0 else []
+        previous.set_exit("up", room_id)
+        room.set_exit("down", previous.id)
+        world.rooms[room_id] = room
+        world.mark_dirty("room", room_id)
+        world.mark_dirty("room", previous.id)
+        previous = room
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rooms", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "world.db"
+        world = MUDWorld()
+        store = WorldStore(db)
+        world.attach_store(store)
+        build(world, args.rooms)
+
+        start = time.perf_counter()
+        batch = world.collect_rows(store.take_dirty())
+        collect_time = time.perf_counter() - start
+        start = time.perf_counter()
+        store.start_writer()
+        store.submit(batch)
+        store.close()
+        commit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = MUDWorld()
+        loaded.attach_store(WorldStore(db))
+        load_time = time.perf_counter() - start
+        assert len(loaded.rooms) == len(world.rooms)
+
+        print_table(("rooms", "collect s", "commit s", "load s", "db MB"), [(
+            args.rooms, f"{collect_time:.2f}", f"{commit_time:.2f}", f"{load_time:.2f}",
+            f"{db.stat().st_size / 1e6:.1f}",
+        )])
+
+
+if __name__ == "__main__":
+    main()
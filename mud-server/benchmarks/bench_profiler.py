@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+What the command profiler costs: a player walks and looks around with no
+profile running, with the loop being sampled, and with every command
+traced, measuring each command on the event loop. Off must cost nothing,
+since the profiler is only wired into a command while a profile of it is
+running; sampling should be close to free and tracing is the price of
+exact numbers.
+
+    python benchmarks/bench_profiler.py --commands 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import MUDWorld, Player  # noqa: E402
+
+ROUND = ["look", "north", "look", "south"]
+
+
+class Sink:
+    """A connection that drops every frame"""
+    def __init__(self):
+        self.closed = False
+        self.batching = False
+
+    def send(self, frame) -> bool:
+        return True
+
+
+async def run(profile: str, commands: int) -> list:
+    world = MUDWorld()
+    admin = Player("keeper")
+    admin.admin = True  # as if it logged in with the admin token
+    admin.connection = Sink()
+    world.admins.add(admin.name)
+    world.add_player(admin)
+    walker = Player("walker")
+    walker.connection = Sink()
+    world.add_player(walker)
+    if profile:
+        await world.handle_command(admin, profile)
+    start = time.perf_counter()
+    for i in range(commands):
+        await world.handle_command(walker, ROUND[i % len(ROUND)])
+    elapsed = time.perf_counter() - start
+    stacks = "-"
+    if world.profile:
+        world.profile.finish()
+        await world.profile_task
+        stacks = f"{len(world.profile.weights()):,}"
+    return [profile or "off", f"{elapsed / commands * 1e6:.1f}", stacks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=20_000)
+    args = parser.parse_args()
+
+    n = args.commands
+    profiles = ["", "profile sample 300", f"profile sample look {n}", f"profile trace look {n}", "profile trace 300"]
+    rows = [asyncio.run(run(profile, n)) for profile in profiles]
+    print_table(["profile", "us/command", "stacks"], rows)
+
+
+if __name__ == "__main__":
+    main()
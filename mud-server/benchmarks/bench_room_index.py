@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Per-message broadcast and look cost as the number of connected clients grows.
+
+Every client but a fixed handful sits in its own room, so with the room
+occupancy index the cost of a `say` in the clearing should stay flat
+whether 10 or 5,000 players are online.
+
+    python benchmarks/bench_room_index.py
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from common import FakeWebSocket, print_table
+
+logging.disable(logging.INFO)
+
+from server import MUDWorld, Player, Room  # noqa: E402
+
+ROOM_OCCUPANTS = 5
+
+
+def build_world(clients: int) -> MUDWorld:
+    world = MUDWorld()
+    for i in range(clients):
+        player = Player(f"player{i}")
+        player.websocket = FakeWebSocket()
+        if i >= ROOM_OCCUPANTS:
+            room_id = f"bench_room_{i}"
+            world.rooms[room_id] = Room(room_id, f"Bench Room {i}", "An empty test room.")
+            player.room_id = room_id
+        world.add_player(player)
+    return world
+
+
+async def measure(world: MUDWorld, iterations: int):
+    speaker = world.players["player0"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await world.cmd_say(speaker, ["hello", "there"])
+    say_cost = (time.perf_counter() - start) / iterations
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await world.cmd_look(speaker, [])
+    look_cost = (time.perf_counter() - start) / iterations
+    return say_cost, look_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    rows = []
+    for clients in args.clients:
+        world = build_world(clients)
+        say_cost, look_cost = asyncio.run(measure(world, args.iterations))
+        rows.append((clients, f"{say_cost * 1e6:.1f}", f"{look_cost * 1e6:.1f}"))
+    print(f"{ROOM_OCCUPANTS} players share the clearing; everyone else is alone")
+    print_table(("clients", "say us/msg", "look us/call"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Route lookups on a large builder-grown grid: cold BFS, cached, and after
+new exits are added (incremental repair instead of a rebuild), with whole
+BFS trees cached and with the per-query bidirectional search big worlds
+use instead (forced here with tree_rooms=0).
+
+    python benchmarks/bench_routing.py --side 200
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from routing import RouteCache  # noqa: E402
+from server import MUDWorld, Room  # noqa: E402
+
+
+def build_grid(world: MUDWorld, side: int):
+    for x in range(side):
+        for y in range(side):
+            room_id = f"g{x}_{y}"
+            world.rooms[room_id] = Room(room_id, f"Grid {x},{y}", "A patch of wilderness.")
+    for x in range(side):
+        for y in range(side):
+            room = world.rooms[f"g{x}_{y}"]
+            if x + 1 < side:
+                room.set_exit("east", f"g{x + 1}_{y}")
+                world.rooms[f"g{x + 1}_{y}"].set_exit("west", room.id)
+            if y + 1 < side:
+                room.set_exit("north", f"g{x}_{y + 1}")
+                world.rooms[f"g{x}_{y + 1}"].set_exit("south", room.id)
+    world.routes.invalidate()
+
+
+def run(side: int, queries: int, tree_rooms: int) -> tuple:
+    world = MUDWorld()
+    world.routes = RouteCache(world.rooms, tree_rooms=tree_rooms)
+    build_grid(world, side)
+    rng = random.Random(1)
+    dests = [f"g{rng.randrange(side)}_{rng.randrange(side)}" for _ in range(8)]
+    sources = [f"g{rng.randrange(side)}_{rng.randrange(side)}" for _ in range(queries)]
+
+    start = time.perf_counter()
+    for dest in dests:
+        world.routes.route(sources[0], dest)
+    cold = (time.perf_counter() - start) / len(dests)
+
+    start = time.perf_counter()
+    for i, source in enumerate(sources):
+        world.routes.route(source, dests[i % len(dests)])
+    warm = (time.perf_counter() - start) / len(sources)
+
+    exits = min(100, side)
+    start = time.perf_counter()
+    for i in range(exits):
+        a, b = f"g0_{i}", f"g{side - 1}_{side - 1 - i}"
+        world.add_exit(world.rooms[a], "up", b)
+    repair = (time.perf_counter() - start) / exits
+
+    stats = world.routes.stats()
+    return ("trees" if tree_rooms else "search", len(world.rooms), f"{cold * 1000:.1f}", f"{warm * 1e6:.1f}",
+            f"{repair * 1000:.2f}", f"{stats['entries']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--side", type=int, default=200, help="Grid is side x side rooms")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rows = [run(args.side, args.queries, tree_rooms) for tree_rooms in (sys.maxsize, 0)]
+    print_table(("routes", "rooms", "first route ms", "later route us", "exit repair ms", "cached rooms"), rows)
+
+
+if __name__ == "__main__":
+    main()
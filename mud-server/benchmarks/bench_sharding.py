@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Command throughput with the world split across 1, 2, 4... shard processes.
+
+Closed-loop simulated players run a mix of commands straight against the
+shard bus (no websockets), spread over rooms that belong to different
+shards. Throughput can only scale while there are idle cores for the
+workers, so the core count is printed alongside the results.
+
+    python benchmarks/bench_sharding.py --shards 1 2 4 --players 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+import sharding  # noqa: E402
+from server import Player  # noqa: E402
+
+ROOMS = ["spawn", "forest_north", "forest_east", "forest_south", "forest_west"]
+COMMANDS = ["look", "look", "examine altar", "inventory", "who", "say hello", "path Ancient Grove", "status"]
+
+
+class Sink:
+    """Counts the frames a player is sent"""
+    closed = False
+    queue = ()
+
+    def __init__(self):
+        self.frames = 0
+
+    def send(self, frame) -> bool:
+        self.frames += 1
+        return True
+
+
+def child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def self_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def player_loop(bus, name: str, deadline: float, rng: random.Random, counts: list):
+    while time.perf_counter() < deadline:
+        await bus.command(name, rng.choice(COMMANDS))
+        counts[0] += 1
+
+
+async def run(shards: int, players: int, duration: float, zones_path: str) -> list:
+    bus = sharding.ShardBus(shards, zones_path, tick_rate=4.0)
+    await bus.start()
+    sinks = []
+    for i in range(players):
+        player = Player(f"p{i}")
+        player.room_id = ROOMS[i % len(ROOMS)]
+        sinks.append(Sink())
+        await bus.join(player, sinks[-1])
+    counts = [0]
+    front_cpu = self_cpu()
+    start = time.perf_counter()
+    rng = random.Random(7)
+    await asyncio.gather(*(player_loop(bus, f"p{i}", start + duration, random.Random(rng.random()), counts)
+                           for i in range(players)))
+    elapsed = time.perf_counter() - start
+    front_cpu = self_cpu() - front_cpu
+    workers_cpu = child_cpu()
+    await bus.stop()
+    workers_cpu = child_cpu() - workers_cpu
+    frames = sum(sink.frames for sink in sinks)
+    return [shards, players, counts[0], f"{counts[0] / elapsed:,.0f}", f"{frames / elapsed:,.0f}",
+            f"{front_cpu / elapsed * 100:.0f}%", f"{workers_cpu / elapsed * 100:.0f}%"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    # One zone per seed room, so players are spread over as many shards as possible
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({f"zone{i}": [room_id] for i, room_id in enumerate(ROOMS)}, f)
+    try:
+        print(f"{os.cpu_count()} cores available\n")
+        rows = [asyncio.run(run(shards, args.players, args.duration, f.name)) for shards in args.shards]
+        print_table(["shards", "players", "commands", "cmd/s", "frames/s", "front cpu", "shard cpu"], rows)
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
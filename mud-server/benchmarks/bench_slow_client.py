@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Command latency in a busy room with and without one stalled client.
+
+Each connection has its own writer task and bounded send queue, so a
+client whose socket never drains should only fill (and overflow) its own
+queue; the speaker's `say` latency and everyone else's delivery lag
+should look the same as in the all-fast run.
+
+    python benchmarks/bench_slow_client.py --overflow coalesce
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from common import FakeWebSocket, print_table
+
+logging.disable(logging.WARNING)
+
+from server import OVERFLOW_POLICIES, ClientConnection, MUDWorld, Player  # noqa: E402
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A mobile client on a bad link: every send takes a long time"""
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    async def send(self, data):
+        await asyncio.sleep(self.delay)
+        await super().send(data)
+
+
+async def run(room_size: int, stalled: bool, messages: int, overflow: str, queue_size: int):
+    world = MUDWorld()
+    connections = []
+    for i in range(room_size):
+        slow = stalled and i == room_size - 1
+        websocket = StalledWebSocket(0.5) if slow else FakeWebSocket()
+        player = Player(f"player{i}")
+        player.websocket = websocket
+        player.connection = ClientConnection(websocket, queue_size, overflow)
+        player.connection.start()
+        connections.append(player.connection)
+        world.add_player(player)
+
+    speaker = world.players["player0"]
+    latencies = []
+    for n in range(messages):
+        start = time.perf_counter()
+        await world.cmd_say(speaker, ["message", str(n)])
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+    await asyncio.sleep(0.05)
+    fast = connections[:-1] if stalled else connections
+    delivery = max(c.max_lag for c in fast)
+    slow = connections[-1].stats()
+    for c in connections:
+        await c.close()
+    return latencies, delivery, slow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--room-size", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="drop_oldest")
+    args = parser.parse_args()
+
+    rows = []
+    for stalled in (False, True):
+        latencies, delivery, slow = asyncio.run(
+            run(args.room_size, stalled, args.messages, args.overflow, args.queue_size))
+        latencies.sort()
+        rows.append((
+            "one stalled" if stalled else "all fast",
+            f"{statistics.median(latencies) * 1e6:.0f}",
+            f"{latencies[int(len(latencies) * 0.99)] * 1e6:.0f}",
+            f"{delivery * 1000:.2f}",
+            slow["dropped"] + slow["coalesced"] if stalled else "-",
+        ))
+    print(f"room of {args.room_size}, {args.messages} says, overflow={args.overflow}")
+    print_table(("clients", "say p50 us", "say p99 us", "fast max lag ms", "slow shed"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Binary snapshot save and restore for large worlds: file size, how long the
+event loop pauses for a background snapshot, and a full restore (read,
+decode, rebuild every room and NPC) next to loading the same world from
+the SQLite store.
+
+    python benchmarks/bench_snapshot.py --rooms 100000 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+import snapshot  # noqa: E402
+from persistence import WorldStore  # noqa: E402
+from server import NPC, MUDWorld, Room  # noqa: E402
+
+DIRECTIONS = [("north", "south"), ("east", "west"), ("up", "down")]
+
+
+def build(count: int, seed: int = 1) -> MUDWorld:
+    """A builder-grown world: a long chain with side branches, some objects, one NPC per ten rooms"""
+    rng = random.Random(seed)
+    world = MUDWorld()
+    previous = [world.rooms["spawn"]]
+    for i in range(count):
+        room = Room(f"room_{1700000000 + i // 5}_{rng.randint(1000, 9999)}_{i}", f"Builder Room {i}",
+                    "A newly formed space in the wilderness. It smells of possibility.")
+        room.created_by = "builder"
+        if rng.random() < 0.2:
+            room.add_object("pile of stones")
+        parent = previous[-1] if rng.random() < 0.7 else rng.choice(previous)
+        forward, back = rng.choice(DIRECTIONS)
+        parent.set_exit(forward, room.id)
+        room.set_exit(back, parent.id)
+        world.rooms[room.id] = room
+        previous.append(room)
+        if i % 10 == 0:
+            npc = NPC(f"npc_{i}", f"Wanderer {i}", "A mysterious figure")
+            world.npcs[npc.id] = npc
+            world.move_npc(npc, room.id)
+    return world
+
+
+async def background_pause(world: MUDWorld, path: str) -> dict:
+    return await snapshot.save_background(path, world.snapshot_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.rooms:
+            world = build(count)
+            path = str(Path(tmp) / "world.snap")
+
+            start = time.perf_counter()
+            size = snapshot.save(path, *world.snapshot_rows())
+            save_time = time.perf_counter() - start
+            background = asyncio.run(background_pause(world, path))
+
+            start = time.perf_counter()
+            restored = MUDWorld()
+            restored.apply_snapshot(snapshot.load(path))
+            restore_time = time.perf_counter() - start
+            assert len(restored.rooms) == len(world.rooms) and len(restored.npcs) == len(world.npcs)
+            assert all(restored.rooms[room_id].exits == room.exits for room_id, room in world.rooms.items())
+
+            db = Path(tmp) / f"world_{count}.db"
+            store = WorldStore(db)
+            store.start_writer()
+            store.submit(world.collect_rows({"room": set(world.rooms), "npc": set(world.npcs), "player": set()}))
+            store.close()
+            del world
+            start = time.perf_counter()
+            MUDWorld().attach_store(WorldStore(db))
+            sqlite_time = time.perf_counter() - start
+
+            rows.append([f"{count:,}", f"{size / 2**20:.1f}", f"{save_time:.2f}",
+                         f"{background['paused'] * 1000:.1f}", f"{background['seconds']:.2f}",
+                         f"{restore_time:.2f}", f"{sqlite_time:.2f}"])
+    print_table(["rooms", "MB", "save s", "bg pause ms", "bg total s", "restore s", "sqlite load s"], rows)
+
+
+if __name__ == "__main__":
+    main()
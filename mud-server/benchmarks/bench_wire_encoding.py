@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and CPU per message for each client encoding (JSON text,
+msgpack) under each permessage-deflate preset, replaying the frames a few
+players actually receive in a seeded simulation: room descriptions, command
+responses, broadcasts, ambiance and delta-mode room state. Deflate runs the
+way websockets does it, one compressor per connection with context
+takeover, so repeated keys and room text shrink across messages.
+
+    python benchmarks/bench_wire_encoding.py --players 20 --ticks 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import zlib
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+from server import DEFLATE_PRESETS, ENCODINGS, Frame, MUDWorld, Player, msgpack  # noqa: E402
+
+SYNC_TAIL = b"\x00\x00\xff\xff"  # what permessage-deflate strips from every compressed message
+
+
+class Recorder:
+    """A connection that keeps the frames it is sent"""
+    def __init__(self):
+        self.closed = False
+        self.batching = False
+        self.frames = []
+
+    def send(self, frame) -> bool:
+        self.frames.append(frame)
+        return True
+
+
+async def record(players: int, ticks: int, seed: int = 11):
+    """Every frame a handful of watching players receive, in order"""
+    random.seed(seed)
+    world = MUDWorld()
+    for i in range(6):
+        world.rooms["spawn"].add_object(f"acorn {i}")
+    walkers = []
+    for i in range(players):
+        walker = Player(f"walker{i}", is_agent=i % 3 == 0)
+        walker.connection = Recorder()
+        if i % 2:
+            walker.capabilities = {"delta"}
+        world.add_player(walker)
+        walkers.append(walker)
+    commands = ["north", "south", "east", "west", "look", "take acorn", "drop acorn", "say well met", "who"]
+    for tick in range(ticks):
+        for walker in walkers:
+            if random.random() < 0.3:
+                text = await world.handle_command(walker, random.choice(commands))
+                if text:
+                    walker.connection.send(Frame("response", text))
+        await world.tick_npc_wander(tick)
+        await world.tick_ambiance(tick)
+    return [frame for walker in walkers[:4] for frame in walker.connection.frames]
+
+
+def deflater(preset: str):
+    settings = DEFLATE_PRESETS[preset]
+    if settings is None:
+        return None, None
+    bits = settings["server_max_window_bits"]
+    return (zlib.compressobj(wbits=-bits, **settings["compress_settings"]),
+            zlib.decompressobj(wbits=-bits))
+
+
+def replay(frames, encoding: str, preset: str):
+    """(bytes, server seconds, client seconds) for sending every frame"""
+    compressor, decompressor = deflater(preset)
+    loads = json.loads if encoding == "json" else msgpack.unpackb
+    total = server_time = client_time = 0
+    for frame in frames:
+        frame._data = frame._packed = None
+        start = time.perf_counter()
+        data = frame.encode(encoding)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            data = data[:-4]
+        server_time += time.perf_counter() - start
+        total += len(data)
+        start = time.perf_counter()
+        if decompressor:
+            data = decompressor.decompress(data + SYNC_TAIL)
+        loads(data)
+        client_time += time.perf_counter() - start
+    return total, server_time, client_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    frames = asyncio.run(record(args.players, args.ticks))
+    kinds = {}
+    for frame in frames:
+        kinds[frame.type] = kinds.get(frame.type, 0) + 1
+    print(f"{len(frames)} frames: " + ", ".join(f"{kind} {count}" for kind, count in sorted(kinds.items())))
+    if "msgpack" not in ENCODINGS:
+        print("msgpack is not installed; showing JSON only")
+
+    rows = []
+    baseline = None
+    for encoding in sorted(ENCODINGS):
+        for preset in ("off", "fast", "default", "small"):
+            total, server_time, client_time = replay(frames, encoding, preset)
+            baseline = baseline or total
+            rows.append([encoding, preset, f"{total / len(frames):.0f}", f"{total / baseline:.0%}",
+                         f"{server_time / len(frames) * 1e6:.2f}", f"{client_time / len(frames) * 1e6:.2f}"])
+    print_table(["encoding", "deflate", "bytes/msg", "vs json", "server us/msg", "client us/msg"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+How the world holds up as it grows: worldgen builds a seeded wilderness of
+1k, 100k and 1M rooms, then a player walks it (go), looks around in the
+rooms they reach (look), a crowded room hears broadcasts, the NPC wander
+tick runs, and path finds routes to random rooms. Per-operation costs that
+climb with the room count are the ones players would notice first.
+
+    python benchmarks/bench_world_scale.py --rooms 1000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import time
+
+from common import print_table
+
+logging.disable(logging.INFO)
+
+import worldgen  # noqa: E402
+from server import MUDWorld, Player  # noqa: E402
+
+
+class Sink:
+    """A connection that only counts frames"""
+    def __init__(self):
+        self.closed = False
+        self.batching = False
+        self.frames = 0
+
+    def send(self, frame) -> bool:
+        self.frames += 1
+        return True
+
+
+async def measure(rooms: int, seed: int, steps: int = 5000):
+    start = time.perf_counter()
+    world = MUDWorld()
+    world.populate(worldgen.generate(rooms, seed))
+    build = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rng = random.Random(seed)
+
+    walker = Player("walker")
+    walker.connection = Sink()
+    world.add_player(walker)
+    await world.handle_command(walker, "down")
+    directions = []
+    start = time.perf_counter()
+    for _ in range(steps):
+        direction = rng.choice(list(world.rooms[walker.room_id].exits))
+        directions.append(direction)
+        await world.cmd_go(walker, [direction])
+    go = (time.perf_counter() - start) / steps
+
+    start = time.perf_counter()
+    for direction in directions[:1000]:
+        await world.cmd_look(walker, [])
+        world.move_player(walker, world.rooms[walker.room_id].exits.get(direction, walker.room_id))
+    look = (time.perf_counter() - start) / 1000
+
+    crowd = []
+    for i in range(20):
+        listener = Player(f"listener{i}")
+        listener.connection = Sink()
+        world.add_player(listener)
+        crowd.append(listener)
+    start = time.perf_counter()
+    for _ in range(1000):
+        await world.broadcast("A twig snaps somewhere nearby.", "spawn")
+    broadcast = (time.perf_counter() - start) / 1000
+
+    start = time.perf_counter()
+    for tick in range(5):
+        await world.tick_npc_wander(tick)
+    npc_tick = (time.perf_counter() - start) / 5
+
+    targets = rng.sample(list(world.rooms), 5)
+    start = time.perf_counter()
+    for target in targets:
+        await world.cmd_path(walker, [target])
+    path = (time.perf_counter() - start) / len(targets)
+    return [f"{rooms:,}", f"{len(world.npcs):,}", f"{build:.2f}", f"{rss:.0f}", f"{go * 1e6:.1f}",
+            f"{look * 1e6:.1f}", f"{broadcast * 1e6:.1f}", f"{npc_tick * 1000:.2f}", f"{path * 1000:.1f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = [asyncio.run(measure(rooms, args.seed)) for rooms in sorted(args.rooms)]
+    print_table(["rooms", "npcs", "build s", "peak RSS MB", "go us", "look us", "broadcast us",
+                 "npc tick ms", "path ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
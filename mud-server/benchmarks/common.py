@@ -0,0 +1,43 @@
+"""
+Shared helpers for the MUD server benchmarks
+"""
+
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+class FakeWebSocket:
+    """Stand-in for a websocket connection that only counts what it is sent"""
+    def __init__(self):
+        self.closed = False
+        self.sent = 0
+        self.bytes_sent = 0
+
+    async def send(self, data):
+        self.sent += 1
+        self.bytes_sent += len(data)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed = True
+
+
+def timed(fn, repeat: int) -> float:
+    """Run fn repeat times and return mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def print_table(headers, rows):
+    """Print a simple fixed-width results table"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,295 @@
+"""
+NPC dialogue from a local LLM for the Harris Wilderness MUD
+
+An LLM reply takes seconds, far too long to wait for on the event loop.
+Talk requests go into a bounded queue instead, and a fixed number of
+worker tasks take them one at a time and call an Ollama-compatible
+/api/chat endpoint, so at most `workers` requests are ever in flight and
+each is abandoned after `timeout` seconds. Whoever submits a request
+gets the reply (or None on a timeout or error) through its callback and
+decides what the players see; a full queue is refused up front.
+
+Players ask NPCs the same few things over and over, so replies can be
+kept in a DialogueCache keyed by NPC, mood and the normalized words
+asked: LRU-bounded, each entry expiring after a TTL, and optionally
+holding several replies per key to pick from so a cached NPC doesn't
+parrot one line.
+
+The HTTP client is a few lines of asyncio streams, so there is nothing
+extra to install:
+
+    client = OllamaClient("http://localhost:11434", "llama3.1")
+    pool = DialoguePool(client, workers=2, timeout=20, cache=DialogueCache(1024, ttl=600))
+    pool.register_metrics(registry)
+    pool.start()
+    key = (npc_id, mood, normalize(words))
+    reply = pool.cache.get(key)  # None: not cached (yet)
+    pool.submit(messages, deliver, key)  # False if the queue is full; deliver(reply or None) runs later
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_REPLY = 600  # characters of a reply kept; models ramble
+REPLY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+RESTART_DELAY = 1.0  # seconds before a worker that died is replaced, so a persistent fault can't spin
+
+
+class DialogueError(Exception):
+    """The endpoint answered, but not with a usable reply"""
+
+
+class OllamaClient:
+    """POSTs chat requests to an Ollama-compatible server, one connection per request"""
+    def __init__(self, url: str = "http://localhost:11434", model: str = "llama3.1", max_tokens: int = 120):
+        parts = urlsplit(url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.secure else 80)
+        self.path = parts.path.rstrip("/") + "/api/chat"
+        self.model = model
+        self.max_tokens = max_tokens
+
+    async def chat(self, messages: List[dict]) -> str:
+        """The assistant's reply to messages ([{"role": ..., "content": ...}, ...])"""
+        body = json.dumps({"model": self.model, "messages": messages, "stream": False,
+                           "options": {"num_predict": self.max_tokens}}).encode()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.secure or None)
+        try:
+            writer.write(f"POST {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+            status = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if "content-length" in headers:
+                data = await reader.readexactly(int(headers["content-length"]))
+            else:
+                data = await reader.read()
+                if headers.get("transfer-encoding", "").lower() == "chunked":
+                    data = dechunk(data)
+        finally:
+            writer.close()
+        if len(status) < 2 or status[1] != "200":
+            raise DialogueError(f"{self.path} answered {' '.join(status[1:]) or 'nothing'}")
+        try:
+            reply = json.loads(data)["message"]["content"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise DialogueError(f"unexpected reply from {self.path}: {e}")
+        return reply.strip()[:MAX_REPLY]
+
+
+def dechunk(data: bytes) -> bytes:
+    """The body of a chunked HTTP/1.1 response"""
+    body = []
+    offset = 0
+    while True:
+        end = data.index(b"\r\n", offset)
+        size = int(data[offset:end].split(b";")[0], 16)
+        if size == 0:
+            return b"".join(body)
+        body.append(data[end + 2:end + 2 + size])
+        offset = end + 2 + size + 2
+
+
+def normalize(words: str) -> str:
+    """What was asked, with case, punctuation and spacing that don't change the question removed"""
+    return " ".join(re.findall(r"[a-z0-9']+", words.lower()))
+
+
+class DialogueCache:
+    """Recent replies by key: least recently used evicted past `size`, each expiring `ttl` seconds after it was made"""
+    def __init__(self, size: int = 1024, ttl: float = 600.0, variants: int = 1):
+        self.size = size
+        self.ttl = ttl
+        self.variants = max(1, variants)  # replies gathered per key before it is served from the cache
+        self.entries: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [created, replies, seconds per reply]
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0  # generation time hits did not have to spend
+        self.hit_counter = None
+        self.miss_counter = None
+        self.saved_counter = None
+
+    def register_metrics(self, registry):
+        registry.gauge("dialogue_cache_entries", "NPC replies held in the dialogue cache", lambda: len(self.entries))
+        self.hit_counter = registry.counter(
+            "dialogue_cache_hits_total", "Talk requests answered from the dialogue cache")
+        self.miss_counter = registry.counter(
+            "dialogue_cache_misses_total", "Talk requests the dialogue cache could not answer")
+        self.saved_counter = registry.counter(
+            "dialogue_cache_saved_seconds_total", "Reply generation time the dialogue cache saved")
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """A cached reply, or None if there is none or the key still needs more variants"""
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None or len(entry[1]) < self.variants:
+            self.misses += 1
+            if self.miss_counter:
+                self.miss_counter.inc()
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += entry[2]
+        if self.hit_counter:
+            self.hit_counter.inc()
+            self.saved_counter.inc(amount=entry[2])
+        return random.choice(entry[1])
+
+    def put(self, key: Hashable, reply: str, seconds: float):
+        """Keep a freshly generated reply that took `seconds` to make"""
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            entry = self.entries[key] = [time.monotonic(), [], 0.0]
+        replies = entry[1]
+        if len(replies) < self.variants:
+            replies.append(reply)
+            entry[2] += (seconds - entry[2]) / len(replies)  # running mean
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        asked = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / asked if asked else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+class DialoguePool:
+    """A bounded queue of chat requests drained by a fixed number of worker tasks"""
+    def __init__(self, client, workers: int = 2, max_queue: int = 32, timeout: float = 20.0,
+                 cache: Optional[DialogueCache] = None):
+        self.client = client  # anything with: async chat(messages) -> str
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.Queue] = None  # made in start(), on the loop that serves it
+        self.busy = 0
+        self._tasks: List[asyncio.Task] = []
+        self.requests = None
+        self.latency = None
+
+    def register_metrics(self, registry):
+        registry.gauge("dialogue_queue_depth", "Talk requests waiting for a dialogue worker", self.queued)
+        registry.gauge("dialogue_in_flight", "Talk requests a dialogue worker is waiting on", lambda: self.busy)
+        self.requests = registry.counter(
+            "dialogue_requests_total", "Talk requests, by how they ended", ("result",))
+        self.latency = registry.histogram("dialogue_seconds", "Time from a worker taking a talk request to its reply",
+                                          buckets=REPLY_BUCKETS)
+        if self.cache:
+            self.cache.register_metrics(registry)
+
+    def queued(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    def submit(self, messages: List[dict], deliver: Callable[[Optional[str]], Awaitable],
+               key: Optional[Hashable] = None) -> bool:
+        """Queue a request; deliver(reply) is awaited with the text, or None if it failed. False if full
+
+        A successful reply is put in the cache under key, if both are given.
+        """
+        try:
+            if self.queue is None:
+                raise asyncio.QueueFull
+            self.queue.put_nowait((messages, deliver, key))
+        except asyncio.QueueFull:
+            self._count("rejected")
+            return False
+        return True
+
+    def _count(self, result: str):
+        if self.requests:
+            self.requests.inc(result)
+
+    async def _work(self, delay: float = 0.0):
+        await asyncio.sleep(delay)
+        while True:
+            messages, deliver, key = await self.queue.get()
+            reply = None
+            try:
+                reply = await self._ask(messages, key)
+            finally:  # whatever happened, the submitter hears back
+                try:
+                    await deliver(reply)
+                except Exception:
+                    logger.exception("💬 Delivering a dialogue reply failed")
+
+    async def _ask(self, messages: List[dict], key: Optional[Hashable]) -> Optional[str]:
+        """One chat request: the reply, cached under key, or None if it timed out or failed"""
+        self.busy += 1
+        start = time.perf_counter()
+        try:
+            reply = await asyncio.wait_for(self.client.chat(messages), self.timeout)
+            self._count("ok")
+        except asyncio.TimeoutError:
+            self._count("timeout")
+            return None
+        except (OSError, EOFError, ValueError, DialogueError) as e:
+            self._count("error")
+            logger.warning(f"💬 Dialogue request failed: {e}")
+            return None
+        except Exception:
+            self._count("error")
+            logger.exception("💬 Dialogue request failed unexpectedly")
+            return None
+        finally:
+            self.busy -= 1
+            if self.latency:
+                self.latency.observe(time.perf_counter() - start)
+        if reply and key is not None and self.cache:
+            self.cache.put(key, reply, time.perf_counter() - start)
+        return reply
+
+    def _spawn(self, delay: float = 0.0) -> asyncio.Task:
+        task = asyncio.create_task(self._work(delay))
+        task.add_done_callback(self._worker_done)
+        return task
+
+    def _worker_done(self, task: asyncio.Task):
+        if task.cancelled() or task not in self._tasks:
+            return
+        logger.error(f"💬 Dialogue worker died; starting another in {RESTART_DELAY:g}s", exc_info=task.exception())
+        self._tasks[self._tasks.index(task)] = self._spawn(RESTART_DELAY)
+
+    def start(self):
+        self.queue = asyncio.Queue(self.max_queue)
+        self._tasks = [self._spawn() for _ in range(self.workers)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"queued": self.queued(), "in_flight": self.busy, "workers": self.workers}
@@ -0,0 +1,80 @@
+"""
+Websocket front end for multi-process deployments of the Harris Wilderness MUD
+
+Shares the per-connection protocol work with MUDServer (server.SessionServer:
+name and capability negotiation, JSON, rate limiting, bounded output
+queues, heartbeats and idle reaping) but runs no game logic: every command
+goes to a backend living in other processes. The backend is duck-typed:
+
+    await backend.start() / await backend.stop()
+    await backend.join(player, connection) -> room text ("" for delta clients), or None if refused
+    await backend.command(name, line) -> response text
+    await backend.batch(name, batch) -> "results" Frame (see server.run_batch)
+    await backend.route(name, query) -> Frame
+    backend.leave(name, is_agent)
+    backend.register_metrics(registry)
+    await backend.wait_closed() -> returns if the backend is gone for good; the front end then stops
+
+Frames the backend receives for a player are queued on the connection it
+was given at join.
+"""
+
+import logging
+
+from metrics import MetricsRegistry
+from server import ClientConnection, CommandSession, Frame, Player, SessionServer, cancel_on_signals
+
+logger = logging.getLogger(__name__)
+
+
+class FrontendServer(SessionServer):
+    """Websockets, rate limits and output queues, with game logic behind a backend"""
+    def __init__(self, backend, host: str = "localhost", port: int = 4008, **options):
+        super().__init__(MetricsRegistry(), host, port, **options)
+        self.backend = backend
+        backend.register_metrics(self.metrics)
+
+    async def run_command(self, session: CommandSession, request):
+        """Forward one scheduled request and queue its response"""
+        if session.connection.closed:
+            return
+        kind, payload = request
+        session.connection.commands += 1
+        if kind == "route":
+            session.connection.send(await self.backend.route(session.player.name, payload))
+            return
+        if kind == "batch":
+            session.connection.send(await self.backend.batch(session.player.name, payload))
+            return
+        result = await self.backend.command(session.player.name, payload)
+        if result:
+            session.connection.send(Frame("response", result))
+
+    async def join(self, joining: Player, connection: ClientConnection):
+        """Join the player through the backend, which may refuse them"""
+        look_result = await self.backend.join(joining, connection)
+        if look_result is None:
+            return None
+        if look_result:
+            connection.send(Frame("room", look_result, timestamp=False))
+        logger.info(f"👤 Player connected: {joining.name} {'(AI)' if joining.is_agent else ''}")
+        return joining
+
+    async def leave(self, player: Player, connection: ClientConnection):
+        self.backend.leave(player.name, player.is_agent)
+        logger.info(f"👋 Player disconnected: {player.name}")
+
+    async def start(self):
+        """Start the backend, then serve websockets until cancelled or the backend goes away"""
+        cancel_on_signals()
+        await self.backend.start()
+        await self.start_sessions()
+        try:
+            async with self.serve():
+                logger.info(f"✅ Front end listening on ws://{self.host}:{self.port}")
+                await self.backend.wait_closed()
+                logger.error("💥 Backend gone: front end no longer accepting players")
+        finally:
+            await self.reaper.stop()
+            await self.scheduler.stop()
+            await self.backend.stop()
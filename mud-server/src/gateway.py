@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Gateway mode for the Harris Wilderness MUD
+
+Splits protocol work from game logic. Several gateway processes accept
+websocket clients on the same port (SO_REUSEPORT lets the kernel spread
+connections across them) and do the websocket framing, JSON, rate
+limiting and output queueing (frontend.py). They forward compact
+marshal-encoded messages over a Unix socket to a single simulation
+process, whose event loop runs MUDWorld and nothing else: no JSON, no
+websocket writes.
+
+    python src/gateway.py --gateways 4 [server options]
+
+The process started is the simulation; it spawns the gateways with the
+same options. Persistence, ticks and /metrics all live in the simulation.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from typing import Dict, Optional, Set
+
+import ipc
+from frontend import FrontendServer
+from metrics import LoopLagMonitor, MetricsHTTPServer
+from server import (Frame, MUDWorld, Player, build_parser, build_world, cancel_on_signals, frontend_kwargs,
+                    run_batch)
+
+logger = logging.getLogger(__name__)
+
+CODEC = "marshal"  # both ends are the same interpreter on the same box
+
+
+class Simulation:
+    """The simulation process: one MUDWorld served to every gateway"""
+    def __init__(self, world: MUDWorld, socket_path: str):
+        self.world = world
+        self.socket_path = socket_path
+        self.gateways: Dict[int, ipc.Outbox] = {}
+        self.loop_lag = LoopLagMonitor()
+        self._server = None
+        self.messages = 0
+        world.metrics.gauge("gateways", "Connected gateway processes", lambda: len(self.gateways))
+        world.metrics.gauge("gateway_messages", "Messages received from gateways", lambda: self.messages)
+        world.metrics.gauge("event_loop_lag_seconds", "How late the event loop last woke a sleeping task",
+                            lambda: self.loop_lag.lag)
+
+    async def start(self):
+        self._server = await ipc.serve_unix(self._serve_gateway, self.socket_path, CODEC)
+        self.loop_lag.start()
+
+    async def stop(self):
+        self.loop_lag.stop()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve_gateway(self, channel: ipc.Channel):
+        hello = await channel.recv()
+        if not hello or hello.get("op") != "hello":
+            await channel.close()
+            return
+        index = hello["gateway"]
+        outbox = ipc.Outbox(channel)
+        self.gateways[index] = outbox
+        names: Set[str] = set()
+        # Each player's requests run in order, but as tasks: one waiting on a route search or a
+        # restore must not hold up everyone else on this gateway
+        tasks = ipc.OrderedTasks()
+        logger.info(f"🔌 Gateway {index} connected")
+        try:
+            async for message in channel:
+                self.messages += 1
+                tasks.submit(message.get("name"), lambda message=message: self.dispatch(outbox, names, message))
+                await channel.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.gateways[index]
+            for name in names:
+                await self.leave(name)
+            logger.info(f"🔌 Gateway {index} disconnected")
+
+    async def dispatch(self, outbox: ipc.Outbox, names: Set[str], message: dict):
+        world = self.world
+        op = message["op"]
+        if op == "command":
+            player = world.players.get(message["name"])
+            text = await world.handle_command(player, message["line"]) if player else ""
+            outbox.send({"op": "reply", "id": message["id"], "text": text})
+        elif op == "batch":
+            player = world.players.get(message["name"])
+            if player:
+                frame = await run_batch(lambda line: world.execute(player, line), message["batch"])
+            else:
+                frame = Frame("results", None, results=[], completed=0, total=0, stopped="error", ms=0.0)
+            outbox.send({"op": "reply", "id": message["id"], "frame": frame.to_dict()})
+        elif op == "route":
+            player = world.players.get(message["name"])
+            frame = await world.route_frame(player, message["query"]) if player else Frame("route", "", found=False)
+            outbox.send({"op": "reply", "id": message["id"], "frame": frame.to_dict()})
+        elif op == "join":
+            name = message["name"]
+            if name in world.players:
+                outbox.send({"op": "reply", "id": message["id"], "text": None})
+                return
+            player = Player(name, message["is_agent"])
+            player.capabilities = set(message["capabilities"])
+            player.admin = message["admin"]
+            player.connection = ipc.RemoteConnection(outbox, name)
+            world.restore_player(player)
+            world.add_player(player)
+            names.add(name)
+            outbox.send({"op": "reply", "id": message["id"], "text": await world.arrival_text(player)})
+            await world.broadcast(f"{name} materializes from the void!", player.room_id, name,
+                                  delta={"op": "player_joined", "name": name})
+        elif op == "leave":
+            if message["name"] in names:
+                names.discard(message["name"])
+                await self.leave(message["name"])
+        else:
+            logger.warning(f"Simulation got unknown message: {op}")
+
+    async def leave(self, name: str):
+        player = self.world.players.get(name)
+        if player:
+            self.world.remove_player(player)
+            await self.world.broadcast(f"{name} fades into the mist...", player.room_id,
+                                       delta={"op": "player_left", "name": name})
+
+
+class SimulationClient:
+    """A gateway's link to the simulation process (the FrontendServer backend)"""
+    def __init__(self, index: int, socket_path: str):
+        self.index = index
+        self.socket_path = socket_path
+        self.channel: Optional[ipc.Channel] = None
+        self.requests = ipc.Requests()
+        self.connections: Dict[str, object] = {}  # player name -> ClientConnection
+        self._task = None
+
+    async def start(self):
+        self.channel = await ipc.connect_unix(self.socket_path, CODEC)
+        self.channel.send({"op": "hello", "gateway": self.index})
+        self._task = asyncio.create_task(self._read())
+
+    async def stop(self):
+        if self.channel:
+            await self.channel.close()
+        if self._task:
+            self._task.cancel()
+
+    async def wait_closed(self):
+        """Returns once the simulation process has gone away"""
+        await self._task
+
+    async def _read(self):
+        async for message in self.channel:
+            if message["op"] == "deliver":
+                frame = Frame.from_dict(message["frame"])
+                for name in message["to"]:
+                    connection = self.connections.get(name)
+                    if connection:
+                        connection.send(frame)
+            elif message["op"] == "reply":
+                self.requests.resolve(message)
+        logger.error(f"💥 Gateway {self.index} lost the simulation process")
+        self.requests.fail(ConnectionError("simulation went away"))
+
+    def register_metrics(self, registry):
+        registry.gauge("players_connected", "Players on this gateway", lambda: len(self.connections))
+
+    async def join(self, player: Player, connection) -> Optional[str]:
+        if player.name in self.connections:  # already playing through this gateway
+            return None
+        self.connections[player.name] = connection  # before the reply, so frames sent during the join arrive
+        reply = await self.requests.send(self.channel, {
+            "op": "join", "name": player.name, "is_agent": player.is_agent,
+            "capabilities": sorted(player.capabilities), "admin": player.admin})
+        if reply["text"] is None and self.connections.get(player.name) is connection:
+            del self.connections[player.name]
+        return reply["text"]
+
+    async def command(self, name: str, line: str) -> str:
+        reply = await self.requests.send(self.channel, {"op": "command", "name": name, "line": line})
+        return reply["text"]
+
+    async def batch(self, name: str, batch: dict) -> Frame:
+        reply = await self.requests.send(self.channel, {"op": "batch", "name": name, "batch": batch})
+        return Frame.from_dict(reply["frame"])
+
+    async def route(self, name: str, query) -> Frame:
+        reply = await self.requests.send(self.channel, {"op": "route", "name": name, "query": str(query)})
+        return Frame.from_dict(reply["frame"])
+
+    def leave(self, name: str, is_agent: bool = False):
+        self.connections.pop(name, None)
+        self.channel.send({"op": "leave", "name": name})
+
+
+def front_end(backend, args, metrics_port: int = 0) -> FrontendServer:
+    options = dict(frontend_kwargs(args), metrics_port=metrics_port, reuse_port=True)
+    return FrontendServer(backend, args.host, args.port, **options)
+
+
+async def run_simulation(args):
+    """Run the world, then spawn the gateways and wait"""
+    cancel_on_signals()
+    world = build_world(args)
+    socket_dir = tempfile.mkdtemp(prefix="mud-sim-")
+    socket_path = os.path.join(socket_dir, "sim.sock")
+    simulation = Simulation(world, socket_path)
+    metrics_http = MetricsHTTPServer(world.metrics, port=args.metrics_port) if args.metrics_port else None
+    gateways = []
+    try:
+        await simulation.start()
+        world.clock.start()
+        if world.store:
+            world.store.start(world.collect_rows)
+        if world.journal:
+            world.journal.start(world.snapshot_rows)
+        if world.dialogue:
+            world.dialogue.start()
+        if metrics_http:
+            await metrics_http.start()
+        for index in range(args.gateways):
+            argv = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:] + [
+                "--gateway-worker", str(index), "--sim", socket_path]
+            gateways.append(await asyncio.create_subprocess_exec(*argv))
+        logger.info(f"🚀 Simulation running behind {args.gateways} gateways on ws://{args.host}:{args.port}")
+        await asyncio.gather(*(process.wait() for process in gateways))
+        logger.error("💥 Every gateway has exited")
+    finally:
+        for process in gateways:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+        await world.clock.stop()
+        if world.dialogue:
+            await world.dialogue.stop()
+        await simulation.stop()
+        if world.store:
+            world.store.close(world.collect_rows)
+            logger.info("💾 World saved")
+        if world.journal:
+            world.journal.close()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = build_parser()
+    parser.description = "Harris Wilderness MUD Server (gateway processes + one simulation)"
+    parser.add_argument("--gateways", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Websocket gateway processes (default: one per spare core)")
+    parser.add_argument("--gateway-worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--sim", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    try:
+        if args.gateway_worker is not None:
+            asyncio.run(front_end(SimulationClient(args.gateway_worker, args.sim), args).start())
+            sys.exit(1)  # start() only returns once the simulation is gone
+        else:
+            asyncio.run(run_simulation(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("\n🛑 Server shutting down...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Local IPC for the Harris Wilderness MUD
+
+Length-prefixed messages over asyncio streams, used between the processes
+of a sharded or gateway deployment on one Linux box (Unix domain sockets).
+Messages are dicts of plain values, encoded as JSON or, where both ends are
+the same Python build and speed matters, with marshal.
+
+Also here: the bits both deployments share on top of a channel, namely
+request/reply tracking, an outbox that sends a frame meant for many
+players as one message, and per-player ordering for requests served as
+tasks so the channel keeps being read while one of them waits.
+"""
+
+import asyncio
+import json
+import logging
+import marshal
+import struct
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("!I")
+MAX_MESSAGE = 64 * 1024 * 1024
+STREAM_LIMIT = 1024 * 1024
+
+CODECS = {
+    "json": (lambda message: json.dumps(message, separators=(",", ":")).encode(), json.loads),
+    "marshal": (marshal.dumps, marshal.loads),
+}
+
+
+def encode(message: dict, codec: str = "json") -> bytes:
+    payload = CODECS[codec][0](message)
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_message(reader: asyncio.StreamReader, codec: str = "json") -> Optional[dict]:
+    """Next message from the stream, or None once the peer has gone away"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+        (size,) = HEADER.unpack(header)
+        if size > MAX_MESSAGE:
+            raise ValueError(f"IPC message too large: {size} bytes")
+        return CODECS[codec][1](await reader.readexactly(size))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class Channel:
+    """One end of a stream connection that speaks length-prefixed messages"""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, codec: str = "json"):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown IPC codec: {codec}")
+        self.reader = reader
+        self.writer = writer
+        self.codec = codec
+        self.closed = False
+
+    def send(self, message: dict):
+        """Write without waiting; the stream buffers until the peer reads"""
+        if not self.closed:
+            self.writer.write(encode(message, self.codec))
+
+    async def drain(self):
+        if not self.closed:
+            await self.writer.drain()
+
+    async def recv(self) -> Optional[dict]:
+        message = await read_message(self.reader, self.codec)
+        if message is None:
+            self.closed = True
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        message = await self.recv()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def connect_unix(path: str, codec: str = "json") -> Channel:
+    reader, writer = await asyncio.open_unix_connection(path, limit=STREAM_LIMIT)
+    return Channel(reader, writer, codec)
+
+
+async def serve_unix(handler, path: str, codec: str = "json"):
+    """Start a Unix socket server whose handler receives a Channel"""
+    async def on_connect(reader, writer):
+        await handler(Channel(reader, writer, codec))
+    return await asyncio.start_unix_server(on_connect, path, limit=STREAM_LIMIT)
+
+
+class Requests:
+    """Matches replies to outstanding requests by id"""
+    def __init__(self):
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+
+    async def send(self, channel: Channel, message: dict) -> dict:
+        """Send a request and wait for the message answering it"""
+        if channel.closed:
+            raise ConnectionError("IPC channel is closed")
+        self.next_id += 1
+        message["id"] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        channel.send(message)
+        return await future
+
+    def resolve(self, message: dict):
+        future = self.pending.pop(message["id"], None)
+        if future and not future.done():
+            future.set_result(message)
+
+    def fail(self, error: Exception):
+        """Wake every waiter with error (the peer went away)"""
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+
+class Outbox:
+    """Sends on a channel, folding one frame meant for many players into one message"""
+    def __init__(self, channel: Channel):
+        self.channel = channel
+        self.frames: Dict[int, tuple] = {}  # id(frame) -> (frame, [player names])
+        self._flush_scheduled = False
+
+    def send(self, message: dict):
+        """Send a message after any frames queued before it"""
+        self.flush()
+        self.channel.send(message)
+
+    def deliver(self, name: str, frame):
+        entry = self.frames.get(id(frame))
+        if entry:
+            entry[1].append(name)
+            return
+        self.frames[id(frame)] = (frame, [name])
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self._flush_scheduled = False
+        for frame, names in self.frames.values():
+            self.channel.send({"op": "deliver", "to": names, "frame": frame.to_dict()})
+        self.frames.clear()
+
+
+class OrderedTasks:
+    """Runs handlers as tasks, one at a time per key (a player's name) and in the order they came"""
+    def __init__(self):
+        self.queues: Dict[Hashable, Deque[Callable[[], Awaitable]]] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+    def submit(self, key: Hashable, handler: Callable[[], Awaitable]):
+        """Run handler() after everything already submitted under key"""
+        queue = self.queues.get(key)
+        if queue is not None:
+            queue.append(handler)
+            return
+        self.queues[key] = deque([handler])
+        task = asyncio.create_task(self._drain(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _drain(self, key: Hashable):
+        queue = self.queues[key]
+        try:
+            while queue:
+                try:
+                    await queue[0]()
+                except Exception:
+                    logger.exception(f"Request for {key} failed")
+                queue.popleft()  # only now, so submit() queues behind the running handler
+        finally:
+            del self.queues[key]
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class RemoteConnection:
+    """A player's connection as seen from behind a channel: frames go to the outbox"""
+    closed = False
+    batching = False
+
+    def __init__(self, outbox: Outbox, name: str):
+        self.outbox = outbox
+        self.name = name
+
+    def send(self, frame) -> bool:
+        self.outbox.deliver(self.name, frame)
+        return True
@@ -0,0 +1,366 @@
+"""
+Append-only world journal for the Harris Wilderness MUD
+
+Every change to the world is an event appended to the current journal
+segment: a room created, an exit opened, an object taken or dropped, an
+NPC spawned or moved, a player moved. Events are small JSON lists,
+
+    [seq, time, kind, actor, *fields]
+
+framed with their length and a CRC so a torn write at the tail of a
+segment is detected and dropped on recovery. A segment is created as soon
+as it is begun, and its header records the seq of the last event before
+it, so numbering carries on across restarts even when no event followed. The event loop encodes each
+event and queues it; a writer thread appends and fsyncs according to the
+policy, so commands never wait on disk:
+
+    always    fsync after every write (events queued together share one fsync)
+    interval  fsync at most every fsync_interval seconds, and whenever the writer goes idle
+    never     leave it to the OS (segments are still fsynced when they are closed)
+
+A checkpoint is a snapshot (see snapshot.py) of the world as it stood
+when segment N began, written as checkpoint-N.snap. Recovery loads the
+newest checkpoint and replays segments N and later; without one it
+replays every segment on top of the seed world. The compactor writes a
+new checkpoint once enough journal has built up since the last one and
+then deletes the segments and checkpoints it replaces. Between
+compactions the segments double as an audit trail of who did what.
+
+This module knows nothing about the world's classes: it stores and
+returns events, and checkpoints whatever collect() describes. The world
+takes a first checkpoint as soon as it attaches a journal that has none,
+so only the events before it ever replay onto the seed world.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HWMJ"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHQ")  # magic, version, seq of the last event before the segment
+HEADER_V1 = struct.Struct("<4sH")  # magic, version: segments from before the header carried a seq
+RECORD = struct.Struct("<II")  # payload length, CRC32 of the payload
+FSYNC_POLICIES = ("always", "interval", "never")
+SEGMENT_NAME = re.compile(r"segment-(\d+)\.log$")
+CHECKPOINT_NAME = re.compile(r"checkpoint-(\d+)\.snap$")
+_encode = json.JSONEncoder(separators=(",", ":")).encode  # built once: json.dumps would rebuild it per call
+
+
+class Journal:
+    """Event appends on the loop, segment writes on a background thread, checkpoints from a compactor task"""
+    def __init__(self, path: str, fsync: str = "interval", fsync_interval: float = 1.0,
+                 segment_bytes: int = 8 * 2**20, compact_bytes: int = 64 * 2**20, compact_interval: float = 60.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = Path(path)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+        self.seq = 0
+        self.segment = 1  # the segment new events go to
+        self.segment_size = 0
+        self.checkpoint_segment = 0  # segment the newest checkpoint starts from (0: none)
+        self.since_checkpoint = 0  # journal bytes written after the newest checkpoint
+        self._records: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._task = None
+        self._compact_now: Optional[asyncio.Event] = None
+        self._compact_due = False
+        # Metrics
+        self.events_written = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.checkpoints = 0
+        self.last_fsync_ms = 0.0
+        self.last_checkpoint: Optional[dict] = None
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def segment_path(self, number: int) -> Path:
+        return self.path / f"segment-{number:06d}.log"
+
+    def checkpoint_path(self, number: int) -> Path:
+        return self.path / f"checkpoint-{number:06d}.snap"
+
+    def _numbered(self, pattern) -> List[Tuple[int, Path]]:
+        found = []
+        for entry in self.path.iterdir():
+            match = pattern.match(entry.name)
+            if match:
+                found.append((int(match.group(1)), entry))
+        return sorted(found)
+
+    def empty(self) -> bool:
+        """True if there are no segments or checkpoints yet"""
+        return not (self._numbered(SEGMENT_NAME) or self._numbered(CHECKPOINT_NAME))
+
+    def recover(self) -> Tuple[Optional[dict], Iterator[list]]:
+        """The newest readable checkpoint's rows (or None) and the events to replay on top of it
+
+        Called once at startup, before start(). Events are read lazily, so
+        consume them before appending anything. New events go to a fresh
+        segment after the last one found: a segment is never appended to
+        after a restart, so a torn tail stays where the crash left it.
+        """
+        segments = self._numbered(SEGMENT_NAME)
+        for _, path in reversed(segments):  # events not replayed (a --restore) still count
+            self.seq = last_seq(path)
+            if self.seq:
+                break
+        data = None
+        for number, path in reversed(self._numbered(CHECKPOINT_NAME)):
+            try:
+                data = snapshot.load(str(path))
+            except (OSError, snapshot.SnapshotError) as e:
+                logger.warning(f"📜 Skipping unreadable checkpoint {path.name}: {e}")
+                continue
+            self.checkpoint_segment = number
+            break
+        replay = [(number, path) for number, path in segments if number >= self.checkpoint_segment]
+        if segments:
+            self.segment = segments[-1][0] + 1
+        self.segment = max(self.segment, self.checkpoint_segment)
+        if replay and data is None and replay[0][0] != 1:
+            logger.warning(f"📜 No checkpoint before {replay[0][1].name}: replaying onto the seed world")
+        self.since_checkpoint = sum(path.stat().st_size for _, path in replay)
+        return data, self._replay(replay)
+
+    def _replay(self, segments: List[Tuple[int, Path]]) -> Iterator[list]:
+        for _, path in segments:
+            for event in read_segment(path):
+                self.seq = max(self.seq, event[0])
+                yield event
+
+    def append(self, kind: str, actor: Optional[str], *fields):
+        """Journal one world change; cheap enough to call from any command"""
+        self.seq += 1
+        payload = _encode([self.seq, round(time.time(), 3), kind, actor, *fields]).encode()
+        record = RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+        if self.segment_size and self.segment_size + len(record) > self.segment_bytes:
+            self.roll()
+        self.segment_size += len(record)
+        self.since_checkpoint += len(record)
+        self._records.put(record)
+
+    def roll(self) -> int:
+        """Start a new segment; everything appended so far lands in earlier ones"""
+        self.segment += 1
+        self.segment_size = 0
+        self._records.put(("roll", self.segment, self.seq))
+        return self.segment
+
+    def pending(self) -> int:
+        return self._records.qsize()
+
+    def start(self, collect: Callable[[], tuple]):
+        """Start the writer thread and the compactor task
+
+        collect() returns (rooms, npcs, players) snapshot rows over live
+        state, as snapshot.save_background expects.
+        """
+        self.start_writer()
+        self._compact_now = asyncio.Event()
+        if self._compact_due:
+            self._compact_now.set()
+        self._task = asyncio.create_task(self._compact_loop(collect))
+
+    def start_writer(self):
+        """Start only the writer thread (for tools that checkpoint by hand)"""
+        self._thread = threading.Thread(target=self._writer, args=(self.segment, self.seq), name="world-journal",
+                                        daemon=True)
+        self._thread.start()
+
+    def compact_soon(self):
+        """Ask the compactor to checkpoint now, e.g. after the world was replaced wholesale"""
+        self._compact_due = True
+        if self._compact_now:
+            self._compact_now.set()
+
+    async def _compact_loop(self, collect):
+        while True:
+            try:
+                await asyncio.wait_for(self._compact_now.wait(), self.compact_interval)
+            except asyncio.TimeoutError:
+                if self.since_checkpoint < self.compact_bytes:
+                    continue
+            self._compact_now.clear()
+            self._compact_due = False
+            try:
+                await self.checkpoint(collect)
+            except Exception as e:
+                logger.error(f"📜 Journal compaction failed: {e}")
+
+    async def checkpoint(self, collect) -> dict:
+        """Snapshot the world as a new checkpoint, then drop the segments and checkpoints it replaces"""
+        number = self.roll()
+        # save_background forks before its first await, so the child sees exactly the state
+        # every event before the roll produced
+        result = await snapshot.save_background(str(self.checkpoint_path(number)), collect)
+        self.since_checkpoint = self.segment_size
+        self.checkpoint_segment = number
+        removed = await asyncio.get_running_loop().run_in_executor(None, self._prune, number)
+        self.checkpoints += 1
+        self.last_checkpoint = dict(result, segment=number, removed=removed)
+        logger.info(f"📜 Journal checkpoint {number}: {result['bytes'] / 2**20:.1f} MB in "
+                    f"{result['seconds']:.2f}s, {removed} old files removed")
+        return self.last_checkpoint
+
+    def _prune(self, number: int) -> int:
+        removed = 0
+        for pattern in (SEGMENT_NAME, CHECKPOINT_NAME):
+            for older, path in self._numbered(pattern):
+                if older < number:
+                    path.unlink()
+                    removed += 1
+        return removed
+
+    def _writer(self, number: int, seq: int):
+        file = None
+        unsynced = False
+        synced = time.monotonic()
+        try:
+            file = self._begin(number, seq)
+            while True:
+                try:
+                    items = [self._records.get(timeout=self.fsync_interval if unsynced else None)]
+                except queue.Empty:  # gone quiet: sync what is waiting
+                    self._sync(file)
+                    unsynced = False
+                    continue
+                while len(items) < 1024 and not self._records.empty():
+                    items.append(self._records.get_nowait())
+                for item in items:
+                    if item is None or isinstance(item, tuple):  # stop, or ("roll", next segment, seq so far)
+                        if file:
+                            self._sync(file)
+                            file.close()
+                            file = None
+                        unsynced = False
+                        if item is None:
+                            return
+                        file = self._begin(item[1], item[2])
+                        continue
+                    file.write(item)
+                    unsynced = True
+                    self.events_written += 1
+                    self.bytes_written += len(item)
+                if not unsynced:
+                    continue
+                file.flush()
+                if self.fsync == "always" or (
+                        self.fsync == "interval" and time.monotonic() - synced >= self.fsync_interval):
+                    self._sync(file)
+                    synced = time.monotonic()
+                    unsynced = False
+                elif self.fsync == "never":
+                    unsynced = False
+        except OSError as e:
+            logger.error(f"📜 Journal write failed, no further events will be saved: {e}")
+        finally:
+            if file:
+                file.close()
+
+    def _begin(self, number: int, seq: int):
+        """Create a segment, synced at once so the seq in its header survives even if no event follows"""
+        file = open(self.segment_path(number), "ab")
+        if file.tell() == 0:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, seq))
+            self._sync(file)
+        return file
+
+    def _sync(self, file):
+        start = time.perf_counter()
+        file.flush()
+        os.fsync(file.fileno())
+        self.fsyncs += 1
+        self.last_fsync_ms = (time.perf_counter() - start) * 1000
+
+    def close(self):
+        """Stop the compactor, write out what is queued and wait for the writer to finish"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._thread:
+            self._records.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "seq": self.seq,
+            "segment": self.segment,
+            "pending": self.pending(),
+            "events": self.events_written,
+            "since_checkpoint": self.since_checkpoint,
+            "fsyncs": self.fsyncs,
+            "last_fsync_ms": round(self.last_fsync_ms, 2),
+            "checkpoints": self.checkpoints,
+        }
+
+
+def read_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """(size of the header, seq before the segment), or None if data is no segment this version can read"""
+    if len(data) < HEADER_V1.size:
+        return None
+    magic, version = HEADER_V1.unpack_from(data)
+    if magic == MAGIC and version == 1:
+        return HEADER_V1.size, 0
+    if magic == MAGIC and version == FORMAT_VERSION and len(data) >= HEADER.size:
+        return HEADER.size, HEADER.unpack_from(data)[2]
+    return None
+
+
+def _payloads(data: bytes, offset: int) -> Iterator[bytes]:
+    """Record payloads from offset on, up to the first torn or corrupt record"""
+    while offset + RECORD.size <= len(data):
+        length, crc = RECORD.unpack_from(data, offset)
+        payload = data[offset + RECORD.size:offset + RECORD.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield payload
+        offset += RECORD.size + length
+
+
+def last_seq(path) -> int:
+    """Seq of the newest event in a segment, or of the last one before it if it has none"""
+    with open(path, "rb") as f:
+        data = f.read()
+    header = read_header(data)
+    if header is None:
+        return 0
+    payload = None
+    for payload in _payloads(data, header[0]):  # only the last one is decoded
+        pass
+    return json.loads(payload)[0] if payload else header[1]
+
+
+def read_segment(path) -> Iterator[list]:
+    """Events in a segment file, stopping quietly-but-logged at a torn or corrupt tail"""
+    with open(path, "rb") as f:
+        data = f.read()
+    header = read_header(data)
+    if header is None:
+        if len(data) >= HEADER_V1.size:
+            logger.warning(f"📜 {Path(path).name} is not a journal segment this version can read; skipped")
+        return
+    offset = header[0]
+    for payload in _payloads(data, offset):
+        yield json.loads(payload)
+        offset += RECORD.size + len(payload)
+    if offset < len(data):
+        logger.warning(f"📜 {Path(path).name}: dropped {len(data) - offset} bytes of torn or corrupt tail")
@@ -0,0 +1,134 @@
+"""
+Keyword lookup for item and NPC containers
+
+Commands find things by substring: `take alt` takes the first object whose
+lower-cased name contains "alt". Small containers are simply scanned. Once
+a container grows past INDEX_MIN_ITEMS it gets an n-gram index (every 1-,
+2- and 3-character substring of each lower-cased name), which is kept up
+to date as items come and go. A lookup then only verifies the items that
+share the target's rarest trigram, and still returns exactly what the scan
+would have: the earliest item in the container that matches.
+"""
+
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Set
+
+INDEX_MIN_ITEMS = 16
+GRAM_SIZES = (1, 2, 3)
+
+
+def grams(text: str) -> Set[str]:
+    return {text[i:i + n] for n in GRAM_SIZES for i in range(len(text) - n + 1)}
+
+
+class KeywordIndex:
+    """Substring index over the lower-cased names of a container's items"""
+    def __init__(self, key: Optional[Callable] = None):
+        self.key = key
+        self.entries: Dict[int, tuple] = {}  # seq -> (item, lower-cased name)
+        self.seqs: Dict[object, deque] = {}  # item -> its seqs, oldest first
+        self.postings: Dict[str, Set[int]] = {}  # n-gram -> seqs of names containing it
+        self.next_seq = 0
+
+    def add(self, item):
+        seq = self.next_seq
+        self.next_seq += 1
+        name = (self.key(item) if self.key else item).lower()
+        self.entries[seq] = (item, name)
+        self.seqs.setdefault(item, deque()).append(seq)
+        for gram in grams(name):
+            self.postings.setdefault(gram, set()).add(seq)
+
+    def remove(self, item):
+        """Forget the oldest copy of item (list.remove semantics)"""
+        seqs = self.seqs[item]
+        seq = seqs.popleft()
+        if not seqs:
+            del self.seqs[item]
+        _, name = self.entries.pop(seq)
+        for gram in grams(name):
+            postings = self.postings[gram]
+            postings.discard(seq)
+            if not postings:
+                del self.postings[gram]
+
+    def find(self, target: str):
+        """The earliest item whose name contains target (already lower-cased), or None"""
+        if not target:
+            return self.entries[min(self.entries)][0] if self.entries else None
+        if len(target) <= GRAM_SIZES[-1]:
+            candidates = self.postings.get(target)
+            return self.entries[min(candidates)][0] if candidates else None
+        candidates = None
+        for gram in {target[i:i + 3] for i in range(len(target) - 2)}:
+            postings = self.postings.get(gram)
+            if not postings:
+                return None
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+        for seq in sorted(candidates):
+            item, name = self.entries[seq]
+            if target in name:
+                return item
+        return None
+
+
+def _drops_index(method):
+    def wrapper(self, *args):
+        self.index = None
+        return method(self, *args)
+    return wrapper
+
+
+class ItemList(list):
+    """A list of items or NPCs that indexes itself for keyword lookups once it gets long"""
+    __slots__ = ("key", "index")
+
+    def __init__(self, items: Iterable = (), key: Optional[Callable] = None):
+        super().__init__(items)
+        self.key = key
+        self.index: Optional[KeywordIndex] = None
+
+    def append(self, item):
+        super().append(item)
+        if self.index is not None:
+            self.index.add(item)
+
+    def remove(self, item):
+        super().remove(item)
+        if self.index is not None:
+            self.index.remove(item)
+
+    # Anything that reorders or rewrites in bulk just drops the index; it is rebuilt on demand
+    insert = _drops_index(list.insert)
+    pop = _drops_index(list.pop)
+    extend = _drops_index(list.extend)
+    clear = _drops_index(list.clear)
+    sort = _drops_index(list.sort)
+    reverse = _drops_index(list.reverse)
+    __setitem__ = _drops_index(list.__setitem__)
+    __delitem__ = _drops_index(list.__delitem__)
+    __iadd__ = _drops_index(list.__iadd__)
+
+    def find(self, target: str):
+        if len(self) < INDEX_MIN_ITEMS:
+            return scan(self, target, self.key)
+        if self.index is None:
+            self.index = KeywordIndex(self.key)
+            for item in self:
+                self.index.add(item)
+        return self.index.find(target)
+
+
+def scan(items: Iterable, target: str, key: Optional[Callable] = None):
+    for item in items:
+        if target in (key(item) if key else item).lower():
+            return item
+    return None
+
+
+def find_item(items: Iterable, target: str, key: Optional[Callable] = None):
+    """First of items whose lower-cased name contains target (lower-cased), or None"""
+    if isinstance(items, ItemList):
+        return items.find(target)
+    return scan(items, target, key)
@@ -0,0 +1,225 @@
+"""
+Metrics for the Harris Wilderness MUD
+
+A small in-process registry (counters, callback gauges, histograms) that
+renders the Prometheus text exposition format, a bare-bones HTTP endpoint
+to scrape it from, and an event-loop lag monitor.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues) -> float:
+        return self.values.get(labelvalues, 0)
+
+    def samples(self):
+        for labelvalues, value in self.values.items():
+            yield self.name, format_labels(self.labels, labelvalues), value
+
+
+class Gauge:
+    """Point-in-time value read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def get(self) -> float:
+        try:
+            return self.fn()
+        except Exception as e:
+            logger.error(f"Gauge {self.name} failed: {e}")
+            return math.nan
+
+    def samples(self):
+        yield self.name, "", self.get()
+
+
+class Histogram:
+    """Bucketed distribution of observations, optionally split by labels"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series: Dict[tuple, list] = {}  # labelvalues -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labelvalues) -> int:
+        series = self.series.get(labelvalues)
+        return series[-1] if series else 0
+
+    def total(self, *labelvalues) -> float:
+        series = self.series.get(labelvalues)
+        return series[-2] if series else 0.0
+
+    def quantile(self, q: float, *labelvalues) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        series = self.series.get(labelvalues)
+        if not series or not series[-1]:
+            return 0.0
+        rank = q * series[-1]
+        seen = 0
+        for bound, hits in zip(self.buckets, series):
+            seen += hits
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def samples(self):
+        for labelvalues, series in self.series.items():
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                yield (f"{self.name}_bucket",
+                       format_labels(self.labels, labelvalues, f'le="{format_value(bound)}"'), cumulative)
+            yield (f"{self.name}_bucket",
+                   format_labels(self.labels, labelvalues, 'le="+Inf"'), series[-1])
+            yield f"{self.name}_sum", format_labels(self.labels, labelvalues), series[-2]
+            yield f"{self.name}_count", format_labels(self.labels, labelvalues), series[-1]
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them for Prometheus"""
+    def __init__(self, prefix: str = "mud_"):
+        self.prefix = prefix
+        self.metrics: Dict[str, object] = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, help, labels))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        return self._add(Gauge(self.prefix + name, help, fn))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help, labels, buckets))
+
+    def get(self, name: str):
+        return self.metrics.get(self.prefix + name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that asked to sleep"""
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+class MetricsHTTPServer:
+    """Serves GET /metrics from a registry on a local port"""
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
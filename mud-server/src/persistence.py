@@ -0,0 +1,188 @@
+"""
+SQLite write-behind persistence for the Harris Wilderness MUD
+
+The world marks rooms, NPCs and players dirty as commands mutate them.
+Every flush interval the event loop turns the dirty set into plain rows
+(cheap: only what changed) and hands them to a writer thread, which
+commits each batch in a single transaction. Commands never wait on disk.
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("room", "npc", "player")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    exits TEXT NOT NULL,
+    objects TEXT NOT NULL,
+    created_by TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS npcs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    type TEXT NOT NULL,
+    room_id TEXT,
+    mood TEXT NOT NULL,
+    inventory TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    inventory TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    explored TEXT NOT NULL,
+    is_agent INTEGER NOT NULL
+);
+"""
+
+UPSERT = {
+    "room": "INSERT OR REPLACE INTO rooms VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "npc": "INSERT OR REPLACE INTO npcs VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "player": "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+DELETE = {
+    "room": "DELETE FROM rooms WHERE id = ?",
+    "npc": "DELETE FROM npcs WHERE id = ?",
+    "player": "DELETE FROM players WHERE name = ?",
+}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the database in WAL mode with the schema in place"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class WorldStore:
+    """Dirty-set tracking on the loop, batched commits on a background thread"""
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.dirty: Dict[str, Set[str]] = {kind: set() for kind in KINDS}
+        self._batches: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._task = None
+        # Metrics
+        self.batches_committed = 0
+        self.rows_written = 0
+        self.last_commit_ms = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Dict[str, List[tuple]]:
+        """Read every stored row; called once at startup before the writer runs"""
+        conn = connect(self.path)
+        try:
+            return {
+                "rooms": conn.execute("SELECT * FROM rooms").fetchall(),
+                "npcs": conn.execute("SELECT * FROM npcs").fetchall(),
+                "players": conn.execute("SELECT * FROM players").fetchall(),
+            }
+        finally:
+            conn.close()
+
+    def mark(self, kind: str, key: str):
+        """Record that an entity changed; cheap enough to call from any command"""
+        self.dirty[kind].add(key)
+
+    def take_dirty(self) -> Dict[str, Set[str]]:
+        """Swap out the current dirty set"""
+        dirty = self.dirty
+        self.dirty = {kind: set() for kind in KINDS}
+        return dirty
+
+    def pending(self) -> int:
+        return sum(len(keys) for keys in self.dirty.values()) + self._batches.qsize()
+
+    def start(self, collect: Callable[[Dict[str, Set[str]]], dict]):
+        """Start the writer thread and the loop-side flush task
+
+        collect(dirty) runs on the event loop and returns
+        {"upsert": {kind: [row, ...]}, "delete": {kind: [key, ...]}}.
+        """
+        self.start_writer()
+        self._task = asyncio.create_task(self._flush_loop(collect))
+
+    def start_writer(self):
+        """Start only the writer thread (for tools that flush by hand)"""
+        self._thread = threading.Thread(target=self._writer, name="world-store", daemon=True)
+        self._thread.start()
+
+    async def _flush_loop(self, collect):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush(collect)
+
+    def flush(self, collect):
+        """Serialize whatever is dirty and queue it for the writer"""
+        dirty = self.take_dirty()
+        if any(dirty.values()):
+            self.submit(collect(dirty))
+
+    def submit(self, batch: dict):
+        """Queue already-collected rows for the writer thread"""
+        self._batches.put(batch)
+
+    def _writer(self):
+        conn = connect(self.path)
+        try:
+            while True:
+                batch = self._batches.get()
+                if batch is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    self._commit(conn, batch)
+                except sqlite3.Error as e:
+                    logger.error(f"💾 World save failed: {e}")
+                self.last_commit_ms = (time.perf_counter() - start) * 1000
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: dict):
+        with conn:
+            for kind, rows in batch.get("upsert", {}).items():
+                if rows:
+                    conn.executemany(UPSERT[kind], rows)
+                    self.rows_written += len(rows)
+            for kind, keys in batch.get("delete", {}).items():
+                if keys:
+                    conn.executemany(DELETE[kind], [(key,) for key in keys])
+        self.batches_committed += 1
+
+    def close(self, collect=None):
+        """Flush what is left and wait for the writer to finish"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if collect:
+            self.flush(collect)
+        if self._thread:
+            self._batches.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "batches": self.batches_committed,
+            "rows": self.rows_written,
+            "last_commit_ms": round(self.last_commit_ms, 2),
+        }
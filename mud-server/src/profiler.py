@@ -0,0 +1,265 @@
+"""
+On-demand profiling of the event loop for the Harris Wilderness MUD
+
+Nothing here runs until an admin asks for a profile, so it costs nothing
+while it is off. A session either samples or traces:
+
+    sample  the loop thread's stack is read every `interval` seconds of CPU time;
+            cheap and statistical, weights are sample counts
+    trace   sys.setprofile sees every call and return on the loop thread; exact self
+            time per stack in microseconds, but the loop runs several times slower
+
+and covers either a window of time (everything the loop does) or the next
+N executions of one command (only that command's own frames, however its
+awaits interleave with other work). A command session wraps each
+execution in run(); the caller decides how to route executions there.
+
+When it ends a session has collapsed stacks, one "frame;frame;frame
+weight" line per distinct stack (root first), which flamegraph.pl,
+inferno and speedscope read as they are, and a top-N summary of the
+functions the weight landed in.
+
+Samples come from a SIGPROF interval timer, whose handler runs on the
+main thread at the next bytecode with the interrupted frame, so they
+land where the CPU time goes and an idle loop costs none. Off the main
+thread (or without setitimer) a sampler thread reads the loop thread's
+frame instead; it can only look when the loop lets go of the GIL, so its
+samples lean towards wherever that happens (select, mostly).
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+MODES = ("sample", "trace")
+MAX_DEPTH = 64  # frames kept per stack, innermost first
+
+
+def frame_label(code) -> str:
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """One profile: what to watch, for how long, and the stacks it collected"""
+    def __init__(self, mode: str, seconds: float, command: Optional[str] = None, executions: int = 0,
+                 interval: float = 0.001):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.seconds = seconds  # the window, or for a command session how long to wait for its executions
+        self.command = command
+        self.executions = executions
+        self.profiled = 0  # executions finished so far
+        self.interval = interval
+        self.stacks: Dict[str, float] = defaultdict(float)
+        self.roots = set()  # frames of the command executions in progress
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.finished = False
+        self.done: Optional[asyncio.Future] = None
+        self._labels: Dict[object, str] = {}
+        self._loop_thread = threading.get_ident()
+        self._sampler: Optional[threading.Thread] = None
+        self._previous_handler = None
+        self._stop = threading.Event()
+        self._tracing = False
+        self._keys: Dict[object, Optional[str]] = {}  # frame -> its stack, while tracing and the frame is running
+        self._timer = None
+        self._last_key: Optional[str] = None
+        self._last = 0.0
+
+    def describe(self) -> str:
+        scope = f"the next {self.executions} '{self.command}'" if self.command else f"{self.seconds:g}s of the loop"
+        return f"{self.mode} of {scope}"
+
+    def start(self):
+        """Begin on the event loop thread; done resolves when the session finishes"""
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.started = time.perf_counter()
+        self.done = loop.create_future()
+        self._timer = loop.call_later(self.seconds, self.finish)
+        if self.mode == "sample" and threading.current_thread() is threading.main_thread() \
+                and hasattr(signal, "setitimer"):
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        elif self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+            self._sampler.start()
+        elif self.command is None:
+            self._trace_on()
+
+    async def run(self, coro):
+        """Await one execution of the profiled command, watching only its frames"""
+        if self.finished:
+            return await coro
+        root = coro.cr_frame
+        self.roots.add(root)
+        if self.mode == "trace" and not self._tracing:
+            self._trace_on()
+        try:
+            return await coro
+        finally:
+            self.roots.discard(root)
+            if not self.finished:
+                self.profiled += 1
+                if self.profiled >= self.executions:
+                    self.finish()
+                elif self.mode == "trace" and not self.roots:
+                    self._trace_off()
+
+    def finish(self):
+        """Stop collecting; safe to call more than once"""
+        if self.finished:
+            return
+        self.finished = True
+        self.elapsed = time.perf_counter() - self.started
+        if self._timer:
+            self._timer.cancel()
+        self._trace_off()
+        if self._previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+            self._previous_handler = None
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self.done and not self.done.done():
+            self.done.set_result(self)
+
+    def _stack(self, frame) -> Optional[str]:
+        """The collapsed stack ending at frame, or None if it is not one we are watching"""
+        labels = self._labels
+        parts = []
+        watching = not self.command
+        while frame is not None and len(parts) < MAX_DEPTH:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = frame_label(code)
+            parts.append(label)
+            if not watching and frame in self.roots:
+                watching = True
+                break
+            frame = frame.f_back
+        if not watching:
+            return None
+        parts.reverse()
+        return ";".join(parts)
+
+    def _key(self, frame) -> Optional[str]:
+        """_stack(frame), built from its caller's when that is known"""
+        keys = self._keys
+        if frame in keys:
+            return keys[frame]
+        parent = frame.f_back
+        if self.command and frame in self.roots:
+            key = self._stack(frame)
+        elif parent in keys:
+            key = keys[parent]
+            if key is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = frame_label(code)
+                key = f"{key};{label}"
+        else:
+            key = self._stack(frame)
+        keys[frame] = key
+        return key
+
+    def _on_signal(self, signum, frame):
+        key = self._stack(frame)
+        if key:
+            self.stacks[key] += 1
+            self.samples += 1
+
+    def _sample(self):
+        frames = sys._current_frames
+        while not self._stop.wait(self.interval):
+            key = self._stack(frames().get(self._loop_thread))
+            if key:
+                self.stacks[key] += 1
+                self.samples += 1
+
+    def _trace_on(self):
+        self._tracing = True
+        self._last_key = None
+        sys.setprofile(self._trace)
+
+    def _trace_off(self):
+        if self._tracing:
+            sys.setprofile(None)
+            self._tracing = False
+            self._last_key = None
+            self._keys.clear()
+
+    def _trace(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._last_key is not None:
+            self.stacks[self._last_key] += now - self._last
+        if event == "call":
+            key = self._key(frame)
+        elif event == "return":  # back to the caller, or a coroutine suspending
+            self._keys.pop(frame, None)
+            key = self._key(frame.f_back) if frame.f_back else None
+        else:
+            key = self._key(frame)
+            if key and event == "c_call":
+                key += f";{getattr(arg, '__qualname__', repr(arg))} (builtin)"
+        if key:
+            self.samples += 1
+        self._last_key = key
+        self._last = time.perf_counter()  # the hook's own time goes to nobody
+
+    def weights(self) -> Dict[str, int]:
+        """Stack -> integer weight: samples, or microseconds when tracing"""
+        scale = 1 if self.mode == "sample" else 1e6
+        weights = {stack: round(weight * scale) for stack, weight in self.stacks.items()}
+        return {stack: weight for stack, weight in weights.items() if weight > 0}
+
+    def collapsed(self) -> str:
+        """The stacks in the collapsed format flamegraph tools take"""
+        weights = self.weights()
+        return "".join(f"{stack} {weight}\n" for stack, weight in
+                       sorted(weights.items(), key=lambda item: -item[1]))
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """(function, self weight, total weight) for the functions with the most self weight"""
+        own: Dict[str, int] = defaultdict(int)
+        total: Dict[str, int] = defaultdict(int)
+        for stack, weight in self.weights().items():
+            frames = stack.split(";")
+            own[frames[-1]] += weight
+            for label in set(frames):
+                total[label] += weight
+        ranked = sorted(own.items(), key=lambda item: -item[1])[:limit]
+        return [(label, weight, total[label]) for label, weight in ranked]
+
+    def summary(self, limit: int = 10) -> str:
+        weights = self.weights()
+        overall = sum(weights.values())
+        unit = "samples" if self.mode == "sample" else "us"
+        lines = [f"Profile ({self.describe()}): {self.elapsed:.1f}s, {overall:,} {unit} in {len(weights):,} stacks"]
+        if self.command:
+            lines[0] += f", {self.profiled} executions"
+        if not overall:
+            lines.append("Nothing was recorded." + (" For a command this quick, try trace." if
+                                                    self.command and self.mode == "sample" else ""))
+            return "\n".join(lines)
+        lines.append(f"{'self':>7}{'total':>7}  function")
+        for label, weight, inclusive in self.top(limit):
+            lines.append(f"{weight / overall:>7.1%}{inclusive / overall:>7.1%}  {label}")
+        return "\n".join(lines)
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.collapsed())
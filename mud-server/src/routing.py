@@ -0,0 +1,249 @@
+"""
+Shortest-path routing over the room exit graph
+
+Routes are answered from cached BFS trees, one per destination: every room
+that can reach the destination stores its distance and the exit to take.
+Builders only ever add exits, and an added exit can only shorten paths, so
+cached trees are repaired in place (a backwards relaxation from the new
+edge) instead of being thrown away.
+
+The cache is bounded by the rooms its trees hold in total (about 95 bytes
+each), not by tree count, since a tree is as big as the world. Past
+`tree_rooms` rooms a whole tree costs too much to build on the event loop
+or to keep, so each route is a bidirectional BFS instead, stopped after
+`max_visits` rooms. Such a search may run on a worker thread while the
+loop keeps changing the world, given the exit index prepare() built on
+the loop: it only reads that index and rooms' exits, and starts over if
+a room's exits change size under it. Name lookups and every other method
+belong on the loop.
+"""
+
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Step = Tuple[int, str, str]  # (distance, direction, next room id)
+
+
+class RouteCache:
+    """LRU cache of destination-rooted BFS trees over room exits, with per-query search for big worlds"""
+    def __init__(self, rooms: Dict[str, object], max_entries: int = 1_000_000, tree_rooms: int = 50_000,
+                 max_visits: int = 200_000):
+        self.rooms = rooms
+        self.max_entries = max_entries  # rooms across every cached tree
+        self.tree_rooms = tree_rooms  # worlds bigger than this search each route instead of caching trees
+        self.max_visits = max_visits  # rooms one search may touch before it gives up
+        self.trees: "OrderedDict[str, Dict[str, Step]]" = OrderedDict()
+        self.entries = 0
+        self.incoming: Optional[Dict[str, List[Tuple[str, str]]]] = None
+        self.names: Optional[Dict[str, List[str]]] = None
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.repairs = 0
+        self.searches = 0
+        self.gave_up = 0
+
+    def searching(self) -> bool:
+        """Whether routes come from per-query searches (slow enough for a worker thread) rather than trees"""
+        return len(self.rooms) > self.tree_rooms
+
+    def invalidate(self):
+        """Forget everything (after bulk loads that replace exits wholesale)"""
+        self.trees.clear()
+        self.entries = 0
+        self.incoming = None
+        self.names = None
+
+    def prepare(self):
+        """Build the exit and name indexes now, on the loop, so searches elsewhere only read them"""
+        if self.incoming is not None:
+            return
+        incoming: Dict[str, List[Tuple[str, str]]] = {}
+        names: Dict[str, List[str]] = {}
+        for room_id, room in self.rooms.items():
+            names.setdefault(room.name.lower(), []).append(room_id)
+            for direction, target in room.exits.items():
+                incoming.setdefault(target, []).append((room_id, direction))
+        self.incoming = incoming
+        self.names = names
+
+    def resolve(self, query: str) -> Optional[str]:
+        """Find a room by id, exact name, or name prefix (case-insensitive)"""
+        if query in self.rooms:
+            return query
+        self.prepare()
+        key = query.lower()
+        if key in self.names:
+            return self.names[key][0]
+        for name, ids in self.names.items():
+            if name.startswith(key):
+                return ids[0]
+        return None
+
+    def tree(self, dest: str) -> Dict[str, Step]:
+        """BFS tree of every room that can reach dest"""
+        tree = self.trees.get(dest)
+        if tree is not None:
+            self.hits += 1
+            self.trees.move_to_end(dest)
+            return tree
+        self.misses += 1
+        self.prepare()
+        tree = {dest: (0, "", dest)}
+        frontier = deque([dest])
+        while frontier:
+            node = frontier.popleft()
+            dist = tree[node][0] + 1
+            for source, direction in self.incoming.get(node, ()):
+                if source not in tree:
+                    tree[source] = (dist, direction, node)
+                    frontier.append(source)
+        if len(tree) > self.max_entries:
+            return tree  # would evict everything else and still not fit
+        self.trees[dest] = tree
+        self.entries += len(tree)
+        while self.entries > self.max_entries:
+            _, evicted = self.trees.popitem(last=False)
+            self.entries -= len(evicted)
+        return tree
+
+    def route(self, source: str, dest: str) -> Optional[List[Tuple[str, str]]]:
+        """[(direction, room_id), ...] from source to dest, or None if unreachable
+
+        In a world bigger than tree_rooms, None also means no route was
+        found within max_visits rooms of search.
+        """
+        if len(self.rooms) > self.tree_rooms:
+            return self.search(source, dest)
+        tree = self.tree(dest)
+        if source not in tree:
+            return None
+        steps = []
+        node = source
+        while node != dest:
+            _, direction, node = tree[node]
+            steps.append((direction, node))
+        return steps
+
+    def search(self, source: str, dest: str,
+               incoming: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Optional[List[Tuple[str, str]]]:
+        """One shortest route by BFS from both ends, or None if there is none within max_visits rooms
+
+        Off the loop, pass the exit index (self.incoming after prepare()):
+        an invalidate() on the loop may drop self.incoming mid-search.
+        """
+        self.searches += 1
+        if source == dest:
+            return []
+        if incoming is None:
+            self.prepare()
+            incoming = self.incoming
+        while True:
+            try:
+                return self._search(source, dest, incoming)
+            except RuntimeError:  # the loop added an exit under a search on another thread
+                continue
+
+    def _search(self, source: str, dest: str, incoming: Dict[str, List[Tuple[str, str]]]):
+        """Expand the smaller frontier a level at a time until the two meet"""
+        rooms = self.rooms
+        forward = {source: (0, "", "")}  # room -> (distance, direction taken into it, previous room)
+        backward = {dest: (0, "", "")}  # room -> (distance, direction taken out of it, next room)
+        forward_frontier = [source]
+        backward_frontier = [dest]
+        while forward_frontier and backward_frontier:
+            if len(forward) + len(backward) > self.max_visits:
+                self.gave_up += 1
+                return None
+            meetings = []
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, forward_frontier = forward_frontier, []
+                for node in frontier:
+                    room = rooms.get(node)
+                    if room is None:
+                        continue
+                    dist = forward[node][0] + 1
+                    for direction, target in room.exits.items():
+                        if target not in forward:
+                            forward[target] = (dist, direction, node)
+                            forward_frontier.append(target)
+                            if target in backward:
+                                meetings.append(target)
+            else:
+                frontier, backward_frontier = backward_frontier, []
+                for node in frontier:
+                    dist = backward[node][0] + 1
+                    for prev, direction in incoming.get(node, ()):
+                        if prev not in backward:
+                            backward[prev] = (dist, direction, node)
+                            backward_frontier.append(prev)
+                            if prev in forward:
+                                meetings.append(prev)
+            if meetings:
+                # Every meeting in this level is a candidate: their distances to the far end differ
+                middle = min(meetings, key=lambda room_id: forward[room_id][0] + backward[room_id][0])
+                steps = []
+                node = middle
+                while node != source:
+                    _, direction, previous = forward[node]
+                    steps.append((direction, node))
+                    node = previous
+                steps.reverse()
+                node = middle
+                while node != dest:
+                    _, direction, node = backward[node]
+                    steps.append((direction, node))
+                return steps
+        return None
+
+    def room_added(self, room_id: str):
+        """Index a new room's name and exits"""
+        if self.incoming is None:
+            return
+        room = self.rooms[room_id]
+        self.names.setdefault(room.name.lower(), []).append(room_id)
+        for direction, target in room.exits.items():
+            self.exit_added(room_id, direction, target)
+
+    def exit_added(self, source: str, direction: str, target: str):
+        """Repair cached trees for a new exit source --direction--> target"""
+        if self.incoming is None:
+            return
+        edges = self.incoming.setdefault(target, [])
+        if (source, direction) in edges:
+            return
+        edges.append((source, direction))
+        for tree in self.trees.values():
+            if target not in tree:
+                continue
+            dist = tree[target][0] + 1
+            if source in tree and tree[source][0] <= dist:
+                continue
+            self.repairs += 1
+            if source not in tree:
+                self.entries += 1
+            tree[source] = (dist, direction, target)
+            frontier = deque([source])
+            while frontier:
+                node = frontier.popleft()
+                dist = tree[node][0] + 1
+                for prev, prev_direction in self.incoming.get(node, ()):
+                    if prev not in tree or tree[prev][0] > dist:
+                        if prev not in tree:
+                            self.entries += 1
+                        tree[prev] = (dist, prev_direction, node)
+                        frontier.append(prev)
+
+    def stats(self) -> dict:
+        return {
+            "trees": len(self.trees),
+            "entries": self.entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "repairs": self.repairs,
+            "searches": self.searches,
+            "gave_up": self.gave_up,
+        }
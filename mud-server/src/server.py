@@ -4,18 +4,39 @@ Harris Wilderness MUD Server
 A retro text-based multiplayer world with OpenClaw autonomous integration
 """
 
+import argparse
 import asyncio
+import gc
+import hmac
 import json
 import logging
+import os
 import random
+import signal
 import sys
 import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 import websockets
-import sqlite3
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 from pathlib import Path
 
+try:
+    import msgpack
+except ImportError:  # optional: without it every client gets JSON
+    msgpack = None
+
+from keywords import ItemList, find_item
+from metrics import LoopLagMonitor, MetricsHTTPServer, MetricsRegistry
+from dialogue import DialogueCache, DialoguePool, OllamaClient, normalize
+from journal import FSYNC_POLICIES, Journal
+from persistence import WorldStore
+from profiler import MODES as PROFILE_MODES, ProfileSession
+from routing import RouteCache
+import snapshot
+import worldgen
+
 # Configure logging with retro style
 logging.basicConfig(
     level=logging.INFO,
@@ -24,18 +45,98 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class FrozenDict(dict):
+    """A dict that refuses writes, so one empty mapping can be shared safely"""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("shared empty mapping is read-only")
+    
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    setdefault = update = pop = popitem = clear = _read_only
+
+# Shared empty containers: most rooms in a big world have no objects, NPCs or
+# players (and a few have no exits), so they all point at these until filled
+NO_EXITS = FrozenDict()
+NO_ITEMS = ()
+NO_PLAYERS = frozenset()
+
+# Rooms whose rendered look text is kept; the oldest entry goes first
+RENDER_CACHE_ROOMS = 4096
+
+def npc_name(npc: "NPC") -> str:
+    return npc.name
+
 class Room:
     """A room in the MUD world"""
+    __slots__ = ("id", "name", "description", "exits", "objects", "npcs", "players",
+                 "created_at", "created_by", "version", "static_version")
+    
     def __init__(self, id: str, name: str, description: str):
-        self.id = id
+        self.id = sys.intern(id)
         self.name = name
         self.description = description
-        self.exits = {}  # direction -> room_id
-        self.objects = []
-        self.npcs = []
-        self.players = set()
-        self.created_at = datetime.now()
+        self.exits = NO_EXITS  # direction -> room_id
+        self.objects = NO_ITEMS
+        self.npcs = NO_ITEMS
+        self.players = NO_PLAYERS
+        self.created_at = time.time()
         self.created_by = "system"
+        self.version = 0  # bumped by every change a look would show
+        self.static_version = 0  # bumped when name, description or exits change
+        
+    def touch(self, static: bool = False):
+        """Invalidate rendered look text for this room"""
+        self.version += 1
+        if static:
+            self.static_version += 1
+        
+    def set_exit(self, direction: str, room_id: str):
+        if self.exits is NO_EXITS:
+            self.exits = {}
+        self.exits[sys.intern(direction)] = sys.intern(room_id)
+        self.touch(static=True)
+        
+    def set_exits(self, exits: Dict[str, str]):
+        """Replace every exit at once (loading), sharing id strings with the rooms they name"""
+        self.exits = {sys.intern(d): sys.intern(r) for d, r in exits.items()} if exits else NO_EXITS
+        self.touch(static=True)
+        
+    def add_object(self, obj: str):
+        if not isinstance(self.objects, ItemList):
+            self.objects = ItemList(self.objects)
+        self.objects.append(obj)
+        self.touch()
+        
+    def remove_object(self, obj: str):
+        self.objects.remove(obj)
+        if not self.objects:
+            self.objects = NO_ITEMS
+        self.touch()
+            
+    def add_npc(self, npc: "NPC"):
+        if not isinstance(self.npcs, ItemList):
+            self.npcs = ItemList(self.npcs, key=npc_name)
+        self.npcs.append(npc)
+        self.touch()
+        
+    def remove_npc(self, npc: "NPC"):
+        self.npcs.remove(npc)
+        if not self.npcs:
+            self.npcs = NO_ITEMS
+        self.touch()
+            
+    def enter(self, name: str):
+        """Index a player as present"""
+        if self.players is NO_PLAYERS:
+            self.players = set()
+        self.players.add(name)
+        self.touch()
+        
+    def leave(self, name: str):
+        if name in self.players:
+            self.touch()
+            self.players.discard(name)
+            if not self.players:
+                self.players = NO_PLAYERS
         
     def to_dict(self):
         return {
@@ -49,16 +150,32 @@ class Room:
             "created_by": self.created_by
         }
 
+class RenderedRoom:
+    """Look text for one room, split into parts that change at different rates"""
+    __slots__ = ("static_key", "header", "exits", "version", "contents", "occupants", "state", "state_key")
+    
+    def __init__(self):
+        self.static_key = None  # (room.static_version, world.layout_version) the header and exits match
+        self.header = ""
+        self.exits = ""
+        self.version = -1  # room.version the contents and occupants match
+        self.contents = ""
+        self.occupants = NO_ITEMS
+        self.state: Optional["Frame"] = None  # room_state frame for delta clients
+        self.state_key = None
+
 class NPC:
     """Non-player character"""
+    __slots__ = ("id", "name", "description", "type", "room_id", "dialogue", "inventory", "ai_mood")
+    
     def __init__(self, id: str, name: str, description: str, npc_type: str = "wanderer"):
-        self.id = id
+        self.id = sys.intern(id)
         self.name = name
         self.description = description
-        self.type = npc_type
+        self.type = sys.intern(npc_type)
         self.room_id = None
-        self.dialogue = []
-        self.inventory = []
+        self.dialogue = NO_ITEMS
+        self.inventory = NO_ITEMS
         self.ai_mood = random.choice(["friendly", "neutral", "mysterious", "helpful"])
         
     def to_dict(self):
@@ -73,13 +190,19 @@ class NPC:
 
 class Player:
     """Player or Agent in the MUD"""
+    __slots__ = ("name", "room_id", "inventory", "is_agent", "capabilities", "websocket", "connection",
+                 "connected_at", "explored_rooms", "stats", "admin")
+    
     def __init__(self, name: str, is_agent: bool = False):
         self.name = name
         self.room_id = "spawn"
-        self.inventory = []
+        self.inventory = ItemList()
         self.is_agent = is_agent
+        self.capabilities = set()
+        self.admin = False  # logged in with the admin credential (see admin_credential)
         self.websocket = None
-        self.connected_at = datetime.now()
+        self.connection = None
+        self.connected_at = time.time()
         self.explored_rooms = set()
         self.stats = {
             "health": 100,
@@ -97,13 +220,671 @@ class Player:
             "explored": len(self.explored_rooms)
         }
 
+class Frame:
+    """An outbound message, built and encoded once per wire encoding, shared by every recipient"""
+    __slots__ = ("type", "text", "timestamp", "extra", "_data", "_packed")
+    
+    def __init__(self, type: str, text: str, timestamp=True, **extra):
+        self.type = type
+        self.text = text
+        if timestamp is True:
+            timestamp = datetime.now().isoformat()
+        self.timestamp = timestamp or None
+        self.extra = extra
+        self._data = None
+        self._packed = None
+        
+    def to_dict(self) -> dict:
+        frame = {"type": self.type}
+        if self.text is not None:
+            frame["text"] = self.text
+        if self.timestamp:
+            frame["timestamp"] = self.timestamp
+        frame.update(self.extra)
+        return frame
+    
+    @classmethod
+    def from_dict(cls, frame: dict) -> "Frame":
+        """Rebuild a frame that arrived from another process"""
+        frame = dict(frame)
+        return cls(frame.pop("type"), frame.pop("text", None), timestamp=frame.pop("timestamp", False), **frame)
+    
+    @property
+    def data(self) -> str:
+        """The encoded frame, serialized on first use only"""
+        if self._data is None:
+            self._data = json.dumps(self.to_dict())
+        return self._data
+    
+    def encode(self, encoding: str = "json"):
+        """The frame in a client's negotiated encoding: JSON text, or msgpack bytes"""
+        if encoding == "json":
+            return self.data
+        if self._packed is None:
+            self._packed = msgpack.packb(self.to_dict())
+        return self._packed
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+# batch: frames grouped per loop iteration; delta: structured room_state on entry, then deltas
+CAPABILITIES = {"batch", "delta"}
+# Wire encodings a client may ask for at login ({"encoding": ...}); JSON text frames are the default
+ENCODINGS = {"json", "msgpack"} if msgpack else {"json"}
+# permessage-deflate settings for clients that offer compression in the websocket handshake (--deflate)
+DEFLATE_PRESETS = {
+    "off": None,
+    "default": {"server_max_window_bits": 12, "client_max_window_bits": 12,
+                "compress_settings": {"memLevel": 5}},  # what websockets picks on its own
+    "fast": {"server_max_window_bits": 12, "client_max_window_bits": 12,
+             "compress_settings": {"level": 1, "memLevel": 5}},
+    "small": {"server_max_window_bits": 15, "client_max_window_bits": 15,
+              "compress_settings": {"level": 9, "memLevel": 8}},
+}
+
+SERVER_FULL = "The forest is crowded beyond bearing. Try again in a little while."
+IDLE_TEXT = "You drift into a deep sleep beneath the pines. (Disconnected for inactivity)"
+LOGIN_TIMEOUT_TEXT = "The forest grows tired of waiting for your name."
+TAKEOVER_TEXT = "Your spirit has been called to another vessel. (Logged in from elsewhere)"
+EVICT_SEND_TIMEOUT = 2.0  # seconds a farewell frame may take before the socket is closed anyway
+
+def deflate_options(preset: str) -> dict:
+    """websockets.serve keyword arguments for a DEFLATE_PRESETS entry"""
+    if preset not in DEFLATE_PRESETS:
+        raise ValueError(f"Unknown deflate preset: {preset}")
+    settings = DEFLATE_PRESETS[preset]
+    if settings is None:
+        return {"compression": None}
+    return {"extensions": [ServerPerMessageDeflateFactory(**settings)]}
+
+def heartbeat_failed(error: Exception) -> bool:
+    """Whether a ConnectionClosed came from websockets giving up on an unanswered ping"""
+    sent = getattr(error, "sent", None)
+    return sent is not None and sent.code == 1011 and "ping" in sent.reason
+
+def admin_credential(data: dict, websocket, token: str) -> bool:
+    """Whether a login proves its sender may use admin commands: the admin token, or with none set, a local peer"""
+    if token:
+        offered = data.get("token")
+        return isinstance(offered, str) and hmac.compare_digest(offered.encode(), token.encode())
+    address = getattr(websocket, "remote_address", None)
+    return bool(address) and address[0] in ("127.0.0.1", "::1")
+
+def cancel_on_signals():
+    """Make SIGTERM and SIGINT cancel the current task, so its finally blocks save and clean up"""
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, task.cancel)
+        except (NotImplementedError, RuntimeError):  # Windows, or not the main thread
+            pass
+
+def negotiate_encoding(requested, offered: Set[str]) -> str:
+    """The encoding a client asked for if this server offers it, else JSON"""
+    return requested if isinstance(requested, str) and requested in offered else "json"
+
+def decode_message(message) -> dict:
+    """A client message: JSON text, or msgpack bytes from clients that negotiated it"""
+    if isinstance(message, bytes):
+        if msgpack is None:
+            raise ValueError("binary messages need msgpack")
+        return msgpack.unpackb(message)
+    return json.loads(message)
+
+def welcome_frame(name: str, is_agent: bool, capabilities: Set[str], encoding: str = "json") -> Frame:
+    """Greeting sent once a client has given its name"""
+    welcome_msg = f"""
+Welcome, {name}! {'[AUTONOMOUS AGENT]' if is_agent else ''}
+Type 'help' for commands.
+            """
+    return Frame("system", welcome_msg, timestamp=False, capabilities=sorted(capabilities), encoding=encoding)
+
+def batch_request(data: dict, max_commands: int) -> dict:
+    """Validate a {"commands": [...], "stop_on_error": bool, "stop_if": [...]} message"""
+    commands = data.get("commands")
+    if not isinstance(commands, list) or not commands or not all(isinstance(c, str) for c in commands):
+        raise ValueError("'commands' must be a non-empty list of strings")
+    if len(commands) > max_commands:
+        raise ValueError(f"A batch may hold at most {max_commands} commands")
+    stop_if = data.get("stop_if", [])
+    if isinstance(stop_if, str):
+        stop_if = [stop_if]
+    if not isinstance(stop_if, list) or not all(isinstance(rule, str) and rule for rule in stop_if):
+        raise ValueError("'stop_if' must be a list of non-empty strings")
+    return {"commands": [c.strip() for c in commands], "stop_on_error": bool(data.get("stop_on_error", False)),
+            "stop_if": [rule.lower() for rule in stop_if]}
+
+def request_cost(request) -> int:
+    """Rate limit tokens a scheduled request uses: one per command it runs"""
+    kind, payload = request
+    return len(payload["commands"]) if kind == "batch" else 1
+
+async def run_batch(execute, batch: dict) -> Frame:
+    """Run a batch's commands in order and gather their results into one frame
+    
+    execute(line) returns (text, ok). The batch stops early on a failed command
+    if stop_on_error is set, or on a response containing any stop_if text.
+    """
+    results = []
+    stopped = None
+    start = time.perf_counter()
+    for line in batch["commands"]:
+        began = time.perf_counter()
+        text, ok = await execute(line)
+        results.append({"command": line, "text": text, "ok": ok,
+                        "ms": round((time.perf_counter() - began) * 1000, 3)})
+        if not ok and batch["stop_on_error"]:
+            stopped = "error"
+            break
+        lowered = text.lower()
+        rule = next((rule for rule in batch["stop_if"] if rule in lowered), None)
+        if rule is not None:
+            stopped = f"stop_if: {rule}"
+            break
+    return Frame("results", None, results=results, completed=len(results), total=len(batch["commands"]),
+                 stopped=stopped, ms=round((time.perf_counter() - start) * 1000, 3))
+
+def encode_batch(frames: List[Frame], encoding: str = "json"):
+    """Wrap already-encoded frames in a single batch frame without re-encoding them"""
+    if encoding == "msgpack":
+        # A two-entry map ending in nil: swap the nil for the array of packed frames
+        head = msgpack.packb({"type": "batch", "frames": None})[:-1]
+        return b"".join([head, msgpack.Packer().pack_array_header(len(frames))]
+                        + [frame.encode(encoding) for frame in frames])
+    return '{"type": "batch", "frames": [' + ", ".join(frame.data for frame in frames) + "]}"
+
+class ClientConnection:
+    """Outbound side of a websocket: a bounded queue drained by its own writer task"""
+    def __init__(self, websocket, max_queue: int = 256, overflow: str = "drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.queue = deque()  # (enqueued_at, Frame)
+        self.closed = False
+        self.batching = False
+        self.held = False  # queue but don't send (see hold)
+        self._held_from = 0  # queue length when the hold began
+        self.encoding = "json"
+        self.logged_in = False
+        self.last_active = time.monotonic()  # last message from the client
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Output counters
+        self.commands = 0
+        self.frames_sent = 0
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        # Lag metrics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+        
+    def start(self):
+        """Start the writer task"""
+        self._task = asyncio.create_task(self._writer())
+        
+    def send(self, frame: Frame) -> bool:
+        """Queue a frame without waiting on the socket; False if it was refused"""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue and not self._make_room():
+            return False
+        self.queue.append((time.monotonic(), frame))
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._wakeup.set()
+        return True
+    
+    def hold(self):
+        """Stop sending until release(); frames already queued wait too"""
+        self.held = True
+        self._held_from = len(self.queue)
+    
+    def release(self, first: Optional[Frame] = None):
+        """Send again, putting first (if given) ahead of everything queued during the hold"""
+        self.held = False
+        if first is not None and not self.closed:
+            self.queue.insert(min(self._held_from, len(self.queue)), (time.monotonic(), first))
+        self._wakeup.set()
+    
+    def _make_room(self) -> bool:
+        """Apply the overflow policy to a full queue"""
+        if self.overflow == "disconnect":
+            logger.warning(f"⚠️  Send queue overflow, disconnecting {self.remote_name()}")
+            self.closed = True
+            self.dropped += len(self.queue) + 1
+            self.queue.clear()
+            asyncio.ensure_future(self.websocket.close(code=1008, reason="send queue overflow"))
+            return False
+        if self.overflow == "coalesce" and self._coalesce():
+            return True
+        self.queue.popleft()
+        self.dropped += 1
+        return True
+    
+    def _coalesce(self) -> bool:
+        """Fold all queued broadcasts into the first one; False if nothing to fold"""
+        broadcasts = [item for item in self.queue if item[1].type == "broadcast"]
+        if len(broadcasts) < 2:
+            return False
+        enqueued_at, first = broadcasts[0]
+        merged = Frame("broadcast", "\n".join(frame.text for _, frame in broadcasts),
+                       timestamp=first.timestamp)
+        folded = deque()
+        for item in self.queue:
+            if item is broadcasts[0]:
+                folded.append((enqueued_at, merged))
+            elif item[1].type != "broadcast":
+                folded.append(item)
+        self.queue = folded
+        self.coalesced += len(broadcasts) - 1
+        return True
+    
+    async def _writer(self):
+        """Drain the queue onto the socket, one frame at a time"""
+        try:
+            while True:
+                while not self.queue or self.held:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if self.batching:
+                    # Let the rest of this loop iteration queue its output first
+                    await asyncio.sleep(0)
+                    batch = [self.queue.popleft() for _ in range(len(self.queue))]
+                else:
+                    batch = [self.queue.popleft()]
+                if len(batch) == 1:
+                    data = batch[0][1].encode(self.encoding)
+                else:
+                    data = encode_batch([frame for _, frame in batch], self.encoding)
+                    self.batches_sent += 1
+                await self.websocket.send(data)
+                self.frames_sent += 1
+                self.bytes_sent += len(data)
+                now = time.monotonic()
+                for enqueued_at, _ in batch:
+                    lag = now - enqueued_at
+                    self.sent += 1
+                    self.last_lag = lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self.avg_lag += (lag - self.avg_lag) * 0.1
+        except websockets.exceptions.ConnectionClosed:
+            self.closed = True
+            self.queue.clear()
+        except Exception:
+            # Nothing will be sent on this connection again; close the socket so its handler's reads
+            # end and the session is cleaned up, instead of a player who hears nothing
+            logger.exception(f"💥 Output to {self.remote_name()} failed, closing the connection")
+            self.closed = True
+            self.queue.clear()
+            await self.websocket.close(code=1011, reason="internal error")
+    
+    async def close(self):
+        """Stop the writer task and discard anything still queued"""
+        self.closed = True
+        self.queue.clear()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def evict(self, frame: Frame, code: int = 1000, reason: str = ""):
+        """Send a last frame ahead of anything queued, then close the socket
+        
+        The connection's handler sees its reads end and does the usual cleanup.
+        """
+        encoding = self.encoding
+        await self.close()
+        try:
+            await asyncio.wait_for(self.websocket.send(frame.encode(encoding)), EVICT_SEND_TIMEOUT)
+        except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+            pass
+        await self.websocket.close(code=code, reason=reason)
+    
+    def remote_name(self) -> str:
+        return str(getattr(self.websocket, "remote_address", "client"))
+    
+    def stats(self) -> dict:
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "frames": self.frames_sent,
+            "batches": self.batches_sent,
+            "bytes": self.bytes_sent,
+            "commands": self.commands,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "lag_ms": round(self.last_lag * 1000, 2),
+            "avg_lag_ms": round(self.avg_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
+
+class SessionReaper:
+    """Ends sessions that never log in or have gone quiet, and counts every session the server ends
+    
+    Half-open sockets are caught by websockets' ping/pong heartbeat; this
+    covers clients that are connected but silent.
+    """
+    def __init__(self, connections: Set[ClientConnection], metrics: MetricsRegistry,
+                 login_timeout: float = 30.0, idle_timeout: float = 900.0, interval: float = 5.0):
+        self.connections = connections
+        self.login_timeout = login_timeout
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.reaped = metrics.counter("sessions_reaped_total", "Sessions ended by the server", ("reason",))
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sweep(time.monotonic())
+    
+    def sweep(self, now: float) -> int:
+        """Reap connections past their login or idle timeout; returns how many"""
+        reaped = 0
+        for connection in list(self.connections):
+            if connection.closed:
+                continue
+            quiet = now - connection.last_active
+            if not connection.logged_in and self.login_timeout and quiet > self.login_timeout:
+                self.reap(connection, "login", LOGIN_TIMEOUT_TEXT)
+            elif connection.logged_in and self.idle_timeout and quiet > self.idle_timeout:
+                self.reap(connection, "idle", IDLE_TEXT)
+            else:
+                continue
+            reaped += 1
+        return reaped
+    
+    def reap(self, connection: ClientConnection, reason: str, text: str):
+        self.reaped.inc(reason)
+        asyncio.ensure_future(connection.evict(Frame("system", text, timestamp=False), reason=reason))
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is ready now)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def take(self, tokens: int = 1):
+        """Spend tokens; a batch may overdraw, making the connection wait longer afterwards"""
+        self.tokens -= tokens
+
+class CommandSession:
+    """One connection's pending commands and rate limit"""
+    __slots__ = ("player", "connection", "bucket", "pending", "scheduled")
+    
+    def __init__(self, player, connection, bucket: TokenBucket):
+        self.player = player
+        self.connection = connection
+        self.bucket = bucket
+        self.pending = deque()
+        self.scheduled = False
+
+class CommandScheduler:
+    """Runs queued commands round-robin across connections, one at a time per connection"""
+    def __init__(self, execute, max_pending: int = 20, workers: int = 4, cost=None):
+        self.execute = execute  # async (session, command) -> None
+        self.cost = cost or (lambda command: 1)  # rate limit tokens a command uses
+        self.max_pending = max_pending
+        self.workers = workers
+        self.ready = deque()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.pending_total = 0
+        self.rejected = 0
+        self.delayed = 0
+        
+    def submit(self, session: CommandSession, command) -> bool:
+        """Queue a request; False if the connection already has too many waiting"""
+        if len(session.pending) >= self.max_pending:
+            self.rejected += 1
+            return False
+        session.pending.append(command)
+        self.pending_total += 1
+        if not session.scheduled:
+            self._make_ready(session)
+        return True
+    
+    def _make_ready(self, session: CommandSession):
+        session.scheduled = True
+        self.ready.append(session)
+        self._wakeup.set()
+        
+    def _retry_later(self, session: CommandSession):
+        if session.pending:
+            self.ready.append(session)
+            self._wakeup.set()
+        else:
+            session.scheduled = False
+        
+    def drop(self, session: CommandSession):
+        """Forget a disconnected session's queued commands"""
+        self.pending_total -= len(session.pending)
+        session.pending.clear()
+        
+    def queued(self) -> int:
+        return self.pending_total
+    
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            session = self.ready.popleft()
+            if not session.pending:
+                session.scheduled = False
+                continue
+            wait = session.bucket.delay()
+            if wait > 0:
+                # Out of tokens: park this connection and serve the others
+                self.delayed += 1
+                loop.call_later(wait, self._retry_later, session)
+                continue
+            command = session.pending.popleft()
+            session.bucket.take(self.cost(command))
+            self.pending_total -= 1
+            try:
+                await self.execute(session, command)
+            except Exception as e:
+                logger.error(f"Scheduled command failed: {e}")
+            if session.pending:
+                self.ready.append(session)
+            else:
+                session.scheduled = False
+    
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+TICK_PHASES = ("regen", "npc", "ambiance")
+
+AMBIANCE = [
+    "A cool breeze rustles through the undergrowth.",
+    "Somewhere in the distance, an owl calls twice.",
+    "The light shifts as clouds drift across the sun.",
+    "Pine needles drift down from the canopy above.",
+    "A faint hum rises from the earth, then fades.",
+]
+
+# What an NPC says when there is no dialogue model, or it failed to answer in time
+MOOD_LINES = {
+    "friendly": "Well met, traveller! The forest is kind to those who tread lightly.",
+    "neutral": "Hm. The paths shift, but the Clearing stays where it always was.",
+    "mysterious": "Not all that wanders is lost... nor is all that is lost found.",
+    "helpful": "If you seek a place, ask the trails: 'path' will show you the way.",
+}
+DIALOGUE_MEMORY = 6  # recent lines an NPC remembers and is prompted with
+PROFILE_TOP = 10  # functions listed in a profile summary
+MAX_PROFILE_SECONDS = 300.0  # longest window, and how long a command profile waits for its executions
+PROFILE_USAGE = "Usage: profile sample|trace <seconds>, profile sample|trace <command> <n>, or profile stop"
+
+class WorldClock:
+    """Fixed-rate world tick that runs registered systems in phases"""
+    def __init__(self, tick_rate: float = 4.0, max_catchup: int = 5):
+        self.period = 1.0 / tick_rate
+        self.max_catchup = max_catchup
+        self.systems: Dict[str, list] = {phase: [] for phase in TICK_PHASES}
+        self.tick_count = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.last_tick_time = 0.0
+        self.max_tick_time = 0.0
+        self.phase_time = {phase: 0.0 for phase in TICK_PHASES}
+        self.phase_max = {phase: 0.0 for phase in TICK_PHASES}
+        self._last_warning = 0.0
+        self._task = None
+        
+    def register(self, phase: str, system, interval: float = None):
+        """Run an async system(tick) in a phase every tick, or every `interval` seconds"""
+        if phase not in self.systems:
+            raise ValueError(f"Unknown tick phase: {phase}")
+        every = max(1, round(interval / self.period)) if interval else 1
+        self.systems[phase].append((system, every))
+        
+    async def tick(self):
+        """Run one tick, timing each phase"""
+        self.tick_count += 1
+        tick_start = time.perf_counter()
+        for phase in TICK_PHASES:
+            phase_start = time.perf_counter()
+            for system, every in self.systems[phase]:
+                if self.tick_count % every:
+                    continue
+                try:
+                    await system(self.tick_count)
+                except Exception as e:
+                    logger.error(f"Tick system {phase}/{getattr(system, '__name__', system)} failed: {e}")
+            elapsed = time.perf_counter() - phase_start
+            self.phase_time[phase] += elapsed
+            self.phase_max[phase] = max(self.phase_max[phase], elapsed)
+        self.last_tick_time = time.perf_counter() - tick_start
+        self.max_tick_time = max(self.max_tick_time, self.last_tick_time)
+        if self.last_tick_time > self.period:
+            self.overruns += 1
+            self._warn_overrun()
+            
+    def _warn_overrun(self):
+        now = time.monotonic()
+        if now - self._last_warning < 10:
+            return
+        self._last_warning = now
+        logger.warning(f"⏱️  Tick {self.tick_count} took {self.last_tick_time * 1000:.1f}ms "
+                       f"(budget {self.period * 1000:.0f}ms, {self.overruns} overruns so far)")
+        
+    async def run(self):
+        """Tick forever on a fixed schedule; late ticks catch up instead of drifting"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            await self.tick()
+            next_tick += self.period
+            behind = loop.time() - next_tick
+            if behind > self.period * self.max_catchup:
+                missed = int(behind // self.period)
+                next_tick += missed * self.period
+                self.skipped_ticks += missed
+                logger.warning(f"⏱️  World clock fell {behind * 1000:.0f}ms behind, skipping {missed} ticks")
+            if behind < 0:
+                await asyncio.sleep(-behind)
+            else:
+                await asyncio.sleep(0)
+    
+    def start(self):
+        """Start ticking on the running event loop"""
+        self._task = asyncio.create_task(self.run())
+        
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> dict:
+        ticks = max(self.tick_count, 1)
+        return {
+            "ticks": self.tick_count,
+            "overruns": self.overruns,
+            "skipped": self.skipped_ticks,
+            "last_ms": round(self.last_tick_time * 1000, 3),
+            "max_ms": round(self.max_tick_time * 1000, 3),
+            "phase_avg_ms": {phase: round(self.phase_time[phase] / ticks * 1000, 3) for phase in TICK_PHASES},
+        }
+
 class MUDWorld:
     """The game world"""
-    def __init__(self):
+    def __init__(self, tick_rate: float = 4.0):
         self.rooms: Dict[str, Room] = {}
         self.players: Dict[str, Player] = {}
         self.npcs: Dict[str, NPC] = {}
         self.connections: Set = set()
+        self.store: Optional[WorldStore] = None
+        self.journal: Optional[Journal] = None
+        self.saved_players: Dict[str, tuple] = {}
+        self.admins: Set[str] = set()
+        self.snapshot_path: Optional[str] = None
+        self.snapshot_task: Optional[asyncio.Task] = None
+        self.profile_dir: Optional[str] = None  # where collapsed stacks go; None: summary only
+        self.profile: Optional[ProfileSession] = None
+        self.profile_task: Optional[asyncio.Task] = None
+        self.dialogue: Optional[DialoguePool] = None
+        self.talking: Set[str] = set()  # players waiting for an NPC's reply
+        self.routes = RouteCache(self.rooms)
+        self.render_cache: Dict[str, RenderedRoom] = {}
+        self.layout_version = 0  # bumped when rooms are loaded in bulk or renamed, since exits show their names
+        self.render_stats = {"looks": 0, "static_hits": 0, "content_hits": 0}
+        self.metrics = MetricsRegistry()
+        self.commands_total = self.metrics.counter(
+            "commands_total", "Commands handled, by command name", ("command",))
+        self.command_errors = self.metrics.counter(
+            "command_errors_total", "Commands that raised, by command name", ("command",))
+        self.command_latency = self.metrics.histogram(
+            "command_seconds", "Command handler latency, by command name", ("command",))
+        self.metrics.gauge("players_connected", "Connected players, agents included", lambda: len(self.players))
+        self.metrics.gauge("agents_connected", "Connected autonomous agents",
+                           lambda: sum(1 for p in self.players.values() if p.is_agent))
+        self.metrics.gauge("rooms", "Rooms in the world", lambda: len(self.rooms))
+        self.metrics.gauge("npcs", "NPCs in the world", lambda: len(self.npcs))
         self.command_handlers = {
             "look": self.cmd_look,
             "go": self.cmd_go,
@@ -124,10 +905,21 @@ class MUDWorld:
             "create": self.cmd_create,
             "spawn": self.cmd_spawn,
             "examine": self.cmd_examine,
+            "talk": self.cmd_talk,
             "take": self.cmd_take,
             "drop": self.cmd_drop,
             "status": self.cmd_status,
+            "stats": self.cmd_stats,
+            "path": self.cmd_path,
+            "travel": self.cmd_travel,
+            "snapshot": self.cmd_snapshot,
+            "restore": self.cmd_restore,
+            "profile": self.cmd_profile,
         }
+        self.clock = WorldClock(tick_rate)
+        self.clock.register("regen", self.tick_regen, interval=2.0)
+        self.clock.register("npc", self.tick_npc_wander, interval=10.0)
+        self.clock.register("ambiance", self.tick_ambiance, interval=30.0)
         self.init_world()
         
     def init_world(self):
@@ -136,7 +928,7 @@ class MUDWorld:
         spawn = Room("spawn", "The Clearing", 
             "A mossy clearing surrounded by ancient pines. Sunlight filters through the canopy, "
             "casting dancing shadows on the forest floor. A weathered stone altar stands in the center.")
-        spawn.objects = ["stone altar", "glowing mushrooms", "weathered sign"]
+        spawn.objects = ItemList(["stone altar", "glowing mushrooms", "weathered sign"])
         
         # Create initial rooms
         rooms_data = [
@@ -173,27 +965,439 @@ class MUDWorld:
             npc = NPC(npc_id, name, desc, npc_type)
             npc.room_id = room_id
             self.npcs[npc_id] = npc
-            self.rooms[room_id].npcs.append(npc)
+            self.rooms[room_id].add_npc(npc)
         
         logger.info("🌲 World initialized with %d rooms and %d NPCs", len(self.rooms), len(self.npcs))
     
+    def is_admin(self, player: Player) -> bool:
+        """Listed with --admin and logged in with the admin credential"""
+        return player.admin and player.name in self.admins
+    
+    def mark_dirty(self, kind: str, key: str):
+        """Flag an entity for the next write-behind flush"""
+        if self.store:
+            self.store.mark(kind, key)
+    
+    def record(self, kind: str, actor: Optional[str], *fields):
+        """Append a world change to the journal, if there is one"""
+        if self.journal:
+            self.journal.append(kind, actor, *fields)
+    
+    def attach_store(self, store: WorldStore):
+        """Load saved state on top of the seed world, then start writing behind"""
+        self.load_store(store)
+        self.store = store
+    
+    def load_store(self, store: WorldStore):
+        """Load saved state on top of the seed world, without writing anything back"""
+        start = time.perf_counter()
+        data = store.load()
+        texts: Dict[str, str] = {}  # one copy of each repeated description
+        for room_id, name, desc, exits, objects, created_by, created_at in data["rooms"]:
+            desc = texts.setdefault(desc, desc)
+            room = self.rooms.get(room_id)
+            if room is None:
+                room = Room(room_id, name, desc)
+                self.rooms[room.id] = room
+            room.name = name
+            room.description = desc
+            room.set_exits(json.loads(exits))
+            objects = json.loads(objects)
+            room.objects = ItemList(objects) if objects else NO_ITEMS
+            room.created_by = sys.intern(created_by)
+            room.created_at = created_at
+        self.layout_version += 1  # saved names may differ from the seed world's
+        for npc_id, name, desc, npc_type, room_id, mood, inventory in data["npcs"]:
+            npc = self.npcs.get(npc_id)
+            if npc is None:
+                npc = self.npcs[npc_id] = NPC(npc_id, name, desc, npc_type)
+            npc.ai_mood = mood
+            npc.inventory = json.loads(inventory) or NO_ITEMS
+            if room_id in self.rooms and room_id != npc.room_id:
+                self.move_npc(npc, room_id)
+        for row in data["players"]:
+            self.saved_players[row[0]] = row
+        self.routes.invalidate()
+        logger.info(f"💾 Loaded {len(data['rooms'])} rooms, {len(data['npcs'])} NPCs and "
+                    f"{len(data['players'])} players in {time.perf_counter() - start:.2f}s")
+    
+    def attach_journal(self, journal: Journal, recover: bool = True):
+        """Rebuild the world from the journal's checkpoint and events, then journal every change from here on"""
+        if recover:
+            start = time.perf_counter()
+            data, events = journal.recover()
+            if data:
+                self.apply_snapshot(data)
+            replayed = self.replay(events)
+            logger.info(f"📜 Recovered {len(self.rooms)} rooms and {len(self.npcs)} NPCs from "
+                        f"{'checkpoint ' + str(journal.checkpoint_segment) if data else 'the seed world'} "
+                        f"and {replayed} events in {time.perf_counter() - start:.2f}s")
+        else:
+            journal.recover()  # only to find where the next segment starts and the seq to carry on from
+        if not recover or not journal.checkpoint_segment:
+            # The world was built some other way, or from the seed world: checkpoint it, so the next
+            # recovery starts from what was live rather than from whatever the seed world is by then
+            journal.compact_soon()
+        self.journal = journal
+    
+    def replay(self, events) -> int:
+        """Apply journaled events on top of the current world; returns how many were applied
+
+        Rooms and NPCs the world already has are left alone, so replaying an
+        event twice does not duplicate them.
+        """
+        offline: Dict[str, Player] = {}  # saved players the events touch, edited as Player objects
+        
+        def saved(name: str) -> Player:
+            player = offline.get(name)
+            if player is None:
+                row = self.saved_players.get(name)
+                player = offline[name] = Player(name, bool(row[5]) if row else False)
+                self.restore_player(player)
+            return player
+        
+        count = 0
+        for _, _, kind, actor, *fields in events:
+            count += 1
+            if kind == "room_created":
+                room_id, name, desc, exits, objects, created_at = fields
+                if room_id in self.rooms:
+                    count -= 1
+                    continue
+                room = Room(room_id, name, desc)
+                room.set_exits(exits)
+                if objects:
+                    room.objects = ItemList(objects)
+                room.created_by = sys.intern(actor or "system")
+                room.created_at = created_at
+                self.add_room(room)
+            elif kind == "exit_added":
+                room_id, direction, target = fields
+                if room_id in self.rooms:
+                    self.add_exit(self.rooms[room_id], direction, target)
+            elif kind == "player_moved":
+                name, room_id = fields
+                if room_id in self.rooms:
+                    player = saved(name)
+                    player.room_id = room_id
+                    player.explored_rooms.add(room_id)
+            elif kind == "npc_spawned":
+                if fields[0] in self.npcs:
+                    count -= 1
+                    continue
+                self._add_rows((), [(*fields, NO_ITEMS)])
+                self.mark_dirty("npc", fields[0])
+            elif kind == "npc_moved":
+                npc_id, room_id = fields
+                npc = self.npcs.get(npc_id)
+                if npc and room_id in self.rooms and room_id != npc.room_id:
+                    self.move_npc(npc, room_id)
+            elif kind in ("object_taken", "object_dropped"):
+                room_id, item = fields
+                room = self.rooms.get(room_id)
+                if room is None:
+                    continue
+                player = saved(actor)
+                if kind == "object_taken" and item in room.objects:
+                    room.remove_object(item)
+                    player.inventory.append(item)
+                elif kind == "object_dropped" and item in player.inventory:
+                    player.inventory.remove(item)
+                    room.add_object(item)
+                self.mark_dirty("room", room_id)
+            else:
+                count -= 1
+                logger.warning(f"📜 Skipping unknown journal event {kind!r}")
+        for name, player in offline.items():
+            self.saved_players[name] = self.player_row(player)
+        if self.store and offline:
+            self.store.submit({"upsert": {"player": [self.saved_players[name] for name in offline]}})
+        self.routes.invalidate()
+        return count
+    
+    def restore_player(self, player: Player):
+        """Give a returning player their saved room, inventory and stats"""
+        row = self.saved_players.get(player.name)
+        if not row:
+            return
+        _, room_id, inventory, stats, explored, _ = row
+        if room_id in self.rooms:
+            player.room_id = room_id
+        player.inventory = ItemList(json.loads(inventory))
+        player.stats.update(json.loads(stats))
+        player.explored_rooms = set(json.loads(explored))
+    
+    def collect_rows(self, dirty: Dict[str, Set[str]]) -> dict:
+        """Turn dirty keys into rows for the store (runs on the event loop)"""
+        upsert = {"room": [], "npc": [], "player": []}
+        delete = {"room": [], "npc": [], "player": []}
+        for room_id in dirty["room"]:
+            room = self.rooms.get(room_id)
+            if room is None:
+                delete["room"].append(room_id)
+                continue
+            upsert["room"].append((room.id, room.name, room.description, json.dumps(room.exits),
+                                   json.dumps(room.objects), room.created_by, room.created_at))
+        for npc_id in dirty["npc"]:
+            npc = self.npcs.get(npc_id)
+            if npc is None:
+                delete["npc"].append(npc_id)
+                continue
+            upsert["npc"].append((npc.id, npc.name, npc.description, npc.type, npc.room_id,
+                                  npc.ai_mood, json.dumps(npc.inventory)))
+        for name in dirty["player"]:
+            player = self.players.get(name)
+            if player is None:
+                continue
+            row = self.player_row(player)
+            self.saved_players[name] = row
+            upsert["player"].append(row)
+        return {"upsert": upsert, "delete": delete}
+    
+    def player_row(self, player: Player) -> tuple:
+        """A player's saved state, as the store and snapshots keep it"""
+        return (player.name, player.room_id, json.dumps(player.inventory), json.dumps(player.stats),
+                json.dumps(sorted(player.explored_rooms)), int(player.is_agent))
+    
+    def snapshot_rows(self):
+        """Rooms, NPCs and player records as snapshot rows, read straight off live state"""
+        rooms = ((room.id, room.name, room.description, room.exits, room.objects, room.created_by,
+                  room.created_at) for room in self.rooms.values())
+        npcs = ((npc.id, npc.name, npc.description, npc.type, npc.room_id, npc.ai_mood, npc.inventory)
+                for npc in self.npcs.values())
+        players = dict(self.saved_players)
+        players.update((player.name, self.player_row(player)) for player in self.players.values())
+        return rooms, npcs, players.values()
+    
+    def apply_snapshot(self, data: dict):
+        """Replace rooms, NPCs and player records with a snapshot's; online players stay on"""
+        stale = {"room": set(self.rooms), "npc": set(self.npcs)}
+        self._bulk_build(self._build_from_snapshot, data)
+        self.routes.invalidate()
+        for player in self.players.values():
+            room = self.rooms.get(player.room_id)
+            if room and "delta" in player.capabilities and player.connection:
+                player.connection.send(self.room_state_frame(room))  # what they mirror is gone
+        if self.store:
+            # The snapshot is now the truth: rewrite everything, delete what it lacks
+            for kind, keys in (("room", stale["room"] | set(self.rooms)), ("npc", stale["npc"] | set(self.npcs)),
+                               ("player", set(self.players))):
+                for key in keys:
+                    self.store.mark(kind, key)
+            self.store.submit({"upsert": {"player": list(self.saved_players.values())}})
+    
+    def populate(self, generated: dict):
+        """Add a worldgen world to the seed world (generated rooms are seed rooms: not saved unless changed)"""
+        start = time.perf_counter()
+        self._bulk_build(self._add_rows, generated["rooms"], generated["npcs"])
+        for room_id, direction, target in generated["links"]:
+            room = self.rooms.get(room_id)
+            if room is None or direction in room.exits:
+                logger.warning(f"⚠️  Generated world could not link {room_id} {direction} to {target}")
+                continue
+            room.set_exit(direction, target)
+        self.routes.invalidate()
+        logger.info(f"🗺️  Generated world: {len(self.rooms)} rooms and {len(self.npcs)} NPCs "
+                    f"in {time.perf_counter() - start:.2f}s")
+    
+    def _bulk_build(self, build, *args):
+        # Millions of new objects would set off full collections over and over
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            build(*args)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        gc.freeze()  # the new world is long-lived: keep it out of future collections (and fork copies)
+    
+    def _build_from_snapshot(self, data: dict):
+        self.rooms.clear()
+        self.npcs.clear()
+        self.render_cache.clear()
+        self._add_rows(data["rooms"], data["npcs"])
+        self.saved_players = {row[0]: row for row in data["players"]}
+        for player in self.players.values():
+            self.restore_player(player)
+            room = self.rooms.get(player.room_id) or self.rooms.get("spawn")
+            if room:
+                player.room_id = room.id
+                room.enter(player.name)
+    
+    def _add_rows(self, rooms, npcs):
+        """Build rooms and NPCs from snapshot-shaped rows"""
+        for room_id, name, desc, exits, objects, created_by, created_at in rooms:
+            room = Room(room_id, name, desc)
+            room.exits = exits or NO_EXITS  # snapshot strings come back interned
+            if objects:
+                room.objects = ItemList(objects)
+            room.created_by = sys.intern(created_by)
+            room.created_at = created_at
+            self.rooms[room.id] = room
+        self.layout_version += 1
+        for npc_id, name, desc, npc_type, room_id, mood, inventory in npcs:
+            npc = NPC(npc_id, name, desc, npc_type)
+            npc.ai_mood = mood
+            npc.inventory = inventory or NO_ITEMS
+            self.npcs[npc.id] = npc
+            room = self.rooms.get(room_id)
+            if room:
+                npc.room_id = room.id
+                room.add_npc(npc)
+    
+    def add_room(self, room: Room):
+        """Add a room (and its own exits) to the world"""
+        self.rooms[room.id] = room
+        self.refresh_around(room)
+        self.mark_dirty("room", room.id)
+        self.record("room_created", room.created_by, room.id, room.name, room.description, room.exits,
+                    room.objects, room.created_at)
+        self.routes.room_added(room.id)
+    
+    def refresh_around(self, room: Room):
+        """Drop cached views a new room changes: its own, and those of neighbours whose exits already lead to it
+        
+        Every other room's exits still name the same rooms, so their views stay cached.
+        """
+        self.render_cache.pop(room.id, None)
+        for neighbour_id in set(room.exits.values()):
+            neighbour = self.rooms.get(neighbour_id)
+            if neighbour and room.id in neighbour.exits.values():
+                neighbour.touch(static=True)
+    
+    def add_exit(self, room: Room, direction: str, room_id: str, by: Optional[str] = None):
+        """Open an exit from room to room_id"""
+        room.set_exit(direction, room_id)
+        self.mark_dirty("room", room.id)
+        self.record("exit_added", by, room.id, direction, room_id)
+        self.routes.exit_added(room.id, direction, room_id)
+    
+    def add_player(self, player: Player):
+        """Register a connected player and index them in their room"""
+        self.players[player.name] = player
+        room = self.rooms.get(player.room_id)
+        if room:
+            player.room_id = room.id
+            room.enter(player.name)
+    
+    def remove_player(self, player: Player):
+        """Drop a player from the world and from their room's occupants"""
+        room = self.rooms.get(player.room_id)
+        if room:
+            room.leave(player.name)
+        if self.players.get(player.name) is player:
+            if self.store:
+                self.flush_player(player)
+            elif self.journal:
+                self.saved_players[player.name] = self.player_row(player)  # for the next checkpoint
+            del self.players[player.name]
+    
+    def flush_player(self, player: Player):
+        """Queue a player's final state before they leave self.players"""
+        self.store.dirty["player"].discard(player.name)
+        rows = self.collect_rows({"room": set(), "npc": set(), "player": {player.name}})
+        self.store.submit(rows)
+    
+    def move_player(self, player: Player, room_id: str):
+        """Move a player between rooms, keeping Room.players in sync"""
+        old_room = self.rooms.get(player.room_id)
+        if old_room:
+            old_room.leave(player.name)
+        room = self.rooms[room_id]
+        player.room_id = room.id
+        room.enter(player.name)
+        self.mark_dirty("player", player.name)
+        self.record("player_moved", player.name, player.name, room.id)
+    
+    def move_npc(self, npc: NPC, room_id: str):
+        """Move an NPC between rooms"""
+        old_room = self.rooms.get(npc.room_id)
+        if old_room and npc in old_room.npcs:
+            old_room.remove_npc(npc)
+        room = self.rooms[room_id]
+        npc.room_id = room.id
+        room.add_npc(npc)
+        self.mark_dirty("npc", npc.id)
+        self.record("npc_moved", None, npc.id, room.id)
+    
+    def players_in_room(self, room_id: str, exclude: str = None) -> List[Player]:
+        """Players currently in a room, looked up through the occupancy index"""
+        room = self.rooms.get(room_id)
+        if not room:
+            return []
+        return [self.players[name] for name in room.players
+                if name != exclude and name in self.players]
+    
+    async def tick_regen(self, tick: int):
+        """Players slowly recover health and energy"""
+        for player in self.players.values():
+            stats = player.stats
+            if stats["health"] < 100:
+                stats["health"] = min(100, stats["health"] + 1)
+            if stats["energy"] < 100:
+                stats["energy"] = min(100, stats["energy"] + 2)
+    
+    async def tick_npc_wander(self, tick: int):
+        """Wanderers drift between rooms and their moods shift"""
+        for npc in list(self.npcs.values()):
+            if random.random() < 0.05:
+                npc.ai_mood = random.choice(["friendly", "neutral", "mysterious", "helpful"])
+            if npc.type != "wanderer" or random.random() >= 0.2:
+                continue
+            room = self.rooms.get(npc.room_id)
+            if not room or not room.exits:
+                continue
+            direction, room_id = random.choice(list(room.exits.items()))
+            if not self.npc_can_enter(npc, room_id):
+                continue
+            self.move_npc(npc, room_id)
+            if room.players:
+                await self.broadcast(f"{npc.name} wanders off to the {direction}.", room.id,
+                                     delta={"op": "npc_left", "id": npc.id, "name": npc.name})
+            if self.rooms[room_id].players:
+                await self.broadcast(f"{npc.name} wanders in from the {self.opposite_dir(direction)}.", room_id,
+                                     delta={"op": "npc_joined",
+                                            "npc": {"id": npc.id, "name": npc.name, "type": npc.type}})
+    
+    def npc_can_enter(self, npc: NPC, room_id: str) -> bool:
+        """Whether a wandering NPC may move into room_id"""
+        return room_id in self.rooms
+    
+    async def tick_ambiance(self, tick: int):
+        """Occasional atmosphere for occupied rooms"""
+        occupied = {player.room_id for player in self.players.values()}
+        for room_id in occupied:
+            if random.random() < 0.3:
+                await self.broadcast(random.choice(AMBIANCE), room_id, ambient=True)
+    
     async def handle_command(self, player: Player, command_line: str) -> str:
         """Process a player command"""
+        text, _ = await self.execute(player, command_line)
+        return text
+    
+    async def execute(self, player: Player, command_line: str) -> Tuple[str, bool]:
+        """Process a player command; ok is False if it was unknown or failed"""
         parts = command_line.strip().split()
         if not parts:
-            return ""
+            return "", True
             
         cmd = parts[0].lower()
         args = parts[1:]
         
         if cmd in self.command_handlers:
+            self.commands_total.inc(cmd)
+            start = time.perf_counter()
             try:
-                return await self.command_handlers[cmd](player, args)
+                return await self.command_handlers[cmd](player, args), True
             except Exception as e:
+                self.command_errors.inc(cmd)
                 logger.error(f"Command error: {e}")
-                return "Something went wrong. The forest spirits are confused."
+                return "Something went wrong. The forest spirits are confused.", False
+            finally:
+                self.command_latency.observe(time.perf_counter() - start, cmd)
         else:
-            return f"Unknown command: '{cmd}'. Type 'help' for available commands."
+            self.commands_total.inc("unknown")
+            return f"Unknown command: '{cmd}'. Type 'help' for available commands.", False
     
     async def cmd_look(self, player: Player, args: List[str]) -> str:
         """Look around the room"""
@@ -204,26 +1408,74 @@ class MUDWorld:
         # Mark as explored
         player.explored_rooms.add(room.id)
         
-        result = f"\n[{room.name}]\n{room.description}\n\n"
-        
-        if room.objects:
-            result += f"You see: {', '.join(room.objects)}\n"
-        
-        if room.npcs:
-            npc_names = [npc.name for npc in room.npcs]
-            result += f"NPCs: {', '.join(npc_names)}\n"
+        return self.render_room(room, player.name)
+    
+    def render_room(self, room: Room, viewer: str) -> str:
+        """Look text for a room, rebuilding only the parts whose version moved"""
+        self.render_stats["looks"] += 1
+        cached = self.rendered(room)
         
-        other_players = [p.name for p in self.players.values() 
-                        if p.room_id == room.id and p.name != player.name]
-        if other_players:
-            result += f"Players here: {', '.join(other_players)}\n"
+        static_key = (room.static_version, self.layout_version)
+        if cached.static_key == static_key:
+            self.render_stats["static_hits"] += 1
+        else:
+            cached.static_key = static_key
+            cached.header = f"\n[{room.name}]\n{room.description}\n\n"
+            cached.exits = ""
+            if room.exits:
+                exits = [f"{dir} ({self.rooms[rid].name if rid in self.rooms else 'Unknown'})"
+                        for dir, rid in room.exits.items()]
+                cached.exits = f"\nExits: {', '.join(exits)}\n"
         
-        if room.exits:
-            exits = [f"{dir} ({self.rooms.get(rid, Room('', 'Unknown', '')).name})" 
-                    for dir, rid in room.exits.items()]
-            result += f"\nExits: {', '.join(exits)}\n"
+        if cached.version == room.version:
+            self.render_stats["content_hits"] += 1
+        else:
+            cached.version = room.version
+            contents = ""
+            if room.objects:
+                contents += f"You see: {', '.join(room.objects)}\n"
+            if room.npcs:
+                contents += f"NPCs: {', '.join(npc.name for npc in room.npcs)}\n"
+            cached.contents = contents
+            cached.occupants = [p.name for p in self.players_in_room(room.id)]
         
-        return result
+        others = ", ".join(name for name in cached.occupants if name != viewer)
+        players = f"Players here: {others}\n" if others else ""
+        return cached.header + cached.contents + players + cached.exits
+    
+    def rendered(self, room: Room) -> RenderedRoom:
+        cached = self.render_cache.get(room.id)
+        if cached is None:
+            cached = self.render_cache[room.id] = RenderedRoom()
+            if len(self.render_cache) > RENDER_CACHE_ROOMS:
+                del self.render_cache[next(iter(self.render_cache))]
+        return cached
+    
+    def room_state_frame(self, room: Room) -> Frame:
+        """The whole room as one structured frame, for delta clients entering it"""
+        cached = self.rendered(room)
+        key = (room.version, room.static_version, self.layout_version)
+        if cached.state_key != key:
+            cached.state_key = key
+            cached.state = Frame(
+                "room_state", None, timestamp=False, room=room.id, name=room.name,
+                description=room.description,
+                exits={direction: {"id": rid, "name": self.rooms[rid].name if rid in self.rooms else "Unknown"}
+                       for direction, rid in room.exits.items()},
+                objects=list(room.objects),
+                npcs=[{"id": npc.id, "name": npc.name, "type": npc.type} for npc in room.npcs],
+                players=[p.name for p in self.players_in_room(room.id)])
+        return cached.state
+    
+    async def arrival_text(self, player: Player) -> str:
+        """What a player sees on entering a room: the look text, or nothing for a
+        delta client, which is sent a room_state frame instead"""
+        room = self.rooms.get(player.room_id)
+        if room and "delta" in player.capabilities and player.connection:
+            player.explored_rooms.add(room.id)
+            player.connection.send(self.room_state_frame(room))
+            return ""
+        return await self.cmd_look(player, [])
     
     async def cmd_go(self, player: Player, args: List[str]) -> str:
         """Move to another room"""
@@ -231,26 +1483,31 @@ class MUDWorld:
             return "Go where? (north, south, east, west, up, down)"
         
         direction = args[0].lower()
-        room = self.rooms.get(player.room_id)
+        if not await self.walk(player, direction):
+            return f"You can't go {direction} from here."
+        
+        view = await self.arrival_text(player)
+        return f"You go {direction}.\n{view}" if view else f"You go {direction}."
+    
+    async def walk(self, player: Player, direction: str) -> bool:
+        """Move a player through an exit and tell both rooms, without showing them the new one
         
+        False if there is no such exit.
+        """
+        room = self.rooms.get(player.room_id)
         if direction not in room.exits:
-            return f"You can't go {direction} from here."
+            return False
         
         new_room_id = room.exits[direction]
         
-        # Remove from old room
-        room.players.discard(player.name)
-        
         # Move player
-        player.room_id = new_room_id
-        new_room = self.rooms[new_room_id]
-        new_room.players.add(player.name)
+        self.move_player(player, new_room_id)
         
         # Notify others
+        await self.broadcast(None, room.id, delta={"op": "player_left", "name": player.name})
         await self.broadcast(f"{player.name} arrives from the {self.opposite_dir(direction)}.", 
-                           new_room_id, exclude=player.name)
-        
-        return f"You go {direction}.\n{await self.cmd_look(player, [])}"
+                           new_room_id, exclude=player.name, delta={"op": "player_joined", "name": player.name})
+        return True
     
     async def cmd_say(self, player: Player, args: List[str]) -> str:
         """Say something to the room"""
@@ -284,14 +1541,14 @@ class MUDWorld:
         new_room.created_by = player.name
         
         # Connect rooms
-        current_room.exits[direction] = room_id
-        new_room.exits[self.opposite_dir(direction)] = player.room_id
-        
-        self.rooms[room_id] = new_room
+        new_room.set_exit(self.opposite_dir(direction), player.room_id)
+        self.add_room(new_room)
+        self.add_exit(current_room, direction, room_id, by=player.name)
         
         # Notify
         await self.broadcast(f"The world shifts! A new area opens to the {direction}!", 
-                           player.room_id)
+                           player.room_id, delta={"op": "exit_added", "direction": direction,
+                                                  "exit": {"id": room_id, "name": room_name}})
         
         logger.info(f"🏗️  {player.name} created room: {room_name} ({room_id})")
         
@@ -309,15 +1566,86 @@ class MUDWorld:
         npc.room_id = player.room_id
         
         self.npcs[npc_id] = npc
-        self.rooms[player.room_id].npcs.append(npc)
+        self.rooms[player.room_id].add_npc(npc)
+        self.mark_dirty("npc", npc_id)
+        self.record("npc_spawned", player.name, npc_id, npc_name, npc.description, npc.type, npc.room_id,
+                    npc.ai_mood)
         
         await self.broadcast(f"A shimmering form coalesces into {npc_name}!", 
-                           player.room_id)
+                           player.room_id, delta={"op": "npc_joined",
+                                                  "npc": {"id": npc_id, "name": npc_name, "type": npc.type}})
         
         logger.info(f"👤 {player.name} spawned NPC: {npc_name}")
         
         return f"You summon {npc_name} into existence."
     
+    async def find_route(self, from_room: str, query: str):
+        """Resolve a destination and return (room_id, [(direction, room_id), ...]) or (room_id, None)
+        
+        In a world too big for cached route trees each route is its own search,
+        run on a worker thread so the loop keeps serving while it works. The
+        destination is resolved here on the loop, and the thread is handed the
+        exit index to search, so a restore meanwhile cannot pull it away.
+        """
+        routes = self.routes
+        dest = routes.resolve(query)
+        if dest is None:
+            return None, None
+        if not routes.searching():
+            return dest, routes.route(from_room, dest)
+        routes.prepare()
+        steps = await asyncio.get_running_loop().run_in_executor(None, routes.search, from_room, dest,
+                                                                 routes.incoming)
+        if dest not in self.rooms:  # the world was restored under the search
+            return None, None
+        return dest, steps
+    
+    async def cmd_path(self, player: Player, args: List[str]) -> str:
+        """Show the shortest route to a room"""
+        if not args:
+            return "Path to where? (room name or id)"
+        dest, steps = await self.find_route(player.room_id, ' '.join(args))
+        if dest is None:
+            return f"No place called '{' '.join(args)}' is known to the forest."
+        if steps is None:
+            return f"No trail leads from here to {self.rooms[dest].name} that the forest can trace."
+        if not steps:
+            return f"You are already at {self.rooms[dest].name}."
+        return (f"Route to {self.rooms[dest].name} ({len(steps)} steps): "
+                f"{', '.join(direction for direction, _ in steps)}")
+    
+    async def cmd_travel(self, player: Player, args: List[str]) -> str:
+        """Walk the shortest route to a room"""
+        if not args:
+            return "Travel where? (room name or id)"
+        dest, steps = await self.find_route(player.room_id, ' '.join(args))
+        if dest is None:
+            return f"No place called '{' '.join(args)}' is known to the forest."
+        if steps is None:
+            return f"No trail leads from here to {self.rooms[dest].name} that the forest can trace."
+        if not steps:
+            return f"You are already at {self.rooms[dest].name}."
+        taken = []
+        for direction, room_id in steps:
+            if self.rooms[player.room_id].exits.get(direction) != room_id or not await self.walk(player, direction):
+                break
+            if player.room_id != room_id:
+                break
+            taken.append(direction)
+        # Shown the room once, on arrival: delta clients get one room_state, not one per room passed
+        view = await self.arrival_text(player)
+        travelled = f"You travel {', '.join(taken)}."
+        return f"{travelled}\n{view}" if view else travelled
+    
+    async def route_frame(self, player: Player, query) -> Frame:
+        """Machine-readable route for agents: {"route": "<room name or id>"}"""
+        dest, steps = await self.find_route(player.room_id, str(query))
+        if dest is None or steps is None:
+            return Frame("route", f"No route to '{query}'.", found=False, to=dest)
+        return Frame("route", ", ".join(direction for direction, _ in steps), found=True,
+                     to=dest, distance=len(steps),
+                     steps=[{"direction": direction, "room": room_id} for direction, room_id in steps])
+    
     async def cmd_inventory(self, player: Player, args: List[str]) -> str:
         """Check inventory"""
         if not player.inventory:
@@ -341,12 +1669,19 @@ say <text>     - Speak to room
 create <dir> <name> - Create new room (builder)
 spawn <name>   - Spawn NPC
 examine <obj>  - Look at object
+talk <npc> [about <topic>] - Talk with an NPC
 inventory      - Check inventory
 take <item>    - Take item
 drop <item>    - Drop item
+path <room>    - Show the shortest route to a room
+travel <room>  - Walk the shortest route to a room
 who            - List players
 help           - Show this help
 status         - Show world status
+stats [n]      - Server metrics, top n commands (admin)
+snapshot       - Save the world to its snapshot file (admin)
+restore        - Reload the world from its snapshot file (admin)
+profile sample|trace <secs> | <cmd> <n> - Profile the loop or a command (admin)
 
 Directions: north (n), south (s), east (e), west (w), up (u), down (d)
         """
@@ -361,8 +1696,202 @@ NPCs: {len(self.npcs)}
 Players Online: {len(self.players)}
 Your Location: {self.rooms[player.room_id].name}
 Explored: {len(player.explored_rooms)} rooms
+{self.format_tick_status()}
+{self.format_render_status()}
+{self.format_store_status()}
+{self.format_journal_status()}
+{self.format_dialogue_status()}
+{self.format_connection_status(player)}
         """
     
+    def format_store_status(self) -> str:
+        """One-line summary of write-behind persistence"""
+        if not self.store:
+            return "Persistence: off"
+        stats = self.store.stats()
+        return (f"Persistence: {stats['pending']} pending, {stats['rows']} rows in "
+                f"{stats['batches']} commits (last {stats['last_commit_ms']}ms)")
+    
+    def format_journal_status(self) -> str:
+        """One-line summary of the event journal"""
+        if not self.journal:
+            return "Journal: off"
+        stats = self.journal.stats()
+        return (f"Journal: event {stats['seq']} in segment {stats['segment']}, {stats['pending']} pending, "
+                f"{stats['since_checkpoint'] / 1024:.0f} KB since checkpoint, {stats['fsyncs']} fsyncs "
+                f"(last {stats['last_fsync_ms']}ms, fsync={self.journal.fsync})")
+    
+    def format_dialogue_status(self) -> str:
+        """One-line summary of NPC dialogue workers and their reply cache"""
+        if not self.dialogue:
+            return "Dialogue: stock replies"
+        stats = self.dialogue.stats()
+        line = f"Dialogue: {stats['in_flight']}/{stats['workers']} workers busy, {stats['queued']} queued"
+        if not self.dialogue.cache:
+            return line + ", no cache"
+        cache = self.dialogue.cache.stats()
+        return (f"{line}, cache {cache['hit_rate']:.1%} hits over {cache['hits'] + cache['misses']} asks, "
+                f"{cache['saved_seconds']}s of generation saved ({cache['entries']} replies held)")
+    
+    def format_render_status(self) -> str:
+        """One-line summary of the room look cache"""
+        stats = self.render_stats
+        looks = max(stats["looks"], 1)
+        return (f"Look Cache: {stats['static_hits'] / looks:.1%} static / "
+                f"{stats['content_hits'] / looks:.1%} contents hits over {stats['looks']} looks "
+                f"({len(self.render_cache)} rooms cached)")
+    
+    def format_tick_status(self) -> str:
+        """One-line summary of the world clock"""
+        stats = self.clock.stats()
+        phases = ", ".join(f"{phase} {ms}ms" for phase, ms in stats["phase_avg_ms"].items())
+        return (f"World Tick: {stats['ticks']} ticks, {stats['overruns']} overruns, "
+                f"max {stats['max_ms']}ms ({phases})")
+    
+    def format_connection_status(self, player: Player) -> str:
+        """One-line summary of a player's outbound queue"""
+        if not hasattr(player.connection, "stats"):
+            return ""  # no connection, or its queue lives in another process
+        stats = player.connection.stats()
+        per_command = stats["frames"] / max(stats["commands"], 1)
+        return (f"Send Queue: {stats['depth']} queued, {stats['dropped']} dropped, "
+                f"lag {stats['avg_lag_ms']}ms avg / {stats['max_lag_ms']}ms max\n"
+                f"Output: {stats['sent']} messages in {stats['frames']} frames, {stats['bytes'] / 1024:.1f} KB "
+                f"({per_command:.2f} frames/command{', batched' if player.connection.batching else ''}, "
+                f"{player.connection.encoding})")
+    
+    async def cmd_stats(self, player: Player, args: List[str]) -> str:
+        """Show server metrics (admin only)"""
+        if not self.is_admin(player):
+            return "Only the keepers of the forest may read its pulse."
+        lines = ["", "Server Stats:", "-------------"]
+        for name in ("players_connected", "agents_connected", "rooms", "npcs",
+                     "send_queue_depth", "event_loop_lag_seconds", "dialogue_queue_depth", "dialogue_in_flight"):
+            gauge = self.metrics.get(name)
+            if gauge:
+                lines.append(f"{name}: {round(gauge.get(), 4)}")
+        commands = sorted(self.command_latency.series, key=lambda labels: -self.command_latency.count(*labels))
+        limit = int(args[0]) if args and args[0].isdigit() else 10
+        lines.append("")
+        lines.append(f"{'command':<12}{'count':>8}{'errors':>8}{'avg ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for labels in commands[:limit]:
+            count = self.command_latency.count(*labels)
+            avg = self.command_latency.total(*labels) / count * 1000
+            lines.append(f"{labels[0]:<12}{count:>8}{int(self.command_errors.get(*labels)):>8}{avg:>10.2f}"
+                         f"{self.command_latency.quantile(0.95, *labels) * 1000:>10g}"
+                         f"{self.command_latency.quantile(0.99, *labels) * 1000:>10g}")
+        return "\n".join(lines)
+    
+    async def cmd_snapshot(self, player: Player, args: List[str]) -> str:
+        """Write the world to the snapshot file in the background (admin only)"""
+        if not self.is_admin(player):
+            return "Only the keepers of the forest may bind the world to stone."
+        if not self.snapshot_path:
+            return "Snapshots are not enabled on this server."
+        if self.snapshot_task and not self.snapshot_task.done():
+            return "The forest is already being bound to stone."
+        self.snapshot_task = asyncio.create_task(self.write_snapshot(player))
+        return "You begin binding the world to stone..."
+    
+    async def write_snapshot(self, player: Optional[Player] = None) -> Optional[dict]:
+        """Snapshot the world without stalling the loop, telling player how it went"""
+        rooms, npcs = len(self.rooms), len(self.npcs)
+        try:
+            result = await snapshot.save_background(self.snapshot_path, self.snapshot_rows)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"📸 Snapshot failed: {e}")
+            text = f"The snapshot failed: {e}"
+            result = None
+        else:
+            text = (f"World bound to stone: {rooms:,} rooms, {npcs:,} NPCs, "
+                    f"{result['bytes'] / 2**20:.1f} MB in {result['seconds']:.2f}s "
+                    f"(loop paused {result['paused'] * 1000:.1f}ms)")
+            logger.info(f"📸 {text}")
+        if player and player.connection and not player.connection.closed:
+            player.connection.send(Frame("system", text))
+        return result
+    
+    async def cmd_restore(self, player: Player, args: List[str]) -> str:
+        """Replace the world with the last snapshot (admin only)"""
+        if not self.is_admin(player):
+            return "Only the keepers of the forest may turn back its seasons."
+        if not self.snapshot_path:
+            return "Snapshots are not enabled on this server."
+        start = time.perf_counter()
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(None, snapshot.load, self.snapshot_path)
+        except (OSError, ValueError) as e:
+            return f"The snapshot could not be read: {e}"
+        self.apply_snapshot(data)
+        if self.journal:
+            self.journal.compact_soon()  # replaying old events onto this world would be wrong
+        logger.info(f"📸 Restored {len(self.rooms)} rooms and {len(self.npcs)} NPCs "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return (f"The world returns to its snapshot: {len(self.rooms):,} rooms, {len(self.npcs):,} NPCs "
+                f"in {time.perf_counter() - start:.2f}s.")
+    
+    async def cmd_profile(self, player: Player, args: List[str]) -> str:
+        """Profile the loop for a while, or the next executions of one command (admin only)"""
+        if not self.is_admin(player):
+            return "Only the keepers of the forest may listen to its heartbeat."
+        session = self.profile
+        running = session is not None and not session.finished
+        if not args:
+            if running:
+                return f"Profiling: {session.describe()}, {session.profiled} executions so far."
+            return PROFILE_USAGE
+        if args[0].lower() == "stop":
+            if not running:
+                return "Nothing is being profiled."
+            session.finish()
+            return "You stop listening to the forest's heartbeat."
+        if running:
+            return f"The forest's heartbeat is already being recorded ({session.describe()}). Try 'profile stop'."
+        mode = args[0].lower()
+        if mode not in PROFILE_MODES or len(args) not in (2, 3):
+            return PROFILE_USAGE
+        try:
+            if len(args) == 2:
+                session = ProfileSession(mode, min(float(args[1]), MAX_PROFILE_SECONDS))
+            else:
+                session = ProfileSession(mode, MAX_PROFILE_SECONDS, args[1].lower(), int(args[2]))
+        except ValueError:
+            return PROFILE_USAGE
+        if session.seconds <= 0 or (session.command and session.executions <= 0):
+            return PROFILE_USAGE
+        handler = None
+        if session.command:
+            if session.command not in self.command_handlers or session.command == "profile":
+                return f"Unknown command: '{session.command}'."
+            # Only while the profile runs does the command go through it; nothing else pays for profiling
+            handler = self.command_handlers[session.command]
+            self.command_handlers[session.command] = lambda p, args: session.run(handler(p, args))
+        self.profile = session
+        session.start()
+        self.profile_task = asyncio.create_task(self.report_profile(player, session, handler))
+        return f"You begin listening to the forest's heartbeat: {session.describe()}..."
+    
+    async def report_profile(self, player: Player, session: ProfileSession, handler=None):
+        """Wait for a profile to end, unwrap its command and send player the summary"""
+        try:
+            await session.done
+        finally:
+            session.finish()
+            if handler:
+                self.command_handlers[session.command] = handler
+        text = session.summary(PROFILE_TOP)
+        if self.profile_dir and session.stacks:
+            name = f"profile-{datetime.now():%Y%m%d-%H%M%S}-{session.mode}-{session.command or 'loop'}.folded"
+            path = os.path.join(self.profile_dir, name)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, session.write, path)
+                text += f"\nCollapsed stacks: {path}"
+            except OSError as e:
+                text += f"\nThe stacks could not be written: {e}"
+        logger.info(f"🔬 {text}")
+        if player.connection and not player.connection.closed:
+            player.connection.send(Frame("system", text))
+    
     async def cmd_examine(self, player: Player, args: List[str]) -> str:
         """Examine something"""
         if not args:
@@ -370,16 +1899,65 @@ Explored: {len(player.explored_rooms)} rooms
         target = ' '.join(args).lower()
         room = self.rooms[player.room_id]
         
-        for obj in room.objects:
-            if target in obj.lower():
-                return f"You examine the {obj}. It's interesting but reveals no secrets."
+        obj = find_item(room.objects, target)
+        if obj is not None:
+            return f"You examine the {obj}. It's interesting but reveals no secrets."
         
-        for npc in room.npcs:
-            if target in npc.name.lower():
-                return f"{npc.name}: {npc.description}\nMood: {npc.ai_mood}"
+        npc = find_item(room.npcs, target, npc_name)
+        if npc is not None:
+            return f"{npc.name}: {npc.description}\nMood: {npc.ai_mood}"
         
         return f"You don't see '{target}' here."
     
+    async def cmd_talk(self, player: Player, args: List[str]) -> str:
+        """Talk with an NPC; the reply arrives later, from the dialogue workers"""
+        if not args:
+            return "Usage: talk <npc> [about <topic>]"
+        target, _, topic = ' '.join(args).partition(" about ")
+        room = self.rooms[player.room_id]
+        npc = find_item(room.npcs, target.lower().strip(), npc_name)
+        if npc is None:
+            return f"You don't see '{target}' here."
+        if not self.dialogue:
+            return f"{npc.name} says: \"{MOOD_LINES.get(npc.ai_mood, MOOD_LINES['neutral'])}\""
+        if player.name in self.talking:
+            return "You are still waiting for an answer."
+        said = f"{player.name} says: {topic.strip() or 'Hello.'}"
+        key = (npc.id, npc.ai_mood, normalize(topic) or "hello")
+        
+        async def deliver(reply: Optional[str]):
+            try:
+                text = reply or MOOD_LINES.get(npc.ai_mood, MOOD_LINES["neutral"])
+                npc.dialogue = (list(npc.dialogue) + [{"role": "user", "content": said},
+                                                      {"role": "assistant", "content": text}])[-DIALOGUE_MEMORY:]
+                message = f"{npc.name} says to {player.name}: \"{text}\""
+                delta = {"op": "npc_said", "id": npc.id, "name": npc.name, "to": player.name, "says": text}
+                # The answer reaches whoever asked, even if they walked off meanwhile, and the NPC's room hears it
+                asker = self.players.get(player.name)
+                if asker:
+                    self.tell(asker, message, npc.room_id, delta)
+                await self.broadcast(message, npc.room_id, exclude=player.name, delta=delta)
+            finally:
+                self.talking.discard(player.name)
+        
+        cached = self.dialogue.cache.get(key) if self.dialogue.cache else None
+        if cached is None and not self.dialogue.submit(self.dialogue_prompt(npc, room, said), deliver, key):
+            return f"{npc.name} is lost in thought and doesn't hear you. Try again shortly."
+        await self.broadcast(f"{player.name} speaks with {npc.name}.", room.id, exclude=player.name, ambient=True)
+        if cached is not None:
+            await deliver(cached)  # asked before: the answer reaches the room now
+            return ""
+        self.talking.add(player.name)
+        return f"{npc.name} ponders your words..."
+    
+    def dialogue_prompt(self, npc: NPC, room: Room, said: str) -> List[dict]:
+        """Chat messages for an NPC's reply: who they are, where, what they recently said, and what was said"""
+        persona = (f"You are {npc.name}, {npc.description[:1].lower() + npc.description[1:]}, in the Harris "
+                   f"Wilderness, a text adventure forest. You are in {room.name}: {room.description} "
+                   f"Your mood is {npc.ai_mood}. Stay in character and answer in one or two short "
+                   f"sentences of plain speech, without stage directions.")
+        return [{"role": "system", "content": persona}, *npc.dialogue, {"role": "user", "content": said}]
+    
     async def cmd_take(self, player: Player, args: List[str]) -> str:
         """Take an object"""
         if not args:
@@ -387,11 +1965,15 @@ Explored: {len(player.explored_rooms)} rooms
         target = ' '.join(args).lower()
         room = self.rooms[player.room_id]
         
-        for obj in room.objects[:]:
-            if target in obj.lower():
-                room.objects.remove(obj)
-                player.inventory.append(obj)
-                return f"You take the {obj}."
+        obj = find_item(room.objects, target)
+        if obj is not None:
+            room.remove_object(obj)
+            player.inventory.append(obj)
+            self.mark_dirty("room", room.id)
+            self.mark_dirty("player", player.name)
+            self.record("object_taken", player.name, room.id, obj)
+            await self.broadcast(None, room.id, delta={"op": "object_removed", "item": obj, "by": player.name})
+            return f"You take the {obj}."
         
         return f"You can't take '{target}'."
     
@@ -401,11 +1983,15 @@ Explored: {len(player.explored_rooms)} rooms
             return "Drop what?"
         target = ' '.join(args).lower()
         
-        for item in player.inventory[:]:
-            if target in item.lower():
-                player.inventory.remove(item)
-                self.rooms[player.room_id].objects.append(item)
-                return f"You drop the {item}."
+        item = find_item(player.inventory, target)
+        if item is not None:
+            player.inventory.remove(item)
+            self.rooms[player.room_id].add_object(item)
+            self.mark_dirty("room", player.room_id)
+            self.mark_dirty("player", player.name)
+            self.record("object_dropped", player.name, player.room_id, item)
+            await self.broadcast(None, player.room_id, delta={"op": "object_added", "item": item, "by": player.name})
+            return f"You drop the {item}."
         
         return f"You don't have '{target}'."
     
@@ -420,115 +2006,466 @@ Explored: {len(player.explored_rooms)} rooms
         }
         return opposites.get(direction, "somewhere")
     
-    async def broadcast(self, message: str, room_id: str, exclude: str = None):
-        """Send message to all players in a room"""
-        for player in self.players.values():
-            if player.room_id == room_id and player.name != exclude:
-                if player.websocket and not player.websocket.closed:
-                    try:
-                        await player.websocket.send(json.dumps({
-                            "type": "broadcast",
-                            "text": message,
-                            "timestamp": datetime.now().isoformat()
-                        }))
-                    except:
-                        pass
-
-class MUDServer:
-    """WebSocket server for MUD"""
-    def __init__(self, world: MUDWorld, host: str = "localhost", port: int = 4008):
-        self.world = world
+    async def broadcast(self, message: Optional[str], room_id: str, exclude: str = None,
+                        delta: Optional[dict] = None, ambient: bool = False):
+        """Send message to all players in a room
+        
+        Clients that negotiated "delta" get the structured delta instead of the
+        prose when there is one, and skip ambient messages, which change nothing.
+        message may be None for changes only delta clients are told about.
+        """
+        frame = Frame("broadcast", message) if message else None
+        delta_frame = Frame("delta", None, timestamp=False, room=room_id, **delta) if delta else None
+        for player in self.players_in_room(room_id, exclude=exclude):
+            if not player.connection:
+                continue
+            if "delta" in player.capabilities:
+                if delta_frame:
+                    player.connection.send(delta_frame)
+                elif frame and not ambient:
+                    player.connection.send(frame)
+            elif frame:
+                player.connection.send(frame)
+
+    def tell(self, player: Player, message: str, room_id: str, delta: Optional[dict] = None):
+        """Send one player a message about room_id, as broadcast would"""
+        if not player.connection:
+            return
+        if delta and "delta" in player.capabilities:
+            player.connection.send(Frame("delta", None, timestamp=False, room=room_id, **delta))
+        else:
+            player.connection.send(Frame("broadcast", message))
+
+class SessionServer:
+    """Player websocket sessions: login, capabilities, rate limits, output queues and reaping
+    
+    The game side is left to subclasses: join() puts a player in the game,
+    leave() takes them out when their connection ends, and run_command()
+    executes each request the scheduler lets through.
+    """
+    def __init__(self, metrics: MetricsRegistry, host: str = "localhost", port: int = 4008,
+                 send_queue_size: int = 256, overflow_policy: str = "drop_oldest",
+                 batch_output: bool = False, metrics_port: int = 0,
+                 human_rate: float = 10.0, human_burst: float = 20.0,
+                 agent_rate: float = 4.0, agent_burst: float = 10.0,
+                 max_pending: int = 20, max_batch: int = 32, deflate: str = "default",
+                 max_connections: int = 1000, login_timeout: float = 30.0, idle_timeout: float = 900.0,
+                 ping_interval: float = 20.0, ping_timeout: float = 20.0, reuse_port: bool = False,
+                 admin_token: str = ""):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.metrics = metrics
+        self.admin_token = admin_token
+        self.max_batch = max_batch
+        self.max_connections = max_connections
+        self.serve_options = dict(deflate_options(deflate), ping_interval=ping_interval or None,
+                                  ping_timeout=ping_timeout or None, reuse_port=reuse_port)
         self.host = host
         self.port = port
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = overflow_policy
+        self.capabilities = set(CAPABILITIES)
+        if not batch_output:
+            self.capabilities.discard("batch")
+        self.encodings = set(ENCODINGS)
+        self.output_totals = {"commands": 0, "messages": 0, "frames": 0, "batches": 0, "bytes": 0}
+        self.live_connections: Set[ClientConnection] = set()
+        self.loop_lag = LoopLagMonitor()
+        self.metrics_http = MetricsHTTPServer(metrics, port=metrics_port) if metrics_port else None
+        metrics.gauge("send_queue_depth", "Frames waiting in outbound queues",
+                      lambda: sum(len(c.queue) for c in self.live_connections))
+        metrics.gauge("event_loop_lag_seconds", "How late the event loop last woke a sleeping task",
+                      lambda: self.loop_lag.lag)
+        self.limits = {False: (human_rate, human_burst), True: (agent_rate, agent_burst)}
+        self.scheduler = CommandScheduler(self.run_command, max_pending=max_pending, cost=request_cost)
+        self.commands_rejected = metrics.counter(
+            "commands_rejected_total", "Commands refused by the rate limiter", ("client",))
+        metrics.gauge("commands_queued", "Commands waiting in the fair scheduler", self.scheduler.queued)
+        metrics.gauge("connections", "Open websocket connections", lambda: len(self.live_connections))
+        self.reaper = SessionReaper(self.live_connections, metrics, login_timeout, idle_timeout)
+        self.connections_refused = metrics.counter(
+            "connections_refused_total", "Connections turned away because the server was full")
+        
+    def negotiate(self, requested) -> Set[str]:
+        """Capabilities both the client asked for and this server offers"""
+        if not isinstance(requested, list):
+            return set()
+        return {cap for cap in requested if cap in self.capabilities}
+    
+    def output_stats(self) -> dict:
+        """Output counters across closed and live connections"""
+        totals = dict(self.output_totals)
+        for connection in self.live_connections:
+            stats = connection.stats()
+            totals["commands"] += stats["commands"]
+            totals["messages"] += stats["sent"]
+            totals["frames"] += stats["frames"]
+            totals["batches"] += stats["batches"]
+            totals["bytes"] += stats["bytes"]
+        return totals
+    
+    async def run_command(self, session: CommandSession, request):
+        """Execute one scheduled ("command" | "batch" | "route", payload) request and queue its response"""
+        raise NotImplementedError
+    
+    async def join(self, joining: Player, connection: ClientConnection) -> Optional[Player]:
+        """Put a freshly logged-in player in the game and queue what they see first
         
+        Returns the player now on this connection (joining, or the session it
+        took over), or None if the game refused them.
+        """
+        raise NotImplementedError
+    
+    async def leave(self, player: Player, connection: ClientConnection):
+        """Take a player out of the game once their connection has ended"""
+        raise NotImplementedError
+    
+    def _retire(self, connection: ClientConnection):
+        self.live_connections.discard(connection)
+        stats = connection.stats()
+        self.output_totals["commands"] += stats["commands"]
+        self.output_totals["messages"] += stats["sent"]
+        self.output_totals["frames"] += stats["frames"]
+        self.output_totals["batches"] += stats["batches"]
+        self.output_totals["bytes"] += stats["bytes"]
+        
+    async def start_sessions(self):
+        """Start the tasks every session relies on: lag monitor, scheduler, reaper and metrics endpoint"""
+        self.loop_lag.start()
+        self.scheduler.start()
+        self.reaper.start()
+        if self.metrics_http:
+            await self.metrics_http.start()
+    
+    def serve(self):
+        """The websocket server, to use as an async context manager"""
+        return websockets.serve(self.handle_client, self.host, self.port, **self.serve_options)
+    
     async def handle_client(self, websocket, path):
         """Handle a client connection"""
+        if self.max_connections and len(self.live_connections) >= self.max_connections:
+            self.connections_refused.inc()
+            await websocket.send(Frame("error", SERVER_FULL, timestamp=False).data)
+            await websocket.close(code=1013, reason="server full")
+            return
+        connection = ClientConnection(websocket, self.send_queue_size, self.overflow_policy)
+        connection.start()
+        self.live_connections.add(connection)
+        player = None
+        session = None
         try:
             # Get player name
-            await websocket.send(json.dumps({
-                "type": "system",
-                "text": "=== HARRIS WILDERNESS MUD ===\nEnter your name:"
-            }))
+            connection.send(Frame("system", "=== HARRIS WILDERNESS MUD ===\nEnter your name:",
+                                  timestamp=False))
             
-            name_msg = await websocket.recv()
-            name_data = json.loads(name_msg)
+            name_data = decode_message(await websocket.recv())
             name = name_data.get("command", "Wanderer").strip()
+            capabilities = self.negotiate(name_data.get("capabilities"))
+            connection.encoding = negotiate_encoding(name_data.get("encoding"), self.encodings)
+            connection.batching = "batch" in capabilities
+            connection.logged_in = True
+            connection.last_active = time.monotonic()
             
             # Check if agent
             is_agent = name.lower() in ["openclaw", "agent", "ai"]
+            joining = Player(name, is_agent)
+            joining.capabilities = capabilities
+            joining.admin = admin_credential(name_data, websocket, self.admin_token)
             
-            # Create player
-            player = Player(name, is_agent)
-            player.websocket = websocket
-            self.world.players[name] = player
-            self.world.connections.add(websocket)
-            
-            # Welcome
-            welcome_msg = f"""
-Welcome, {name}! {'[AUTONOMOUS AGENT]' if is_agent else ''}
-Type 'help' for commands.
-            """
-            await websocket.send(json.dumps({
-                "type": "system",
-                "text": welcome_msg
-            }))
-            
-            # Show initial room
-            look_result = await self.world.cmd_look(player, [])
-            await websocket.send(json.dumps({
-                "type": "room",
-                "text": look_result
-            }))
-            
-            # Notify others
-            await self.world.broadcast(f"{name} materializes from the void!", "spawn", name)
+            # What the join shows them goes out after the welcome, and neither does if they are refused
+            connection.hold()
+            player = await self.join(joining, connection)
+            if player is None:
+                await connection.close()
+                refusal = Frame("error", f"{name} is already walking the forest.", timestamp=False)
+                await websocket.send(refusal.encode(connection.encoding))
+                return
+            connection.release(welcome_frame(name, is_agent, capabilities, connection.encoding))
             
-            logger.info(f"👤 Player connected: {name} {'(AI)' if is_agent else ''}")
+            session = CommandSession(player, connection, TokenBucket(*self.limits[is_agent]))
             
             # Main loop
             async for message in websocket:
+                connection.last_active = time.monotonic()
                 try:
-                    data = json.loads(message)
+                    data = decode_message(message)
                     command = data.get("command", "").strip()
                     
-                    if command:
-                        result = await self.world.handle_command(player, command)
-                        if result:
-                            await websocket.send(json.dumps({
-                                "type": "response",
-                                "text": result,
-                                "timestamp": datetime.now().isoformat()
-                            }))
+                    if "commands" in data:
+                        try:
+                            request = ("batch", batch_request(data, self.max_batch))
+                        except ValueError as e:
+                            connection.send(Frame("error", str(e), timestamp=False))
+                            continue
+                    elif "route" in data:
+                        request = ("route", data["route"])
+                    elif command:
+                        request = ("command", command)
+                    else:
+                        continue
+                    
+                    if not self.scheduler.submit(session, request):
+                        self.commands_rejected.inc("agent" if is_agent else "human")
+                        connection.send(Frame("error", "You're acting too fast. The forest asks you to slow down.",
+                                              timestamp=False))
                             
-                except json.JSONDecodeError:
-                    await websocket.send(json.dumps({
-                        "type": "error",
-                        "text": "Invalid message format"
-                    }))
+                except ValueError:
+                    connection.send(Frame("error", "Invalid message format", timestamp=False))
                     
-        except websockets.exceptions.ConnectionClosed:
-            pass
+        except websockets.exceptions.ConnectionClosed as e:
+            if heartbeat_failed(e):
+                self.reaper.reaped.inc("heartbeat")
         finally:
             # Cleanup
-            if name in self.world.players:
-                player = self.world.players[name]
-                room = self.world.rooms.get(player.room_id)
-                if room:
-                    room.players.discard(name)
-                del self.world.players[name]
-                self.world.connections.discard(websocket)
-                await self.world.broadcast(f"{name} fades into the mist...", player.room_id)
-                logger.info(f"👋 Player disconnected: {name}")
+            if session:
+                self.scheduler.drop(session)
+            await connection.close()
+            self._retire(connection)
+            if player:
+                await self.leave(player, connection)
+
+
+class MUDServer(SessionServer):
+    """WebSocket server for MUD"""
+    def __init__(self, world: MUDWorld, host: str = "localhost", port: int = 4008, **options):
+        super().__init__(world.metrics, host, port, **options)
+        self.world = world
+        
+    async def run_command(self, session: CommandSession, request):
+        """Execute one scheduled request and queue its response"""
+        if session.connection.closed:
+            return
+        kind, payload = request
+        session.connection.commands += 1
+        if kind == "route":
+            session.connection.send(await self.world.route_frame(session.player, payload))
+            return
+        if kind == "batch":
+            player = session.player
+            session.connection.send(await run_batch(lambda line: self.world.execute(player, line), payload))
+            return
+        result = await self.world.handle_command(session.player, payload)
+        if result:
+            session.connection.send(Frame("response", result))
+    
+    def take_over(self, player: Player, connection: ClientConnection, capabilities: Set[str]):
+        """Move a logged-in player onto a new connection and close the old one"""
+        old = player.connection
+        if old is not None:
+            self.reaper.reap(old, "takeover", TAKEOVER_TEXT)
+            self.world.connections.discard(old.websocket)
+        player.capabilities = capabilities
+        player.websocket = connection.websocket
+        player.connection = connection
+        
+    async def join(self, joining: Player, connection: ClientConnection) -> Optional[Player]:
+        """Add a new player to the world, or move an existing one onto this connection"""
+        name = joining.name
+        player = self.world.players.get(name)
+        if player and self.world.is_admin(player) and not joining.admin:
+            return None  # taking over an admin's session needs the admin's credential
+        if player:
+            # Same name again: the new connection takes over the existing player
+            self.take_over(player, connection, joining.capabilities)
+            player.admin = joining.admin
+            self.world.connections.add(connection.websocket)
+            look_result = await self.world.arrival_text(player)
+            if look_result:
+                connection.send(Frame("room", look_result, timestamp=False))
+            logger.info(f"🔁 Player reconnected: {name} took over their session")
+            return player
+        
+        # Create player
+        player = joining
+        player.websocket = connection.websocket
+        player.connection = connection
+        self.world.restore_player(player)
+        self.world.add_player(player)
+        self.world.connections.add(connection.websocket)
+        
+        # Show initial room
+        look_result = await self.world.arrival_text(player)
+        if look_result:
+            connection.send(Frame("room", look_result, timestamp=False))
+        
+        # Notify others
+        await self.world.broadcast(f"{name} materializes from the void!", player.room_id, name,
+                                   delta={"op": "player_joined", "name": name})
+        
+        logger.info(f"👤 Player connected: {name} {'(AI)' if player.is_agent else ''}")
+        return player
+    
+    async def leave(self, player: Player, connection: ClientConnection):
+        """Remove the player from the world, unless another connection took them over"""
+        name = player.name
+        player = self.world.players.get(name)
+        if player and player.connection is connection:
+            self.world.remove_player(player)
+            self.world.connections.discard(connection.websocket)
+            await self.world.broadcast(f"{name} fades into the mist...", player.room_id,
+                                       delta={"op": "player_left", "name": name})
+            logger.info(f"👋 Player disconnected: {name}")
     
     async def start(self):
         """Start the server"""
         logger.info(f"🚀 MUD Server starting on ws://{self.host}:{self.port}")
-        async with websockets.serve(self.handle_client, self.host, self.port):
-            logger.info("✅ Server running! Connect with: websocat ws://localhost:4008")
-            await asyncio.Future()  # Run forever
+        cancel_on_signals()
+        self.world.clock.start()
+        await self.start_sessions()
+        if self.world.store:
+            self.world.store.start(self.world.collect_rows)
+        if self.world.journal:
+            self.world.journal.start(self.world.snapshot_rows)
+        if self.world.dialogue:
+            self.world.dialogue.start()
+        try:
+            async with self.serve():
+                logger.info("✅ Server running! Connect with: websocat ws://localhost:4008")
+                await asyncio.Future()  # Run forever
+        finally:
+            if self.world.dialogue:
+                await self.world.dialogue.stop()
+            if self.world.store:
+                self.world.store.close(self.world.collect_rows)
+                logger.info("💾 World saved")
+            if self.world.journal:
+                self.world.journal.close()
+                logger.info(f"📜 Journal closed at event {self.world.journal.seq}")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line options shared by every way of running the server"""
+    parser = argparse.ArgumentParser(description="Harris Wilderness MUD Server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=4008)
+    parser.add_argument("--send-queue", type=int, default=256,
+                        help="Max frames queued per connection before the overflow policy applies")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="drop_oldest",
+                        help="What to do when a slow client's send queue is full")
+    parser.add_argument("--batch-output", action="store_true",
+                        help="Offer the 'batch' capability: one frame per client per loop iteration")
+    parser.add_argument("--db", default=str(Path(__file__).resolve().parent.parent / "data" / "world.db"),
+                        help="SQLite world database (empty string disables persistence; with --journal-dir "
+                             "it is only read, to seed a new journal)")
+    parser.add_argument("--flush-interval", type=float, default=1.0,
+                        help="Seconds between write-behind flushes")
+    parser.add_argument("--journal-dir", default="",
+                        help="Directory for the event journal and its checkpoints, used instead of --db "
+                             "(empty disables)")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="interval",
+                        help="When journal writes are fsynced: every write, every --fsync-interval, or never")
+    parser.add_argument("--fsync-interval", type=float, default=1.0,
+                        help="Most seconds a journaled event waits for fsync under --fsync interval")
+    parser.add_argument("--segment-mb", type=float, default=8.0, help="Journal segment size before rolling over")
+    parser.add_argument("--compact-mb", type=float, default=64.0,
+                        help="Journal written since the last checkpoint before the compactor takes a new one")
+    parser.add_argument("--metrics-port", type=int, default=9108,
+                        help="Local port for the Prometheus /metrics endpoint (0 disables)")
+    parser.add_argument("--admin", action="append", default=[],
+                        help="Player name allowed to use admin commands (repeatable)")
+    parser.add_argument("--admin-token", default=os.getenv("MUD_ADMIN_TOKEN", ""),
+                        help="Secret an --admin player sends as \"token\" in the login message to get admin "
+                             "commands (default: $MUD_ADMIN_TOKEN; empty: admins must connect from localhost)")
+    parser.add_argument("--human-rate", type=float, default=10.0, help="Commands/sec per human connection")
+    parser.add_argument("--human-burst", type=float, default=20.0, help="Burst allowance for humans")
+    parser.add_argument("--agent-rate", type=float, default=4.0, help="Commands/sec per agent connection")
+    parser.add_argument("--agent-burst", type=float, default=10.0, help="Burst allowance for agents")
+    parser.add_argument("--max-pending", type=int, default=20,
+                        help="Commands a connection may have queued before new ones are rejected")
+    parser.add_argument("--max-connections", type=int, default=1000,
+                        help="Open connections allowed before new ones get a 'server full' reply (0: no cap)")
+    parser.add_argument("--login-timeout", type=float, default=30.0,
+                        help="Seconds a new connection has to send its name (0 disables)")
+    parser.add_argument("--idle-timeout", type=float, default=900.0,
+                        help="Seconds without a message before a session is closed (0 disables)")
+    parser.add_argument("--ping-interval", type=float, default=20.0,
+                        help="Seconds between websocket heartbeat pings (0 disables)")
+    parser.add_argument("--ping-timeout", type=float, default=20.0,
+                        help="Seconds to wait for a pong before dropping the connection")
+    parser.add_argument("--deflate", choices=sorted(DEFLATE_PRESETS), default="default",
+                        help="permessage-deflate settings for clients that ask for compression")
+    parser.add_argument("--max-batch", type=int, default=32,
+                        help="Most commands one {\"commands\": [...]} batch frame may hold")
+    parser.add_argument("--tick-rate", type=float, default=4.0,
+                        help="World ticks per second")
+    parser.add_argument("--snapshot-file",
+                        default=str(Path(__file__).resolve().parent.parent / "data" / "world.snap"),
+                        help="Binary world snapshot written by 'snapshot' and read by 'restore' (empty disables)")
+    parser.add_argument("--restore", action="store_true",
+                        help="Start from the world in --snapshot-file instead of the seed world")
+    parser.add_argument("--generate", type=int, default=0, metavar="ROOMS",
+                        help="Grow a procedural wilderness of this many rooms below the Clearing (see worldgen.py)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --generate: same seed, same world")
+    parser.add_argument("--llm-url", default=os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+                        help="Ollama-compatible server NPCs talk through (empty: NPCs give stock replies)")
+    parser.add_argument("--llm-model", default=os.getenv("OLLAMA_MODEL", "llama3.1"), help="Model for NPC dialogue")
+    parser.add_argument("--dialogue-workers", type=int, default=2,
+                        help="Most NPC replies being generated at once")
+    parser.add_argument("--dialogue-queue", type=int, default=32,
+                        help="Talk requests that may wait for a worker before NPCs stop listening")
+    parser.add_argument("--dialogue-timeout", type=float, default=20.0,
+                        help="Seconds an NPC reply may take before the NPC falls back to a stock line")
+    parser.add_argument("--dialogue-cache", type=int, default=1024,
+                        help="NPC replies kept for repeated questions (0 disables the cache)")
+    parser.add_argument("--dialogue-ttl", type=float, default=600.0, help="Seconds a cached NPC reply stays fresh")
+    parser.add_argument("--dialogue-variants", type=int, default=1,
+                        help="Replies gathered per question before cached ones are served, picked at random")
+    parser.add_argument("--profile-dir", default=str(Path(__file__).resolve().parent.parent / "data" / "profiles"),
+                        help="Where 'profile' writes collapsed stacks for flamegraph tools (empty: summary only)")
+    return parser
+
+def frontend_kwargs(args) -> dict:
+    """SessionServer keyword arguments from the command line, for MUDServer and every front end"""
+    return dict(send_queue_size=args.send_queue, overflow_policy=args.overflow,
+                batch_output=args.batch_output, metrics_port=args.metrics_port,
+                human_rate=args.human_rate, human_burst=args.human_burst,
+                agent_rate=args.agent_rate, agent_burst=args.agent_burst,
+                max_pending=args.max_pending, max_batch=args.max_batch, deflate=args.deflate,
+                max_connections=args.max_connections, login_timeout=args.login_timeout,
+                idle_timeout=args.idle_timeout, ping_interval=args.ping_interval,
+                ping_timeout=args.ping_timeout, admin_token=args.admin_token)
+
+def build_world(args) -> MUDWorld:
+    """The world main() and the gateway simulation run, set up from command line options"""
+    world = MUDWorld(tick_rate=args.tick_rate)
+    world.admins.update(args.admin)
+    if args.llm_url:
+        cache = None
+        if args.dialogue_cache:
+            cache = DialogueCache(args.dialogue_cache, args.dialogue_ttl, args.dialogue_variants)
+        world.dialogue = DialoguePool(OllamaClient(args.llm_url, args.llm_model), args.dialogue_workers,
+                                      args.dialogue_queue, args.dialogue_timeout, cache)
+        world.dialogue.register_metrics(world.metrics)
+    if args.generate:
+        world.populate(worldgen.generate(args.generate, args.seed))
+    if args.db and not args.journal_dir:
+        world.attach_store(WorldStore(args.db, args.flush_interval))
+    if args.snapshot_file:
+        world.snapshot_path = args.snapshot_file
+        Path(args.snapshot_file).parent.mkdir(parents=True, exist_ok=True)
+    world.profile_dir = args.profile_dir or None
+    if args.restore:
+        start = time.perf_counter()
+        world.apply_snapshot(snapshot.load(args.snapshot_file))
+        logger.info(f"📸 Restored {len(world.rooms)} rooms and {len(world.npcs)} NPCs from "
+                    f"{args.snapshot_file} in {time.perf_counter() - start:.2f}s")
+    if args.journal_dir:
+        # The journal is the world's only record: replaying it onto a world the store also loaded
+        # would apply the same changes twice. A new journal starts from the store's world, if any.
+        journal = Journal(args.journal_dir, args.fsync, args.fsync_interval,
+                          segment_bytes=int(args.segment_mb * 2**20), compact_bytes=int(args.compact_mb * 2**20))
+        if args.db and not args.restore and journal.empty() and Path(args.db).exists():
+            world.load_store(WorldStore(args.db))
+            logger.info(f"📜 Starting the journal from the world in {args.db}")
+        world.attach_journal(journal, recover=not args.restore)
+    return world
+
+def parse_args(argv=None):
+    """Command line options"""
+    return build_parser().parse_args(argv)
 
 def main():
     """Main entry point"""
+    args = parse_args()
     print("""
 ╔══════════════════════════════════════════╗
 ║      HARRIS WILDERNESS MUD SERVER        ║
@@ -536,12 +2473,12 @@ def main():
 ╚══════════════════════════════════════════╝
     """)
     
-    world = MUDWorld()
-    server = MUDServer(world)
+    world = build_world(args)
+    server = MUDServer(world, args.host, args.port, **frontend_kwargs(args))
     
     try:
         asyncio.run(server.start())
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("\n🛑 Server shutting down...")
         sys.exit(0)
 
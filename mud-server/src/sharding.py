@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Zone sharding for the Harris Wilderness MUD
+
+Runs the world as several processes on one box. Each shard worker owns the
+rooms of some zones and runs a full MUDWorld for them (commands, ticks,
+wandering NPCs), keeping read-only replicas of every other room so exits,
+paths and names still resolve. The front process (frontend.py) holds the
+websockets, rate limits and output queues, and routes each player's
+commands to the shard that owns their room. When `go` crosses into another shard's room the
+player is handed off. The front process is also the bus for cross-shard
+broadcasts, builder changes and the global who list. All traffic is
+length-prefixed JSON over Unix sockets (see ipc.py).
+
+    python src/sharding.py --shards 4 [--zones zones.json] [server options]
+
+A zones file maps zone names to room ids; zones are dealt out to shards in
+name order. Rooms it does not list are placed by a stable hash of their id,
+and rooms built at runtime stay on the builder's shard.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import ipc
+from frontend import FrontendServer
+from keywords import ItemList
+from server import Frame, MUDWorld, Player, Room, build_parser, frontend_kwargs, run_batch
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneMap:
+    """Which shard owns each room: explicit zone assignments, else a stable hash"""
+    def __init__(self, shards: int, zones: Optional[Dict[str, List[str]]] = None):
+        self.shards = shards
+        self.assigned: Dict[str, int] = {}
+        for index, zone in enumerate(sorted(zones or {})):
+            for room_id in zones[zone]:
+                self.assigned[room_id] = index % shards
+
+    def owner(self, room_id: str) -> int:
+        shard = self.assigned.get(room_id)
+        if shard is None:
+            shard = zlib.crc32(room_id.encode()) % self.shards
+        return shard
+
+    def assign(self, room_id: str, shard: int):
+        self.assigned[room_id] = shard
+
+
+def load_zones(path: Optional[str]) -> Dict[str, List[str]]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def player_state(player: Player) -> dict:
+    """Everything a shard needs to take over a player"""
+    return {
+        "name": player.name,
+        "room_id": player.room_id,
+        "is_agent": player.is_agent,
+        "inventory": player.inventory,
+        "stats": player.stats,
+        "explored": sorted(player.explored_rooms),
+        "capabilities": sorted(player.capabilities),
+        "admin": player.admin,
+    }
+
+
+def player_from_state(state: dict) -> Player:
+    player = Player(state["name"], state["is_agent"])
+    player.room_id = state["room_id"]
+    player.inventory = ItemList(state["inventory"])
+    player.stats.update(state["stats"])
+    player.explored_rooms = set(state["explored"])
+    player.capabilities = set(state["capabilities"])
+    player.admin = state["admin"]
+    return player
+
+
+def room_state(room: Room) -> dict:
+    return {
+        "id": room.id,
+        "name": room.name,
+        "description": room.description,
+        "exits": room.exits,
+        "created_by": room.created_by,
+    }
+
+
+class ShardWorld(MUDWorld):
+    """The rooms one shard owns, plus read-only replicas of everyone else's"""
+    def __init__(self, index: int, zones: ZoneMap, link: ipc.Outbox, tick_rate: float = 4.0):
+        self.index = index
+        self.zones = zones
+        self.link = link
+        self.roster: Dict[str, bool] = {}  # everyone online, on any shard -> is_agent
+        self.handoffs: Dict[str, tuple] = {}  # player -> (direction, room_id) pending handoff
+        super().__init__(tick_rate)
+
+    def owns(self, room_id: str) -> bool:
+        return self.zones.owner(room_id) == self.index
+
+    def add_room(self, room: Room):
+        super().add_room(room)
+        self.zones.assign(room.id, self.index)
+        self.link.send({"op": "room_added", "shard": self.index, "room": room_state(room)})
+
+    def add_exit(self, room: Room, direction: str, room_id: str, by: Optional[str] = None):
+        super().add_exit(room, direction, room_id, by)
+        self.link.send({"op": "exit_added", "room": room.id, "direction": direction, "to": room_id})
+
+    def replicate(self, message: dict):
+        """Apply another shard's builder change to our replicas"""
+        if message["op"] == "room_added":
+            state = message["room"]
+            room = Room(state["id"], state["name"], state["description"])
+            room.set_exits(state["exits"])
+            room.created_by = state["created_by"]
+            self.rooms[room.id] = room
+            self.refresh_around(room)
+            self.zones.assign(room.id, message["shard"])
+            self.routes.room_added(room.id)
+        else:
+            room = self.rooms.get(message["room"])
+            if room:
+                room.set_exit(message["direction"], message["to"])
+                self.routes.exit_added(room.id, message["direction"], message["to"])
+
+    def npc_can_enter(self, npc, room_id: str) -> bool:
+        return self.owns(npc.room_id) and self.owns(room_id) and super().npc_can_enter(npc, room_id)
+
+    async def cmd_go(self, player: Player, args: List[str]) -> str:
+        if player.name in self.handoffs:
+            return ""
+        return await super().cmd_go(player, args)
+
+    async def walk(self, player: Player, direction: str) -> bool:
+        """Move through an exit, handing the player off if it leads to another shard's room"""
+        if player.name in self.handoffs:
+            return False
+        room = self.rooms.get(player.room_id)
+        target = room.exits.get(direction) if room else None
+        if target is None or self.owns(target):
+            return await super().walk(player, direction)
+        self.move_player(player, target)
+        self.handoffs[player.name] = (direction, target)
+        await self.broadcast(None, room.id, delta={"op": "player_left", "name": player.name})
+        return True
+
+    async def cmd_look(self, player: Player, args: List[str]) -> str:
+        if player.name in self.handoffs:
+            return ""  # the shard taking the player over describes the room
+        return await super().cmd_look(player, args)
+
+    async def arrival_text(self, player: Player) -> str:
+        if player.name in self.handoffs:
+            return ""  # likewise: the adopting shard sends the room_state
+        return await super().arrival_text(player)
+
+    async def cmd_who(self, player: Player, args: List[str]) -> str:
+        """List online players across every shard"""
+        players = [name + (" (AI)" if is_agent else "") for name, is_agent in self.roster.items()]
+        return f"Online ({len(players)}): {', '.join(players)}"
+
+    async def broadcast(self, message: Optional[str], room_id: str, exclude: str = None,
+                        delta: Optional[dict] = None, ambient: bool = False):
+        """Send message to all players in a room, on whichever shard owns it"""
+        if self.owns(room_id):
+            await super().broadcast(message, room_id, exclude, delta, ambient)
+        else:
+            self.link.send({"op": "broadcast", "room": room_id, "text": message, "exclude": exclude,
+                            "delta": delta, "ambient": ambient})
+
+    def format_connection_status(self, player: Player) -> str:
+        owned = sum(1 for room_id in self.rooms if self.owns(room_id))
+        return (f"Shard: {self.index + 1} of {self.zones.shards} ({owned} rooms, "
+                f"{len(self.players)} players here, {len(self.roster)} online)")
+
+
+class ShardWorker:
+    """Serves the front process's requests against one ShardWorld"""
+    def __init__(self, world: ShardWorld):
+        self.world = world
+        self.link = world.link
+        self.tasks = ipc.OrderedTasks()
+
+    def reply(self, message: dict, **fields):
+        self.link.send({"op": "reply", "id": message["id"], **fields})
+
+    async def arrive(self, state: dict) -> Player:
+        player = player_from_state(state)
+        player.connection = ipc.RemoteConnection(self.link, player.name)
+        self.world.add_player(player)
+        return player
+
+    async def dispatch(self, message: dict):
+        world = self.world
+        op = message["op"]
+        if op == "command":
+            player = world.players.get(message["name"])
+            if player is None:
+                self.reply(message, text="")
+                return
+            text, ok = await world.execute(player, message["line"])
+            handoff = world.handoffs.pop(player.name, None)
+            if handoff is None:
+                self.reply(message, text=text, ok=ok)
+                return
+            direction, room_id = handoff
+            world.remove_player(player)
+            self.reply(message, text=text, ok=ok, handoff={
+                "shard": world.zones.owner(room_id), "direction": direction, "player": player_state(player)})
+        elif op == "route":
+            player = world.players.get(message["name"])
+            frame = await world.route_frame(player, message["query"]) if player else Frame("route", "", found=False)
+            self.reply(message, frame=frame.to_dict())
+        elif op == "join":
+            player = await self.arrive(message["player"])
+            text = await world.arrival_text(player)
+            await world.broadcast(f"{player.name} materializes from the void!", player.room_id, player.name,
+                                  delta={"op": "player_joined", "name": player.name})
+            self.reply(message, text=text)
+        elif op == "adopt":
+            player = await self.arrive(message["player"])
+            await world.broadcast(f"{player.name} arrives from the {world.opposite_dir(message['direction'])}.",
+                                  player.room_id, exclude=player.name,
+                                  delta={"op": "player_joined", "name": player.name})
+            self.reply(message, text=await world.arrival_text(player))
+        elif op == "leave":
+            player = world.players.get(message["name"])
+            if player:
+                world.remove_player(player)
+                await world.broadcast(f"{player.name} fades into the mist...", player.room_id,
+                                      delta={"op": "player_left", "name": player.name})
+        elif op == "roster":
+            if message["online"]:
+                world.roster[message["name"]] = message["is_agent"]
+            else:
+                world.roster.pop(message["name"], None)
+        elif op in ("room_added", "exit_added"):
+            world.replicate(message)
+        elif op == "broadcast":
+            await world.broadcast(message["text"], message["room"], message["exclude"],
+                                  message.get("delta"), message.get("ambient", False))
+        else:
+            logger.warning(f"Shard {world.index} got unknown message: {op}")
+
+
+async def run_worker(index: int, bus_path: str, zones: ZoneMap, tick_rate: float, admins: List[str]):
+    """Shard worker process: connect to the bus and serve until told to stop"""
+    channel = await ipc.connect_unix(bus_path)
+    link = ipc.Outbox(channel)
+    world = ShardWorld(index, zones, link, tick_rate)
+    world.admins.update(admins)
+    worker = ShardWorker(world)
+    world.clock.start()
+    channel.send({"op": "hello", "shard": index})
+    try:
+        async for message in channel:
+            if message["op"] == "stop":
+                break
+            name = message.get("name") or message.get("player", {}).get("name")
+            if name:  # a player's requests run in order, as tasks, so a slow one doesn't stall the shard
+                worker.tasks.submit(name, lambda message=message: worker.dispatch(message))
+            else:
+                await worker.dispatch(message)
+            await channel.drain()
+    finally:
+        await world.clock.stop()
+        link.flush()
+        await channel.close()
+
+
+class ShardBus:
+    """The front process's end of every shard: spawns workers, routes requests and bus traffic"""
+    def __init__(self, shards: int, zones_path: Optional[str] = None, tick_rate: float = 4.0,
+                 admins: Optional[List[str]] = None):
+        self.shards = shards
+        self.zones_path = zones_path
+        self.zones = ZoneMap(shards, load_zones(zones_path))
+        self.tick_rate = tick_rate
+        self.admins = admins or []
+        self.links: Dict[int, ipc.Channel] = {}
+        self.connections: Dict[str, object] = {}  # player name -> ClientConnection
+        self.locations: Dict[str, int] = {}  # player name -> shard
+        self.requests = ipc.Requests()
+        self.processes = []
+        self.socket_dir = None
+        self._server = None
+        self._ready = None
+        self._stopping = False
+        # Metrics
+        self.handoffs = 0
+        self.messages = 0
+
+    async def start(self):
+        """Spawn the shard workers and wait for each to check in"""
+        self.socket_dir = tempfile.mkdtemp(prefix="mud-shards-")
+        bus_path = os.path.join(self.socket_dir, "bus.sock")
+        self._ready = asyncio.Event()
+        self._server = await ipc.serve_unix(self._serve_shard, bus_path)
+        for index in range(self.shards):
+            argv = [sys.executable, os.path.abspath(__file__), "--worker", str(index), "--bus", bus_path,
+                    "--shards", str(self.shards), "--tick-rate", str(self.tick_rate)]
+            if self.zones_path:
+                argv += ["--zones", self.zones_path]
+            for admin in self.admins:
+                argv += ["--admin", admin]
+            self.processes.append(await asyncio.create_subprocess_exec(*argv))
+        await asyncio.wait_for(self._ready.wait(), 30)
+        logger.info(f"🧩 {self.shards} shard workers ready")
+
+    async def stop(self):
+        self._stopping = True
+        for channel in self.links.values():
+            channel.send({"op": "stop"})
+        for process in self.processes:
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        self.processes = []
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    async def wait_closed(self):
+        """The bus lives as long as this process; a lost shard only fails its own players' requests"""
+        await asyncio.Future()
+
+    async def _serve_shard(self, channel: ipc.Channel):
+        hello = await channel.recv()
+        if not hello or hello.get("op") != "hello":
+            await channel.close()
+            return
+        index = hello["shard"]
+        self.links[index] = channel
+        if len(self.links) == self.shards:
+            self._ready.set()
+        async for message in channel:
+            self.messages += 1
+            self.dispatch(index, message)
+        del self.links[index]
+        if self._stopping:
+            return
+        logger.error(f"💥 Shard {index} disconnected")
+        self.requests.fail(ConnectionError(f"shard {index} went away"))
+
+    def dispatch(self, index: int, message: dict):
+        op = message["op"]
+        if op == "deliver":
+            frame = Frame.from_dict(message["frame"])
+            for name in message["to"]:
+                connection = self.connections.get(name)
+                if connection:
+                    connection.send(frame)
+        elif op == "reply":
+            self.requests.resolve(message)
+        elif op == "room_added":
+            self.zones.assign(message["room"]["id"], message["shard"])
+            self.publish(message, exclude=index)
+        elif op == "exit_added":
+            self.publish(message, exclude=index)
+        elif op == "broadcast":
+            self.links[self.zones.owner(message["room"])].send(message)
+
+    def publish(self, message: dict, exclude: Optional[int] = None):
+        """Send a message to every shard (but exclude)"""
+        for index, channel in self.links.items():
+            if index != exclude:
+                channel.send(message)
+
+    async def request(self, shard: int, message: dict) -> dict:
+        """Send a request to a shard and wait for its reply"""
+        return await self.requests.send(self.links[shard], message)
+
+    def register_metrics(self, registry):
+        registry.gauge("players_connected", "Connected players, agents included", lambda: len(self.connections))
+        registry.gauge("shards", "Shard worker processes", lambda: len(self.links))
+        registry.gauge("shard_handoffs", "Players handed between shards", lambda: self.handoffs)
+        registry.gauge("shard_messages", "Messages received from shards", lambda: self.messages)
+
+    async def join(self, player: Player, connection) -> Optional[str]:
+        """Place a new player on the shard owning their room; returns what they see"""
+        if player.name in self.connections:
+            return None
+        shard = self.zones.owner(player.room_id)
+        self.connections[player.name] = connection
+        self.locations[player.name] = shard
+        self.publish({"op": "roster", "name": player.name, "is_agent": player.is_agent, "online": True})
+        reply = await self.request(shard, {"op": "join", "player": player_state(player)})
+        return reply["text"]
+
+    async def command(self, name: str, line: str) -> str:
+        text, _ = await self.execute(name, line)
+        return text
+
+    async def execute(self, name: str, line: str) -> Tuple[str, bool]:
+        """Run a command on the player's shard, following them across a border"""
+        reply = await self.request(self.locations[name], {"op": "command", "name": name, "line": line})
+        text = reply.get("text", "")
+        handoff = reply.get("handoff")
+        if handoff and name in self.connections:
+            self.handoffs += 1
+            self.locations[name] = handoff["shard"]
+            arrival = await self.request(handoff["shard"], {
+                "op": "adopt", "player": handoff["player"], "direction": handoff["direction"]})
+            text = "\n".join(part.rstrip("\n") for part in (text, arrival["text"]) if part)
+        return text, reply.get("ok", True)
+
+    async def batch(self, name: str, batch: dict) -> Frame:
+        """Run a batch command by command, so each one goes to whichever shard the player is on by then"""
+        return await run_batch(lambda line: self.execute(name, line), batch)
+
+    async def route(self, name: str, query) -> Frame:
+        reply = await self.request(self.locations[name], {"op": "route", "name": name, "query": str(query)})
+        return Frame.from_dict(reply["frame"])
+
+    def leave(self, name: str, is_agent: bool = False):
+        self.connections.pop(name, None)
+        shard = self.locations.pop(name, None)
+        if shard is not None and shard in self.links:
+            self.links[shard].send({"op": "leave", "name": name})
+        self.publish({"op": "roster", "name": name, "is_agent": is_agent, "online": False})
+
+
+def parse_args(argv=None):
+    parser = build_parser()
+    parser.description = "Harris Wilderness MUD Server (zone sharded)"
+    parser.add_argument("--shards", type=int, default=max(2, os.cpu_count() or 1),
+                        help="Shard worker processes (default: one per core)")
+    parser.add_argument("--zones", default=None,
+                        help="JSON file mapping zone names to lists of room ids")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--bus", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.worker is not None:
+        zones = ZoneMap(args.shards, load_zones(args.zones))
+        asyncio.run(run_worker(args.worker, args.bus, zones, args.tick_rate, args.admin))
+        return
+    if args.db:
+        logger.info("💾 Persistence is not available in sharded mode; the world lives in memory")
+    bus = ShardBus(args.shards, args.zones, args.tick_rate, args.admin)
+    server = FrontendServer(bus, args.host, args.port, **frontend_kwargs(args))
+    logger.info(f"🚀 Sharded MUD Server starting on ws://{args.host}:{args.port} with {args.shards} shards")
+    try:
+        asyncio.run(server.start())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("\n🛑 Server shutting down...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Binary world snapshots for the Harris Wilderness MUD
+
+A snapshot is the whole world in one file: rooms with their exits and
+objects, NPCs with their moods, and player records. Every string is
+stored once in a string table and referenced by index, and every
+per-entity field lives in a flat array of fixed-width numbers, so both
+writing and reading are a handful of bulk copies plus one pass to build
+objects.
+
+    magic "HWMS", format version, entity counts
+    string table (lengths in characters, then one UTF-8 blob)
+    one section per array, each prefixed with its byte length
+
+Rows going in and coming out are plain tuples (the same shapes the
+SQLite store uses, with exits, objects and inventories as containers),
+so this module knows nothing about the world's classes. save_background
+writes from a forked child so the event loop only pauses for the fork.
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import time
+import traceback
+from array import array
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator
+
+MAGIC = b"HWMS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHIII")  # magic, version, rooms, npcs, players
+SECTION = struct.Struct("<Q")
+NO_REF = 0xFFFFFFFF  # a None reference (an NPC nowhere)
+
+# Sections in file order, with their array type codes
+SECTIONS = (
+    ("string_lengths", "I"),
+    ("rooms", "I"),  # id, name, description, created_by
+    ("room_created", "d"),
+    ("exit_counts", "H"),
+    ("exits", "I"),  # direction, room_id pairs
+    ("object_counts", "I"),
+    ("objects", "I"),
+    ("npcs", "I"),  # id, name, description, type, room_id, mood
+    ("inventory_counts", "I"),
+    ("inventory", "I"),
+    ("players", "I"),  # name, room_id, inventory, stats, explored (JSON as in the store)
+    ("agents", "B"),
+)
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read"""
+
+
+def encode(rooms: Iterable[tuple], npcs: Iterable[tuple], players: Iterable[tuple]) -> bytes:
+    """Serialize rows into snapshot bytes
+
+    rooms: (id, name, description, exits dict, objects, created_by, created_at)
+    npcs: (id, name, description, type, room_id, mood, inventory)
+    players: (name, room_id, inventory JSON, stats JSON, explored JSON, is_agent)
+    """
+    strings: Dict[str, int] = {}
+
+    def ref(text: str) -> int:
+        return strings.setdefault(text, len(strings))
+
+    arrays = {name: array(code) for name, code in SECTIONS}
+
+    room_refs, room_created = arrays["rooms"], arrays["room_created"]
+    exit_counts, exit_refs = arrays["exit_counts"], arrays["exits"]
+    object_counts, object_refs = arrays["object_counts"], arrays["objects"]
+    for room_id, name, description, exits, objects, created_by, created_at in rooms:
+        room_refs.extend((ref(room_id), ref(name), ref(description), ref(created_by)))
+        room_created.append(created_at)
+        exit_counts.append(len(exits))
+        for direction, target in exits.items():
+            exit_refs.append(ref(direction))
+            exit_refs.append(ref(target))
+        object_counts.append(len(objects))
+        object_refs.extend(map(ref, objects))
+
+    npc_refs = arrays["npcs"]
+    inventory_counts, inventory_refs = arrays["inventory_counts"], arrays["inventory"]
+    for npc_id, name, description, npc_type, room_id, mood, inventory in npcs:
+        npc_refs.extend((ref(npc_id), ref(name), ref(description), ref(npc_type),
+                         NO_REF if room_id is None else ref(room_id), ref(mood)))
+        inventory_counts.append(len(inventory))
+        inventory_refs.extend(map(ref, inventory))
+
+    player_refs, agents = arrays["players"], arrays["agents"]
+    for name, room_id, inventory, stats, explored, is_agent in players:
+        player_refs.extend(map(ref, (name, room_id, inventory, stats, explored)))
+        agents.append(1 if is_agent else 0)
+
+    arrays["string_lengths"].extend(map(len, strings))
+    blob = "".join(strings).encode("utf-8")
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(room_created), len(npc_refs) // 6, len(agents)),
+             SECTION.pack(len(blob)), blob]
+    for name, _ in SECTIONS:
+        data = arrays[name]
+        if sys.byteorder == "big":
+            data.byteswap()
+        parts.append(SECTION.pack(data.itemsize * len(data)))
+        parts.append(data.tobytes())
+    return b"".join(parts)
+
+
+def decode(data: bytes) -> Dict[str, Iterator[tuple]]:
+    """Rows back out of snapshot bytes, in the shapes encode takes, generated as they are read"""
+    if len(data) < HEADER.size:
+        raise SnapshotError("snapshot is truncated")
+    magic, version, room_count, npc_count, player_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("not a world snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"snapshot format {version} is not supported (expected {FORMAT_VERSION})")
+    view = memoryview(data)
+    offset = HEADER.size
+
+    def section() -> memoryview:
+        nonlocal offset
+        (size,) = SECTION.unpack_from(data, offset)
+        offset += SECTION.size
+        if offset + size > len(data):
+            raise SnapshotError("snapshot is truncated")
+        chunk = view[offset:offset + size]
+        offset += size
+        return chunk
+
+    text = str(section(), "utf-8")
+    arrays = {}
+    for name, code in SECTIONS:
+        arrays[name] = array(code)
+        arrays[name].frombytes(section())
+        if sys.byteorder == "big":
+            arrays[name].byteswap()
+    if (len(arrays["room_created"]), len(arrays["inventory_counts"]), len(arrays["agents"])) != (
+            room_count, npc_count, player_count):
+        raise SnapshotError("snapshot sections disagree with its header")
+    bounds = list(accumulate(arrays["string_lengths"], initial=0))
+    # Interned, so a room's id and every exit leading to it are one object
+    strings = [sys.intern(text[start:end]) for start, end in zip(bounds, bounds[1:])]
+    lookup = strings.__getitem__
+
+    # Rows are generated lazily, straight off the decoded columns
+    fields = map(lookup, arrays["rooms"])
+    exits = map(lookup, arrays["exits"])
+    exit_pairs = zip(exits, exits)
+    objects = map(lookup, arrays["objects"])
+    rooms = ((room_id, name, description, dict(islice(exit_pairs, exit_count)),
+              list(islice(objects, object_count)), created_by, created_at)
+             for room_id, name, description, created_by, created_at, exit_count, object_count
+             in zip(fields, fields, fields, fields, arrays["room_created"], arrays["exit_counts"],
+                    arrays["object_counts"]))
+
+    fields = (None if ref == NO_REF else strings[ref] for ref in arrays["npcs"])
+    inventory = map(lookup, arrays["inventory"])
+    npcs = ((npc_id, name, description, npc_type, room_id, mood, list(islice(inventory, count)))
+            for npc_id, name, description, npc_type, room_id, mood, count
+            in zip(fields, fields, fields, fields, fields, fields, arrays["inventory_counts"]))
+
+    fields = map(lookup, arrays["players"])
+    players = ((name, room_id, inventory, stats, explored, is_agent)
+               for name, room_id, inventory, stats, explored, is_agent
+               in zip(fields, fields, fields, fields, fields, arrays["agents"]))
+    return {"rooms": rooms, "npcs": npcs, "players": players}
+
+
+def save(path: str, rooms: Iterable[tuple], npcs: Iterable[tuple], players: Iterable[tuple]) -> int:
+    """Write a snapshot atomically (temp file, fsync, rename); returns its size in bytes"""
+    data = encode(rooms, npcs, players)
+    _write(path, data)
+    return len(data)
+
+
+def load(path: str) -> Dict[str, Iterator[tuple]]:
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+async def save_background(path: str, collect) -> dict:
+    """Write the snapshot collect() describes without holding up the event loop
+
+    collect() returns (rooms, npcs, players) row iterables over live state.
+    Where fork exists the child iterates its copy-on-write view of the
+    world and writes the file, so the loop only pauses for the fork
+    itself. Elsewhere the bytes are encoded on the loop and written from a
+    thread.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    if hasattr(os, "fork"):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                save(path, *collect())
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        paused = time.perf_counter() - start
+        _, status = await loop.run_in_executor(None, os.waitpid, pid, 0)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError("snapshot writer process failed")
+    else:
+        data = encode(*collect())
+        paused = time.perf_counter() - start
+        await loop.run_in_executor(None, _write, path, data)
+    return {"bytes": os.path.getsize(path), "paused": paused, "seconds": time.perf_counter() - start}
+
+
+def _write(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
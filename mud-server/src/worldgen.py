@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Procedural world generation for the Harris Wilderness MUD
+
+Grows a wilderness of any size from a seed: regions of one terrain (a
+grid of rooms carved into a maze, with some extra passages so there are
+loops), joined into a tree by short corridors that go down from a room of
+the parent region and come up in the entrance of the child. Rooms get
+objects and some regions' rooms get NPCs. The same arguments always give
+the same world, down to every exit, object and mood.
+
+Output is rows in the shapes the SQLite store and snapshots use, so this
+module knows nothing about the world's classes:
+
+    rooms: (id, name, description, exits dict, objects, created_by, created_at)
+    npcs: (id, name, description, type, room_id, mood, inventory)
+    links: (room_id, direction, target) exits to add to rooms outside the generated set
+
+MUDWorld.populate() adds them to a world. From the command line it builds
+a world and writes it as a snapshot to start the server from:
+
+    python src/worldgen.py --rooms 100000 --seed 7 --out data/world.snap
+    python src/server.py --restore --snapshot-file data/world.snap
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from typing import Dict, Iterator, List
+
+CREATED_BY = "worldgen"
+CREATED_AT = 0.0  # fixed, so generated rows are identical run to run
+MOODS = ("friendly", "neutral", "mysterious", "helpful")
+
+# name adjectives, name nouns, descriptions, objects
+THEMES = {
+    "forest": (
+        ("Whispering", "Shadowed", "Mossy", "Silent", "Tangled", "Sunlit", "Ancient", "Fern-choked"),
+        ("Pines", "Hollow", "Thicket", "Glade", "Grove", "Copse", "Dell", "Woods"),
+        ("Tall pines crowd close together, their needles hushing every footstep.",
+         "Shafts of green light fall through a canopy of oak and birch.",
+         "Ferns grow waist-high between the trunks. Somewhere a woodpecker is at work.",
+         "A fallen giant of a tree lies across the way, furred with moss.",
+         "The trees thin around a ring of toadstools. The air feels watchful."),
+        ("pinecone", "fallen branch", "bird's nest", "wild berries", "mossy stone", "acorn"),
+    ),
+    "marsh": (
+        ("Misty", "Sunken", "Reed-choked", "Murky", "Still", "Drowned", "Grey"),
+        ("Fen", "Bog", "Pool", "Causeway", "Mire", "Reedbed", "Shallows"),
+        ("Black water stands between tussocks of grass. Each step squelches.",
+         "Mist lies thick over the reeds, and frogs fall silent as you pass.",
+         "An old plank causeway crosses the bog, rotten in places.",
+         "Bubbles rise lazily from the mud. The air smells of peat."),
+        ("rotten plank", "reed bundle", "frog", "peat brick", "heron feather"),
+    ),
+    "hills": (
+        ("Windswept", "Rocky", "Grassy", "Lonely", "High", "Heather", "Bare"),
+        ("Ridge", "Knoll", "Slope", "Tor", "Pass", "Down", "Crest"),
+        ("Wind combs the long grass flat. The forest spreads out far below.",
+         "Granite outcrops break through thin soil, crusted with lichen.",
+         "Heather and gorse cover the slope, loud with bees.",
+         "A cairn of stacked stones marks the top of the rise."),
+        ("cairn stone", "sprig of heather", "sheep skull", "flint", "hawk feather"),
+    ),
+    "caves": (
+        ("Dripping", "Echoing", "Glittering", "Narrow", "Dark", "Cold", "Hidden"),
+        ("Cavern", "Tunnel", "Grotto", "Chamber", "Crawlway", "Gallery", "Hollow"),
+        ("Water drips from the ceiling into still pools. Every sound comes back twice.",
+         "The passage narrows until you must turn sideways to go on.",
+         "Veins of quartz glitter in the rock when the light touches them.",
+         "Pale roots hang from the roof of a low, cold chamber."),
+        ("glowing fungus", "quartz shard", "old torch", "bat guano", "cave pearl"),
+    ),
+    "ruins": (
+        ("Crumbling", "Overgrown", "Forgotten", "Broken", "Silent", "Roofless", "Ivy-clad"),
+        ("Hall", "Courtyard", "Tower", "Archway", "Cellar", "Cloister", "Gatehouse"),
+        ("Walls of fitted stone stand open to the sky, ivy climbing every crack.",
+         "Flagstones heave where roots have pushed up from beneath.",
+         "A carved archway still stands, though the wall around it has fallen.",
+         "Rubble fills half the chamber. Faded symbols run along one wall."),
+        ("carved stone", "rusted key", "broken pottery", "old coin", "faded tapestry"),
+    ),
+}
+CORRIDOR_NAMES = ("Winding Trail", "Narrow Path", "Old Road", "Deer Track", "Overgrown Way")
+CORRIDOR_DESCRIPTION = "A trail winds on between two stretches of the wilderness."
+NPC_KINDS = (("wanderer", "Wanderer", "A traveller who never seems to stay in one place"),
+             ("wanderer", "Peddler", "A cheerful peddler, pack bristling with odds and ends"),
+             ("mystic", "Hermit", "A hermit who watches the sky and says little"),
+             ("mystic", "Seer", "A seer with clouded eyes and a knowing smile"))
+NPC_NAMES = ("Ash", "Bryn", "Corin", "Dara", "Edda", "Fen", "Gale", "Hale", "Iris", "Jory", "Kell", "Lark",
+             "Moss", "Nell", "Orin", "Pell", "Quill", "Rook", "Sage", "Tamsin", "Vale", "Wren")
+
+
+class Region:
+    """One stretch of a single terrain, and where its corridor joins the world"""
+    __slots__ = ("index", "size", "theme", "parent", "parent_cell", "corridor", "children")
+
+    def __init__(self, index: int, size: int, theme: str, parent: int, parent_cell: int, corridor: int):
+        self.index = index
+        self.size = size
+        self.theme = theme
+        self.parent = parent  # -1 for the first region, which hangs off the anchor room
+        self.parent_cell = parent_cell
+        self.corridor = corridor  # rooms between the parent cell and this region's entrance
+        self.children: Dict[int, str] = {}  # cell -> first corridor room of a child region
+
+    def cell_id(self, cell: int) -> str:
+        return f"r{self.index}_{cell}"
+
+    def corridor_id(self, step: int) -> str:
+        return f"r{self.index}_c{step}"
+
+
+def plan(rooms: int, seed: int, region_size: int = 400) -> List[Region]:
+    """Split a room budget into regions and corridors, and pick where each region attaches"""
+    rng = random.Random(seed)
+    themes = sorted(THEMES)
+    regions: List[Region] = []
+    remaining = rooms
+    while remaining > 0:
+        corridor = 0 if not regions else min(rng.randint(1, 3), remaining - 1)
+        size = min(remaining - corridor, rng.randint(max(1, region_size // 2), max(1, region_size * 3 // 2)))
+        if size < 1:
+            break
+        if regions:
+            parent = regions[rng.randrange(len(regions))]
+            while len(parent.children) >= parent.size:  # full; the newest region never is
+                parent = regions[rng.randrange(len(regions))]
+            cell = rng.randrange(parent.size)
+            while cell in parent.children:  # one way down per room
+                cell = rng.randrange(parent.size)
+            region = Region(len(regions), size, rng.choice(themes), parent.index, cell, corridor)
+            parent.children[cell] = region.corridor_id(0) if corridor else region.cell_id(0)
+        else:
+            region = Region(0, size, rng.choice(themes), -1, 0, 0)
+        regions.append(region)
+        remaining -= size + corridor
+    return regions
+
+
+def generate(rooms: int, seed: int = 0, anchor: str = "spawn", region_size: int = 400,
+             loop_chance: float = 0.15, object_chance: float = 0.3, npc_chance: float = 0.03) -> dict:
+    """Rows for a generated wilderness of exactly `rooms` rooms, reached by going down from `anchor`
+
+    rooms are generated lazily, region by region; npcs yields the NPCs
+    placed along the way, so read it after rooms.
+    """
+    regions = plan(rooms, seed, region_size)
+    npcs: List[tuple] = []
+
+    def region_rooms() -> Iterator[tuple]:
+        for region in regions:
+            yield from _region_rows(region, regions, anchor, seed, loop_chance, object_chance, npc_chance, npcs)
+
+    def region_npcs() -> Iterator[tuple]:
+        yield from npcs  # filled in as the rooms are generated
+
+    links = [(anchor, "down", regions[0].cell_id(0))] if anchor and regions else []
+    return {"rooms": region_rooms(), "npcs": region_npcs(), "links": links}
+
+
+def _region_rows(region: Region, regions: List[Region], anchor: str, seed: int, loop_chance: float,
+                 object_chance: float, npc_chance: float, npcs: List[tuple]) -> Iterator[tuple]:
+    rng = random.Random(seed * 1_000_003 + region.index)  # each region stands alone given the seed
+    adjectives, nouns, descriptions, objects = THEMES[region.theme]
+    names = [f"{adjective} {noun}" for adjective in adjectives for noun in nouns]
+    intern = sys.intern
+    ids = [intern(region.cell_id(cell)) for cell in range(region.size)]
+    exits: List[Dict[str, str]] = [{} for _ in range(region.size)]
+
+    # Corridor from the parent region down to this region's entrance
+    if region.parent >= 0:
+        parent = regions[region.parent]
+        above = intern(parent.cell_id(region.parent_cell))
+        for step in range(region.corridor):
+            here = intern(region.corridor_id(step))
+            below = intern(region.corridor_id(step + 1)) if step + 1 < region.corridor else ids[0]
+            corridor_exits = {"up": above} if step == 0 else {"west": above}
+            corridor_exits["east" if step + 1 < region.corridor else "down"] = below
+            yield (here, rng.choice(CORRIDOR_NAMES), CORRIDOR_DESCRIPTION, corridor_exits, [],
+                   CREATED_BY, CREATED_AT)
+            above = here
+        exits[0]["up"] = above
+    elif anchor:
+        exits[0]["up"] = intern(anchor)
+
+    # A grid carved into a maze (binary tree: every cell opens north or west), plus loops
+    width = max(1, math.isqrt(region.size))
+    for cell in range(1, region.size):
+        can_north, can_west = cell >= width, cell % width > 0
+        north = can_north and (not can_west or rng.random() < 0.5)
+        if north or (can_north and rng.random() < loop_chance):
+            exits[cell]["north"] = ids[cell - width]
+            exits[cell - width]["south"] = ids[cell]
+        if not north or (can_west and rng.random() < loop_chance):
+            exits[cell]["west"] = ids[cell - 1]
+            exits[cell - 1]["east"] = ids[cell]
+    for cell, target in region.children.items():
+        exits[cell]["down"] = intern(target)
+
+    has_npcs = rng.random() < 0.5  # some regions are empty of people
+    for cell in range(region.size):
+        room_objects = [rng.choice(objects)] if rng.random() < object_chance else []
+        yield (ids[cell], rng.choice(names), rng.choice(descriptions), exits[cell], room_objects,
+               CREATED_BY, CREATED_AT)
+        if has_npcs and rng.random() < npc_chance * 2:
+            npc_type, title, description = rng.choice(NPC_KINDS)
+            npcs.append((f"{ids[cell]}_npc", f"{rng.choice(NPC_NAMES)} the {title}", description, npc_type,
+                         ids[cell], rng.choice(MOODS), []))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a Harris Wilderness world and save it as a snapshot")
+    parser.add_argument("--rooms", type=int, default=10_000, help="Generated rooms (on top of the seed world)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--region-size", type=int, default=400, help="Average rooms per region")
+    parser.add_argument("--out", default="data/world.snap", help="Snapshot file to write")
+    args = parser.parse_args()
+
+    import snapshot
+    from server import MUDWorld  # only here: server imports this module
+
+    start = time.perf_counter()
+    world = MUDWorld()
+    world.populate(generate(args.rooms, args.seed, region_size=args.region_size))
+    built = time.perf_counter() - start
+    size = snapshot.save(args.out, *world.snapshot_rows())
+    print(f"{len(world.rooms):,} rooms and {len(world.npcs):,} NPCs built in {built:.2f}s, "
+          f"{size / 2**20:.1f} MB written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Harris Wilderness MUD - headless load generator
+
+Spins up N simulated websocket clients against a MUD server, each running
+a weighted command mix in a closed loop, and reports throughput, command
+round-trip latency, broadcast delivery latency and server RSS.
+
+    python tools/loadgen.py --spawn --clients 200 --duration 30
+    python tools/loadgen.py --url ws://localhost:4008 --pid 1234 \
+        --mix look=40,move=30,say=15,take_drop=10,create=5
+    python tools/loadgen.py --spawn --clients 50 --flood-rate 2000
+    python tools/loadgen.py --spawn --server-script src/gateway.py --server-arg=--gateways=2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import websockets
+
+SERVER_SCRIPT = Path(__file__).resolve().parent.parent / "src" / "server.py"
+
+DEFAULT_MIX = "look=40,move=30,say=15,take_drop=10,create=5"
+DIRECTIONS = ["north", "south", "east", "west", "up", "down"]
+STAMP = re.compile(r"lg:(\d+\.\d+)")
+EXITS = re.compile(r"Exits: (.*)")
+OBJECTS = re.compile(r"You see: (.*)")
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """Parse 'look=40,move=30' into weights"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("look", "move", "say", "take_drop", "create"):
+            raise ValueError(f"Unknown command kind in mix: {name}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a process from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class Results:
+    """Latency samples shared by all simulated clients"""
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.broadcast_latency: List[float] = []
+        self.errors = 0
+        self.timeouts = 0
+        self.connected = 0
+        self.rss_samples: List[int] = []
+
+    def record(self, kind: str, seconds: float):
+        self.latency.setdefault(kind, []).append(seconds)
+
+    def all_latencies(self) -> List[float]:
+        return [v for samples in self.latency.values() for v in samples]
+
+
+class SimClient:
+    """One simulated player running a command mix"""
+    def __init__(self, name: str, url: str, mix: Dict[str, int], think: float,
+                 results: Results, timeout: float):
+        self.name = name
+        self.url = url
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.think = think
+        self.results = results
+        self.timeout = timeout
+        self.responses: asyncio.Queue = asyncio.Queue()
+        self.exits: List[str] = []
+        self.objects: List[str] = []
+        self.inventory: List[str] = []
+        self.created = 0
+
+    async def run(self, stop_at: float):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.recv()  # name prompt
+            await ws.send(json.dumps({"command": self.name}))
+            reader = asyncio.create_task(self._reader(ws))
+            try:
+                self._learn_room(await self._await_room())
+                self.results.connected += 1
+                while time.monotonic() < stop_at:
+                    kind = random.choices(self.kinds, self.weights)[0]
+                    command = self._command_for(kind)
+                    start = time.perf_counter()
+                    await ws.send(json.dumps({"command": command}))
+                    try:
+                        text = await asyncio.wait_for(self.responses.get(), self.timeout)
+                    except asyncio.TimeoutError:
+                        self.results.timeouts += 1
+                        continue
+                    self.results.record(kind, time.perf_counter() - start)
+                    self._learn(kind, command, text)
+                    if self.think:
+                        await asyncio.sleep(random.uniform(0, 2 * self.think))
+            finally:
+                reader.cancel()
+
+    async def _await_room(self) -> str:
+        return await asyncio.wait_for(self.responses.get(), self.timeout)
+
+    async def _reader(self, ws):
+        async for message in ws:
+            data = json.loads(message)
+            frames = data["frames"] if data.get("type") == "batch" else [data]
+            for frame in frames:
+                kind = frame.get("type")
+                if kind in ("response", "room"):
+                    self.responses.put_nowait(frame.get("text", ""))
+                elif kind == "broadcast":
+                    match = STAMP.search(frame.get("text", ""))
+                    if match:
+                        self.results.broadcast_latency.append(time.time() - float(match.group(1)))
+                elif kind == "error":
+                    self.results.errors += 1
+                    self.responses.put_nowait(frame.get("text", ""))
+
+    def _command_for(self, kind: str) -> str:
+        if kind == "look":
+            return "look"
+        if kind == "move":
+            return "go " + (random.choice(self.exits) if self.exits else random.choice(DIRECTIONS))
+        if kind == "say":
+            return f"say lg:{time.time():.6f} hello from {self.name}"
+        if kind == "take_drop":
+            if self.inventory and (not self.objects or random.random() < 0.5):
+                return "drop " + self.inventory[-1]
+            if self.objects:
+                return "take " + random.choice(self.objects)
+            return "inventory"
+        free = [d for d in DIRECTIONS if d not in self.exits] or DIRECTIONS
+        self.created += 1
+        return f"create {random.choice(free)} {self.name} Hall {self.created}"
+
+    def _learn_room(self, text: str):
+        match = EXITS.search(text)
+        self.exits = [part.split(" (")[0] for part in match.group(1).split(", ")] if match else []
+        match = OBJECTS.search(text)
+        self.objects = match.group(1).split(", ") if match else []
+
+    def _learn(self, kind: str, command: str, text: str):
+        if kind in ("look", "move"):
+            self._learn_room(text)
+        elif text.startswith("You take the "):
+            item = text[len("You take the "):-1]
+            self.inventory.append(item)
+            if item in self.objects:
+                self.objects.remove(item)
+        elif text.startswith("You drop the "):
+            item = text[len("You drop the "):-1]
+            if item in self.inventory:
+                self.inventory.remove(item)
+            self.objects.append(item)
+        elif text.startswith("You create a new realm"):
+            self.exits.append(command.split()[1])
+
+
+class FloodClient:
+    """An autonomous agent that fires commands without waiting for replies"""
+    def __init__(self, name: str, url: str, rate: float):
+        self.name = name
+        self.url = url
+        self.rate = rate
+        self.sent = 0
+        self.answered = 0
+        self.rejected = 0
+
+    async def run(self, stop_at: float):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.recv()  # name prompt
+            await ws.send(json.dumps({"command": self.name}))
+            reader = asyncio.create_task(self._reader(ws))
+            try:
+                interval = 1.0 / self.rate
+                next_send = time.monotonic()
+                while time.monotonic() < stop_at:
+                    await ws.send(json.dumps({"command": random.choice(["look", "who", "status", "say spam"])}))
+                    self.sent += 1
+                    next_send += interval
+                    await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+            finally:
+                reader.cancel()
+
+    async def _reader(self, ws):
+        async for message in ws:
+            data = json.loads(message)
+            frames = data["frames"] if data.get("type") == "batch" else [data]
+            for frame in frames:
+                if frame.get("type") == "response":
+                    self.answered += 1
+                elif frame.get("type") == "error":
+                    self.rejected += 1
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(port: int, extra: List[str], script: Path = SERVER_SCRIPT) -> subprocess.Popen:
+    """Start a throwaway local server with persistence and metrics disabled"""
+    cmd = [sys.executable, str(script), "--host", "127.0.0.1", "--port", str(port),
+           "--db", "", "--metrics-port", "0"] + extra
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_for_server(url: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def sample_rss(pid: int, results: Results, interval: float = 0.5):
+    while True:
+        rss = read_rss_kb(pid)
+        if rss:
+            results.rss_samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run_load(args) -> dict:
+    mix = parse_mix(args.mix)
+    results = Results()
+    server = None
+    url = args.url
+    pid = args.pid
+    if args.spawn:
+        port = free_port()
+        url = f"ws://127.0.0.1:{port}"
+        server = spawn_server(port, args.server_arg, args.server_script)
+        pid = server.pid
+    try:
+        await wait_for_server(url)
+        rss_task = asyncio.create_task(sample_rss(pid, results)) if pid else None
+        rss_before = read_rss_kb(pid) if pid else None
+
+        stop_at = time.monotonic() + args.ramp + args.duration
+        clients = []
+        flood = None
+        if args.flood_rate:
+            flood = FloodClient(args.flood_name, url, args.flood_rate)
+            clients.append(asyncio.create_task(flood.run(stop_at)))
+        for i in range(args.clients):
+            client = SimClient(f"{args.prefix}{i}", url, mix, args.think, results, args.timeout)
+            clients.append(asyncio.create_task(client.run(stop_at)))
+            if args.ramp:
+                await asyncio.sleep(args.ramp / args.clients)
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*clients, return_exceptions=True)
+        elapsed = time.monotonic() - started
+        failures = [o for o in outcomes if isinstance(o, Exception)]
+        if rss_task:
+            rss_task.cancel()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    latencies = results.all_latencies()
+    report = {
+        "clients": args.clients,
+        "connected": results.connected,
+        "failed_clients": len(failures),
+        "commands": len(latencies),
+        "timeouts": results.timeouts,
+        "errors": results.errors,
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "by_command_ms": {kind: summarize(samples) for kind, samples in results.latency.items()},
+        "broadcast_ms": summarize(results.broadcast_latency),
+        "broadcasts": len(results.broadcast_latency),
+        "rss_kb": {
+            "before": rss_before,
+            "peak": max(results.rss_samples) if results.rss_samples else None,
+        },
+    }
+    if flood:
+        report["flood"] = {"sent": flood.sent, "answered": flood.answered, "rejected": flood.rejected}
+    return report
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "p50": round(percentile(samples, 50) * 1000, 2),
+        "p95": round(percentile(samples, 95) * 1000, 2),
+        "p99": round(percentile(samples, 99) * 1000, 2),
+    }
+
+
+def print_report(report: dict):
+    print(f"\nClients: {report['connected']}/{report['clients']} connected, "
+          f"{report['failed_clients']} failed")
+    print(f"Commands: {report['commands']} ({report['throughput']}/s), "
+          f"{report['timeouts']} timeouts, {report['errors']} errors")
+    print(f"{'':12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(f"{'all':12}" + "".join(f"{report['latency_ms'][p]:>10}" for p in ("p50", "p95", "p99")))
+    for kind, stats in sorted(report["by_command_ms"].items()):
+        print(f"{kind:12}" + "".join(f"{stats[p]:>10}" for p in ("p50", "p95", "p99")))
+    print(f"{'broadcast':12}" + "".join(f"{report['broadcast_ms'][p]:>10}" for p in ("p50", "p95", "p99"))
+          + f"   ({report['broadcasts']} delivered)")
+    if "flood" in report:
+        flood = report["flood"]
+        print(f"Flooding agent: {flood['sent']} sent, {flood['answered']} answered, "
+              f"{flood['rejected']} rejected")
+    rss = report["rss_kb"]
+    if rss["peak"]:
+        print(f"Server RSS: {rss['before'] / 1024:.1f} MB before, {rss['peak'] / 1024:.1f} MB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harris Wilderness MUD load generator")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Server to load, e.g. ws://localhost:4008")
+    target.add_argument("--spawn", action="store_true", help="Start a local server on a free port")
+    parser.add_argument("--pid", type=int, help="Server pid for RSS sampling (with --url)")
+    parser.add_argument("--server-arg", action="append", default=[],
+                        help="Extra argument for the spawned server (repeatable)")
+    parser.add_argument("--server-script", type=Path, default=SERVER_SCRIPT,
+                        help="Entry point to spawn, e.g. src/gateway.py or src/sharding.py")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of steady load")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds to connect all clients")
+    parser.add_argument("--think", type=float, default=0.2, help="Mean pause between commands")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for a response")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted command mix")
+    parser.add_argument("--prefix", default="load", help="Client name prefix")
+    parser.add_argument("--flood-rate", type=float, default=0.0,
+                        help="Also run one agent firing this many commands/sec without waiting")
+    parser.add_argument("--flood-name", default="openclaw", help="Name for the flooding agent")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()